@@ -13,7 +13,8 @@ from PyQt5.QtGui import QFont
 from PyQt5.QtCore import pyqtSignal
 
 from lod2.scripts.filter_LOD2 import spatial_filter_with_polygon, filter_LOD2_with_coordinates, process_lod2, calculate_centroid_and_geocode
-from lod2.scripts.heat_requirement_DIN_EN_12831 import Building
+from lod2.scripts.heat_requirement_DIN_EN_12831 import calculate_heat_demand_batch
+from lod2.scripts.building_store import filter_gebaeude_mit_polygon, filter_gebaeude_mit_koordinaten, lade_gefilterte_gebaeude
 
 # defines the base path
 def get_resource_path(relative_path):
@@ -75,7 +76,8 @@ class BuildingTab(QWidget):
         
         # Eingabefeld für die Eingabe-LOD2-geojson
         self.inputLOD2geojsonLineEdit, self.inputLOD2geojsonButton = self.createFileInput(f"{self.base_path}\\Gebäudedaten\\lod2_data\\lod2_data.geojson", font)
-        fileInputLayout.addLayout(self.createFileInputLayout("Eingabe-LOD2-geojson:", self.inputLOD2geojsonLineEdit, self.inputLOD2geojsonButton, font))
+        # alternativ ein Gebäudespeicher (.parquet) aus building_store.aktualisiere_gebaeudespeicher, gelesen werden nur die benötigten Gebäude
+        fileInputLayout.addLayout(self.createFileInputLayout("Eingabe-LOD2-geojson / Gebäudespeicher:", self.inputLOD2geojsonLineEdit, self.inputLOD2geojsonButton, font))
 
         # Eingabefeld für die Eingabe-Filter-Polygon-shapefile
         self.inputfilterPolygonLineEdit, self.inputfilterPolygonButton = self.createFileInput(f"{self.base_path}\\Gebäudedaten\\lod2_data\\quartier_1.geojson", font)
@@ -204,13 +206,19 @@ class BuildingTab(QWidget):
             self.inputfilterPolygonfilename = self.inputfilterPolygonLineEdit.text()
             self.outputLOD2geojsonfilename = self.outputLOD2geojsonLineEdit.text()
             self.outputcsvfilename = f'{self.base_path}\\Gebäudedaten\\building_data.csv' # self.outputcsvLineEdit.text()
-            spatial_filter_with_polygon(self.inputLOD2geojsonfilename, self.inputfilterPolygonfilename, self.outputLOD2geojsonfilename)
+            if self.inputLOD2geojsonfilename.endswith('.parquet'):
+                filter_gebaeude_mit_polygon(self.inputLOD2geojsonfilename, self.inputfilterPolygonfilename).to_file(self.outputLOD2geojsonfilename, driver='GeoJSON')
+            else:
+                spatial_filter_with_polygon(self.inputLOD2geojsonfilename, self.inputfilterPolygonfilename, self.outputLOD2geojsonfilename)
         elif filter_method == "Filter by Building Data CSV":
             self.inputLOD2geojsonfilename = self.inputLOD2geojsonLineEdit.text()
             self.inputfilterBuildingDatafilename = self.inputfilterBuildingDataLineEdit.text()
             self.outputLOD2geojsonfilename = self.outputLOD2geojsonLineEdit.text()
             self.outputcsvfilename = f'{self.base_path}\\Gebäudedaten\\building_data.csv' # self.outputcsvLineEdit.text()
-            filter_LOD2_with_coordinates(self.inputLOD2geojsonfilename, self.inputfilterBuildingDatafilename, self.outputLOD2geojsonfilename)
+            if self.inputLOD2geojsonfilename.endswith('.parquet'):
+                filter_gebaeude_mit_koordinaten(self.inputLOD2geojsonfilename, self.inputfilterBuildingDatafilename).to_file(self.outputLOD2geojsonfilename, driver='GeoJSON')
+            else:
+                filter_LOD2_with_coordinates(self.inputLOD2geojsonfilename, self.inputfilterBuildingDatafilename, self.outputLOD2geojsonfilename)
         # Rufen Sie die loadNetData-Methode des Haupt-Tabs auf
         self.vis_tab.loadNetData(self.outputLOD2geojsonfilename)
 
@@ -221,7 +229,11 @@ class BuildingTab(QWidget):
         }
         # Annahme: Die process_lod2 Funktion wurde entsprechend erweitert, um Adressinformationen zu liefern
         self.outputLOD2geojsonfilename = self.outputLOD2geojsonLineEdit.text()
-        building_info = process_lod2(self.outputLOD2geojsonfilename)
+        if self.inputLOD2geojsonLineEdit.text().endswith('.parquet'):
+            # Gebäude aus dem Gebäudespeicher, Flächen und Volumen sind bereits berechnet
+            building_info = lade_gefilterte_gebaeude(self.outputLOD2geojsonfilename)
+        else:
+            building_info = process_lod2(self.outputLOD2geojsonfilename)
 
         # Überprüfen, ob die Adressinformationen fehlen und falls ja, die Berechnung durchführen
         address_missing = any(info['Adresse'] is None for info in building_info.values())
@@ -307,22 +319,23 @@ class BuildingTab(QWidget):
         return comboBox
     
     def calculateHeatDemand(self):
-        for row in range(self.tableWidget.rowCount()):
-            ground_area = float(self.tableWidget.item(row, 3).text())
-            wall_area = float(self.tableWidget.item(row, 4).text())
-            roof_area = float(self.tableWidget.item(row, 5).text())
-            volume = float(self.tableWidget.item(row, 6).text())
-            u_type = self.tableWidget.cellWidget(row, 8).currentText()  # Typ
-            building_state = self.tableWidget.cellWidget(row, 9).currentText()  # Gebäudezustand
-
-            building = Building(ground_area, wall_area, roof_area, volume, u_type=u_type, building_state=building_state)
-            building.calc_yearly_heat_demand()
-            
-            print(building.yearly_heat_demand)
-            self.tableWidget.setHorizontalHeaderLabels(['Adresse', 'UTM_X', 'UTM_Y','Grundfläche', 'Wandfläche', 'Dachfläche', 'Volumen', 'Nutzungstyp', 'Typ', 'Gebäudezustand', 
-                                                    'ww_demand_Wh_per_m2', 'air_change_rate', 'floors', 'fracture_windows', 'fracture_doors', 'min_air_temp', 
-                                                    'room_temp', 'max_air_temp_heating', 'Jährlicher Wärmebedarf in kWh'])
-            self.tableWidget.setItem(row, 18, QTableWidgetItem(f"{building.yearly_heat_demand:.2f}"))  # Füge eine neue Spalte für die Ergebnisse hinzu
+        rows = range(self.tableWidget.rowCount())
+        ground_area = [float(self.tableWidget.item(row, 3).text()) for row in rows]
+        wall_area = [float(self.tableWidget.item(row, 4).text()) for row in rows]
+        roof_area = [float(self.tableWidget.item(row, 5).text()) for row in rows]
+        volume = [float(self.tableWidget.item(row, 6).text()) for row in rows]
+        u_type = [self.tableWidget.cellWidget(row, 8).currentText() for row in rows]  # Typ
+        building_state = [self.tableWidget.cellWidget(row, 9).currentText() for row in rows]  # Gebäudezustand
+
+        # Berechnung aller Gebäude in einem Schritt
+        results = calculate_heat_demand_batch(ground_area, wall_area, roof_area, volume, u_type=u_type, building_state=building_state)
+
+        self.tableWidget.setHorizontalHeaderLabels(['Adresse', 'UTM_X', 'UTM_Y','Grundfläche', 'Wandfläche', 'Dachfläche', 'Volumen', 'Nutzungstyp', 'Typ', 'Gebäudezustand', 
+                                                'ww_demand_Wh_per_m2', 'air_change_rate', 'floors', 'fracture_windows', 'fracture_doors', 'min_air_temp', 
+                                                'room_temp', 'max_air_temp_heating', 'Jährlicher Wärmebedarf in kWh'])
+        for row, yearly_heat_demand in zip(rows, results["yearly_heat_demand"]):
+            print(yearly_heat_demand)
+            self.tableWidget.setItem(row, 18, QTableWidgetItem(f"{yearly_heat_demand:.2f}"))  # Füge eine neue Spalte für die Ergebnisse hinzu
 
     def createBuildingCSV(self):
         # Standardwerte für die neuen Spalten
@@ -18,6 +18,7 @@ from PyQt5.QtCore import pyqtSignal, Qt
 from PyQt5.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QScrollArea, QMessageBox, QProgressBar, QMenuBar, QAction
 
 from net_simulation_pandapipes.pp_net_time_series_simulation import calculate_results, save_results_csv, import_results_csv
+from utilities.demand_matrix import zeitfenster
 
 from gui.CalculationTab.calculation_dialogs import HeatDemandEditDialog, NetGenerationDialog, ZeitreihenrechnungDialog
 from gui.threads import NetInitializationThread, NetCalculationThread
@@ -248,7 +249,7 @@ class CalculationTab(QWidget):
         self.net_data = self.net, self.yearly_time_steps, self.waerme_ges_W, self.supply_temperature, self.return_temperature, self.supply_temperature_buildings, self.return_temperature_buildings, \
             self.supply_temperature_buildings_curve, self.return_temperature_buildings_curve, self.netconfiguration, self.dT_RL, self.building_temp_checked
 
-        self.waerme_ges_kW = np.where(self.waerme_ges_W == 0, 0, self.waerme_ges_W / 1000)
+        self.waerme_ges_kW = self.waerme_ges_W / 1000
         self.plot(self.net, self.yearly_time_steps, self.waerme_ges_kW)
 
     def plot(self, net, time_steps, qext_kW):
@@ -402,10 +403,14 @@ class CalculationTab(QWidget):
                 # Pandapipes-Netz als pickle speichern
                 pp.to_pickle(self.net, pickle_file_path)
                 
-                # Umwandlung der Daten in ein DataFrame und Speichern als CSV
-                data = np.column_stack([self.waerme_ges_W[i] for i in range(self.waerme_ges_W.shape[0])])
-                df = pd.DataFrame(data, index=self.yearly_time_steps, columns=[f'waerme_ges_W_{i+1}' for i in range(self.waerme_ges_W.shape[0])])
-                df.to_csv(csv_file_path, sep=';', date_format='%Y-%m-%dT%H:%M:%S')
+                # Umwandlung der Daten in ein DataFrame und Speichern als CSV, abschnittsweise über die Zeitschritte
+                # (bei einer DemandMatrix wird so nie die vollständige Matrix berechnet)
+                columns = [f'waerme_ges_W_{i+1}' for i in range(self.waerme_ges_W.shape[0])]
+                with open(csv_file_path, 'w', newline='', encoding='utf-8') as csv_file:
+                    for start in range(0, len(self.yearly_time_steps), 2016):
+                        end = min(start + 2016, len(self.yearly_time_steps))
+                        df = pd.DataFrame(zeitfenster(self.waerme_ges_W, start, end).T, index=self.yearly_time_steps[start:end], columns=columns)
+                        df.to_csv(csv_file, sep=';', date_format='%Y-%m-%dT%H:%M:%S', header=(start == 0))
 
                 # Vorbereiten der zusätzlichen Daten für JSON
                 additional_data = {
@@ -413,8 +418,8 @@ class CalculationTab(QWidget):
                     'return_temperature': self.return_temperature.tolist(),
                     'supply_temperature_buildings': self.supply_temperature_buildings.tolist(),
                     'return_temperature_buildings': self.return_temperature_buildings.tolist(),
-                    'supply_temperature_buildings_curve': self.supply_temperature_buildings_curve.tolist(),
-                    'return_temperature_buildings_curve': self.return_temperature_buildings_curve.tolist(),
+                    'supply_temperature_buildings_curve': np.asarray(self.supply_temperature_buildings_curve).tolist(),
+                    'return_temperature_buildings_curve': np.asarray(self.return_temperature_buildings_curve).tolist(),
                     'netconfiguration': self.netconfiguration,
                     'dT_RL': self.dT_RL,
                     'building_temp_checked': self.building_temp_checked
@@ -5,11 +5,12 @@ import traceback
 from PyQt5.QtCore import QThread, pyqtSignal
 
 from utilities.test_reference_year import import_TRY
+from utilities.demand_matrix import AbgeleiteteMatrix
 
 from net_generation.import_and_create_layers import generate_and_export_layers
 
 from net_simulation_pandapipes.pp_net_initialisation_geojson import initialize_geojson
-from net_simulation_pandapipes.pp_net_time_series_simulation import thermohydraulic_time_series_net, import_results_csv
+from net_simulation_pandapipes.pp_net_time_series_simulation import thermohydraulic_time_series_net, import_results_csv, producer_feed_in
 from net_simulation_pandapipes.stanet_import_pandapipes import create_net_from_stanet_csv
 from net_simulation_pandapipes.utilities import net_optimization, COP_WP
 
@@ -127,15 +128,9 @@ class NetCalculationThread(QThread):
                 self.COP, _ = COP_WP(self.supply_temperature_buildings, self.return_temperature)
                 print(f"COP dezentrale Wärmepumpen Gebäude: {self.COP}")
 
-                for waerme_gebaeude, cop in zip(self.total_heat_W, self.COP):
-                    self.strom_wp = waerme_gebaeude/cop
-                    self.waerme_hast = waerme_gebaeude - self.strom_wp
-
-                    self.waerme_hast_ges_W.append(self.waerme_hast)
-                    self.strom_hast_ges_W.append(self.strom_wp)
-
-                self.waerme_hast_ges_W = np.array(self.waerme_hast_ges_W)
-                self.strom_hast_ges_W = np.array(self.strom_hast_ges_W)
+                # one COP per building, applied to all time steps of the building (profiles stay compact)
+                self.strom_hast_ges_W = self.total_heat_W / np.asarray(self.COP)[:, np.newaxis]
+                self.waerme_hast_ges_W = self.total_heat_W * (1 - 1 / np.asarray(self.COP))[:, np.newaxis]
             
             # Building temperatures are time-varying, so return_temperature is determined from the building temperatures, there is no COP calculation
             if self.building_temp_checked == True and self.netconfiguration != "kaltes Netz":
@@ -145,17 +140,15 @@ class NetCalculationThread(QThread):
 
             # Building temperatures are time-varying, so return_temperature is determined from the building temperatures, a COP calculation is made with time-varying building temperatures
             elif self.building_temp_checked == True and self.netconfiguration == "kaltes Netz":
-                for st, rt, waerme_gebaeude in zip(self.supply_temperature_buildings_curve, self.return_temperature, self.total_heat_W):
-                    cop, _ = COP_WP(st, rt)
-
-                    self.strom_wp = waerme_gebaeude/cop
-                    self.waerme_hast = waerme_gebaeude - self.strom_wp
-
-                    self.waerme_hast_ges_W.append(self.waerme_hast)
-                    self.strom_hast_ges_W.append(self.strom_wp)
+                # COP per building and time step, calculated only for the accessed rows and time windows (the profiles stay compact)
+                return_temperature = self.return_temperature
+                if np.ndim(return_temperature) == 1:
+                    return_temperature = np.asarray(return_temperature, dtype=float)[:, np.newaxis]
+                cop = AbgeleiteteMatrix(lambda supply_temperature, return_temperature: COP_WP(supply_temperature, return_temperature)[0], \
+                                        self.supply_temperature_buildings_curve, return_temperature)
 
-                self.waerme_hast_ges_W = np.array(self.waerme_hast_ges_W)
-                self.strom_hast_ges_W = np.array(self.strom_hast_ges_W)
+                self.strom_hast_ges_W = AbgeleiteteMatrix(lambda heat, cop: heat / cop, self.total_heat_W, cop)
+                self.waerme_hast_ges_W = AbgeleiteteMatrix(lambda heat, cop: heat - heat / cop, self.total_heat_W, cop)
 
             print(f"Rücklauftemperatur HAST: {self.return_temperature} °C")
 
@@ -274,26 +267,8 @@ class CalculateMixThread(QThread):
         try:
             time_steps, waerme_ges_W, pump_results = import_results_csv(self.filename)
             ### hier erstmal Vereinfachung, Temperaturen, Drücke der Hauptzenztrale, Leistungen addieren
-            
-            qext_values = []  # Diese Liste wird alle qext_kW Arrays speichern
-            for pump_type, pumps in pump_results.items():
-                for idx, pump_data in pumps.items():
-                    if 'qext_kW' in pump_data:
-                        qext_values.append(pump_data['qext_kW'])  # Nehmen wir an, dass dies numpy Arrays sind
-                    else:
-                        print(f"Keine qext_kW Daten für {pump_type} Pumpe {idx}")
-
-                    if pump_type == "Heizentrale Haupteinspeisung":
-                        flow_temp_circ_pump = pump_data['flow_temp']
-                        return_temp_circ_pump = pump_data['return_temp']
-
-            # Überprüfen, ob die Liste nicht leer ist
-            if qext_values:
-                # Summieren aller Arrays in der Liste zu einem Summenarray
-                qext_kW = np.sum(np.array(qext_values), axis=0)
-            else:
-                qext_kW = np.array([])  # oder eine andere Form der Initialisierung, die in Ihrem Kontext sinnvoll ist
-            
+            qext_kW, flow_temp_circ_pump, return_temp_circ_pump = producer_feed_in(pump_results)
+
             calc1, calc2 = 0, len(time_steps)
             qext_kW *= self.load_scale_factor
             initial_data = time_steps, qext_kW, flow_temp_circ_pump, return_temp_circ_pump
@@ -4,25 +4,8 @@
 import numpy as np
 import pandas as pd
 
-def import_TRY(filename):
-    # Import TRY
-    # Define column widths
-    col_widths = [8, 8, 3, 3, 3, 6, 5, 4, 5, 2, 5, 4, 5, 5, 4, 5, 3]
-    # Define column names
-    col_names = ["RW", "HW", "MM", "DD", "HH", "t", "p", "WR", "WG", "N", "x", "RF", "B", "D", "A", "E", "IL"]
-
-    # Read the file
-    data = pd.read_fwf(filename, widths=col_widths, names=col_names,
-                       skiprows=34)
-
-    # Store the columns as numpy arrays
-    temperature = data['t'].values
-    windspeed = data['WG'].values
-    direct_radiation = data['B'].values
-    diffuse_radiation = data['D'].values
-    global_radiation = direct_radiation + diffuse_radiation
-
-    return temperature, windspeed, direct_radiation, global_radiation
+from utilities.time_axis import get_time_axis
+from utilities.test_reference_year import import_TRY
 
 # Constant for degree-radian conversion
 DEG_TO_RAD = np.pi / 180
@@ -30,10 +13,11 @@ DEG_TO_RAD = np.pi / 180
 def deg_to_rad(deg):
     return deg * DEG_TO_RAD
 
-def Calculate_Solar_Radiation(Irradiance_hori_L, D_L, Day_of_Year_L, Longitude, STD_Longitude, Latitude, Albedo,
-                              East_West_collector_azimuth_angle, Collector_tilt_angle):
-    # Creating an array from 1 to 24 h for 365 days
-    Hour_L = np.tile(np.arange(1, 25), 365)
+def Calculate_Sun_Geometry(Irradiance_hori_L, D_L, Day_of_Year_L, Longitude, STD_Longitude, Latitude, Hour_L=None):
+    # Sun position and horizontal radiation components, independent of the collector orientation
+    # Hour of the day from 1 to 24 h (TRY convention), derived from the number of hourly values if not given
+    if Hour_L is None:
+        Hour_L = np.arange(len(Day_of_Year_L)) % 24 + 1
 
     # Calculates the angle of the day in the annual cycle
     B = (Day_of_Year_L - 1) * 360 / 365  # °
@@ -63,6 +47,22 @@ def Calculate_Solar_Radiation(Irradiance_hori_L, D_L, Day_of_Year_L, Longitude,
                                               (np.sin(deg_to_rad(Solar_Zenith_angle)) * np.cos(deg_to_rad(Latitude)))) / \
                                     DEG_TO_RAD
 
+    # Determines the radiation portion that directly hits a horizontal surface from the sun
+    Gbhoris = D_L * np.cos(deg_to_rad(Solar_Zenith_angle))
+
+    # Determines the anisotropy index for diffuse radiation
+    Ai = Gbhoris / (1367 * (1 + 0.033 * np.cos(deg_to_rad(360 * Day_of_Year_L / 365))) *
+                    np.cos(deg_to_rad(Solar_Zenith_angle)))
+
+    # Determines the diffuse radiation part on a horizontal surface
+    Gdhoris = Irradiance_hori_L - Gbhoris
+
+    return Solar_Zenith_angle, East_West_solar_azimuth_angle, Gbhoris, Ai, Gdhoris
+
+def Calculate_Tilted_Irradiance(sun_geometry, Irradiance_hori_L, Albedo, East_West_collector_azimuth_angle, Collector_tilt_angle):
+    # Total radiation on the collector, broadcasts over collector orientations (e.g. faces x hours)
+    Solar_Zenith_angle, East_West_solar_azimuth_angle, Gbhoris, Ai, Gdhoris = sun_geometry
+
     # Calculates the incidence angle of solar radiation on the collector
     Incidence_angle_onto_collector = np.arccos(
         np.cos(deg_to_rad(Solar_Zenith_angle)) * np.cos(deg_to_rad(Collector_tilt_angle)) +
@@ -76,31 +76,25 @@ def Calculate_Solar_Radiation(Irradiance_hori_L, D_L, Day_of_Year_L, Longitude,
     function_Rb = np.cos(deg_to_rad(Incidence_angle_onto_collector)) / np.cos(deg_to_rad(Solar_Zenith_angle))
     Rb = np.where(condition, function_Rb, 0)
 
-    # Determines the radiation portion that directly hits a horizontal surface from the sun
-    Gbhoris = D_L * np.cos(deg_to_rad(Solar_Zenith_angle))
-
-    # Determines the anisotropy index for diffuse radiation
-    Ai = Gbhoris / (1367 * (1 + 0.033 * np.cos(deg_to_rad(360 * Day_of_Year_L / 365))) *
-                    np.cos(deg_to_rad(Solar_Zenith_angle)))
-
-    # Determines the diffuse radiation part on a horizontal surface
-    Gdhoris = Irradiance_hori_L - Gbhoris
-
     # Combines all radiation components to determine the total radiation intensity on the collector
     GT_H_Gk = (Gbhoris * Rb + Gdhoris * Ai * Rb + Gdhoris * (1 - Ai) * 0.5 *
                (1 + np.cos(deg_to_rad(Collector_tilt_angle))) +
                Irradiance_hori_L * Albedo * 0.5 * (1 - np.cos(deg_to_rad(Collector_tilt_angle))))
 
+    return GT_H_Gk
+
+def Calculate_Solar_Radiation(Irradiance_hori_L, D_L, Day_of_Year_L, Longitude, STD_Longitude, Latitude, Albedo,
+                              East_West_collector_azimuth_angle, Collector_tilt_angle, Hour_L=None):
+    sun_geometry = Calculate_Sun_Geometry(Irradiance_hori_L, D_L, Day_of_Year_L, Longitude, STD_Longitude, Latitude, Hour_L)
+    GT_H_Gk = Calculate_Tilted_Irradiance(sun_geometry, Irradiance_hori_L, Albedo, East_West_collector_azimuth_angle, Collector_tilt_angle)
+
     print("Total irradiation: " + str(round(np.sum(GT_H_Gk)/1000, 1)) + " kWh/m²")
 
     # Returns the total radiation intensity on the collector
     return GT_H_Gk
 
-def Calculate_PV(TRY_data, Gross_area, Longitude, STD_Longitude, Latitude, Albedo,
-                 East_West_collector_azimuth_angle, Collector_tilt_angle):
-    # Import TRY
-    Ta_L, W_L, D_L, G_L = import_TRY(TRY_data)
-
+def Calculate_PV_Power(GT_L, Ta_L, W_L, Gross_area):
+    # PV power in kW from the irradiation on the module, broadcasts over modules (e.g. faces x hours)
     # Define constants for the photovoltaic calculation.
     eff_nom = 0.199  # Nominal efficiency
     sys_loss = 0.14  # System losses
@@ -110,11 +104,6 @@ def Calculate_PV(TRY_data, Gross_area, Longitude, STD_Longitude, Latitude, Albed
     # Constants for the efficiency calculation depending on temperature and irradiation.
     k1, k2, k3, k4, k5, k6 = -0.017237, -0.040465, -0.004702, 0.000149, 0.000170, 0.000005
 
-    Day_of_Year_L = np.repeat(np.arange(1, 366), 24)
-    # Calculate the solar irradiation for the given data.
-    GT_L = Calculate_Solar_Radiation(G_L, D_L, Longitude, Day_of_Year_L, STD_Longitude, Latitude, Albedo,
-                                     East_West_collector_azimuth_angle, Collector_tilt_angle)
-
     # Calculate the average solar irradiation value (in kW/m^2).
     G1 = GT_L / 1000
 
@@ -123,16 +112,39 @@ def Calculate_PV(TRY_data, Gross_area, Longitude, STD_Longitude, Latitude, Albed
     T1m = Tm - 25
 
     # Calculate the relative efficiency considering irradiation and temperature.
-    eff_rel = np.ones_like(G1)
     non_zero_mask = G1 != 0
-    eff_rel[non_zero_mask] = 1 + k1 * np.log(G1[non_zero_mask]) + k2 * np.log(G1[non_zero_mask]) ** 2 + k3 * T1m[
-        non_zero_mask] + k4 * T1m[non_zero_mask] * np.log(G1[non_zero_mask]) + k5 * Tm[non_zero_mask] * np.log(
-        G1[non_zero_mask]) ** 2 + k6 * Tm[non_zero_mask] ** 2
-    eff_rel[~non_zero_mask] = 0
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_G1 = np.log(np.where(non_zero_mask, G1, 1))
+        eff_rel = 1 + k1 * log_G1 + k2 * log_G1 ** 2 + k3 * T1m + k4 * T1m * log_G1 + k5 * Tm * log_G1 ** 2 + k6 * Tm ** 2
+    eff_rel = np.where(non_zero_mask, eff_rel, 0)
     eff_rel = np.nan_to_num(eff_rel, nan=0)
 
     # Calculate the photovoltaic power based on irradiation, area, nominal efficiency, and relative efficiency.
-    P_L = G1 * Gross_area * eff_nom * eff_rel * (1 - sys_loss)
+    return G1 * Gross_area * eff_nom * eff_rel * (1 - sys_loss)
+
+def TRY_time_axis(year, hours):
+    # Day of year and hour (1 to 24) for the hourly TRY values. The TRY always covers 365 days,
+    # in leap years February 29 is skipped so that the calendar matches the weather data.
+    time_axis = get_time_axis(year)
+    day_of_year, hour = time_axis.day_of_year, time_axis.hour + 1
+    if time_axis.num_days == 366 and hours == 8760:
+        keep = ~((time_axis.month == 2) & (time_axis.daily(time_axis.day_of_month_daily) == 29))
+        day_of_year, hour = day_of_year[keep], hour[keep]
+    if len(day_of_year) != hours:
+        raise ValueError(f"The weather data has {hours} hourly values, the year {year} has {len(day_of_year)} hours.")
+    return day_of_year, hour
+
+def Calculate_PV(TRY_data, Gross_area, Longitude, STD_Longitude, Latitude, Albedo,
+                 East_West_collector_azimuth_angle, Collector_tilt_angle, year=2019):
+    # Import TRY
+    Ta_L, W_L, D_L, G_L = import_TRY(TRY_data)
+
+    day_of_year, hour = TRY_time_axis(year, len(G_L))
+    # Calculate the solar irradiation for the given data.
+    GT_L = Calculate_Solar_Radiation(G_L, D_L, day_of_year, Longitude, STD_Longitude, Latitude, Albedo,
+                                     East_West_collector_azimuth_angle, Collector_tilt_angle, hour)
+
+    P_L = Calculate_PV_Power(GT_L, Ta_L, W_L, Gross_area)
 
     # Determine the maximum power and total annual yield.
     P_max = np.max(P_L)
@@ -145,6 +157,48 @@ def Calculate_PV(TRY_data, Gross_area, Longitude, STD_Longitude, Latitude, Albed
     # Return the annual PV yield in kWh, maximum power, and the power list.
     return yield_kWh, P_max, P_L
 
+def Calculate_PV_batch(TRY_data, Gross_areas, Longitude, STD_Longitude, Latitude, Albedo,
+                       East_West_collector_azimuth_angles, Collector_tilt_angles, year=2019, chunk_size=512, dtype=np.float32):
+    # PV yield for many surfaces (e.g. all LOD2 roof faces) in one pass as a faces x hours matrix.
+    # The weather data is read and the sun geometry is calculated only once, the faces are processed in chunks to limit memory.
+    Ta_L, W_L, D_L, G_L = import_TRY(TRY_data) if isinstance(TRY_data, str) else TRY_data
+
+    Gross_areas, azimuths, tilts = np.broadcast_arrays(np.atleast_1d(np.asarray(Gross_areas, dtype=float)), 
+                                                       np.atleast_1d(np.asarray(East_West_collector_azimuth_angles, dtype=float)), 
+                                                       np.atleast_1d(np.asarray(Collector_tilt_angles, dtype=float)))
+
+    day_of_year, hour = TRY_time_axis(year, len(G_L))
+    sun_geometry = Calculate_Sun_Geometry(G_L, D_L, day_of_year, Longitude, STD_Longitude, Latitude, hour)
+
+    P_L = np.empty((len(Gross_areas), len(G_L)), dtype=dtype)
+    yield_kWh = np.empty(len(Gross_areas))
+    P_max = np.empty(len(Gross_areas))
+
+    for start in range(0, len(Gross_areas), chunk_size):
+        faces = slice(start, start + chunk_size)
+        GT_L = Calculate_Tilted_Irradiance(sun_geometry, G_L, Albedo, azimuths[faces, None], tilts[faces, None])
+        P_chunk = Calculate_PV_Power(GT_L, Ta_L, W_L, Gross_areas[faces, None])
+
+        P_L[faces] = P_chunk
+        yield_kWh[faces] = np.round(np.sum(P_chunk, axis=1) / 1000, 2)
+        P_max[faces] = np.round(np.max(P_chunk, axis=1), 2)
+
+    return yield_kWh, P_max, P_L
+
+def roof_normal_to_pv_azimuth(normal_azimuth):
+    # Converts the azimuth of a roof normal (0° East, counterclockwise, as in lod2/scripts/roof_area.py)
+    # to the collector azimuth used here (0° South, 90° West, 180° North, 270° East)
+    return (270 - np.asarray(normal_azimuth)) % 360
+
+def save_pv_results(output_filename, ids, Gross_areas, azimuths, tilts, yield_kWh, P_max, P_L):
+    # Columnar result file (.npz): one entry per face and the faces x hours power matrix
+    np.savez_compressed(output_filename, ID=np.asarray(ids).astype(str), area=Gross_areas, azimuth=azimuths, tilt=tilts,
+                        yield_kWh=yield_kWh, P_max=P_max, P_L=P_L)
+
+def load_pv_results(filename):
+    with np.load(filename) as data:
+        return {key: data[key] for key in data.files}
+
 def azimuth_angle(direction):
     azimuths = {
         'N': 180,
@@ -171,37 +225,46 @@ def calculate_building(TRY_data, building_data, output_filename):
 
     Collector_tilt_angle = 36
 
-    Annual_hours = np.arange(1, 8761)
+    # Collect all surfaces, "OW" (East-West) is split into two halves
+    ids, areas, azimuths = [], [], []
+    for building, area, direction in gdata:
+        directions = ["O", "W"] if azimuth_angle(direction) is None and direction == "OW" else [direction]
 
-    # Result file
-    df = pd.DataFrame()
+        for hr in directions:
+            azimuth = azimuth_angle(hr)
+            if azimuth is not None:
+                suffix = hr if direction == "OW" else ""
+                face_area = area / 2 if direction == "OW" else area
+                ids.append(f'{building} {suffix} {face_area} m^2')
+                areas.append(face_area)
+                azimuths.append(azimuth)
 
-    print("works")
-    
-    df['Annual Hours'] = Annual_hours
-    for idx, (building, area, direction) in enumerate(gdata):
-        azimuth_angle = azimuth_angle(direction)
+    yield_kWh, P_max, P_L = Calculate_PV_batch(TRY_data, areas, Longitude, STD_Longitude, Latitude, Albedo, azimuths, Collector_tilt_angle)
 
-        # In case the direction is "EW" (East-West) // German "OW"
-        if azimuth_angle is None and direction == "OW":
-            area /= 2
-            directions = ["O", "W"]
-        else:
-            directions = [direction]
+    for face_id, face_yield, face_max in zip(ids, yield_kWh, P_max):
+        print(f"PV yield {face_id}: {face_yield} MWh")
+        print(f"Maximum PV power {face_id}: {face_max} kW")
 
-        for hr in directions:
-            azimuth_angle = azimuth_angle(hr)
-            if azimuth_angle is not None:
-                yield_kWh, max_power, P_L = Calculate_PV(TRY_data, area, Longitude, STD_Longitude, Latitude, Albedo,
-                                                     azimuth_angle, Collector_tilt_angle)
+    if output_filename.endswith('.npz'):
+        save_pv_results(output_filename, ids, np.asarray(areas), np.asarray(azimuths), np.full(len(ids), Collector_tilt_angle), yield_kWh, P_max, P_L)
+    else:
+        # Wide CSV with one column per surface, built at once from the matrix
+        df = pd.DataFrame(P_L.T, columns=[f'{face_id} [kW]' for face_id in ids])
+        df.insert(0, 'Annual Hours', np.arange(1, P_L.shape[1] + 1))
+        df.to_csv(output_filename, index=False, sep=';')
 
-                suffix = hr if direction == "OW" else ""
-                print(f"PV yield {building}{suffix}: {yield} MWh")
-                print(f"Maximum PV power {building}{suffix}: {max_power} kW")
+def calculate_roof_faces(TRY_data, roof_faces, output_filename=None, Longitude=-14.4222, STD_Longitude=-15, Latitude=51.1676, Albedo=0.2, year=2019):
+    # PV yield of all roof faces, roof_faces: DataFrame with the columns ID, area (m²), inclination (°) and 
+    # normal_azimuth (° of the roof normal, see lod2/scripts/roof_area.py calculate_normal_and_angles)
+    azimuths = roof_normal_to_pv_azimuth(roof_faces['normal_azimuth'].values)
+    tilts = roof_faces['inclination'].values
+    areas = roof_faces['area'].values
+
+    yield_kWh, P_max, P_L = Calculate_PV_batch(TRY_data, areas, Longitude, STD_Longitude, Latitude, Albedo, azimuths, tilts, year)
 
-                df[f'{building} {suffix} {area} m^2 [kW]'] = P_L
+    if output_filename:
+        save_pv_results(output_filename, roof_faces['ID'].values, areas, azimuths, tilts, yield_kWh, P_max, P_L)
 
-    # Save the DataFrame after completing the loop
-    df.to_csv(output_filename, index=False, sep=';')
+    return yield_kWh, P_max, P_L
 
 # calculate_building("heating_network_generation/heat_requirement/TRY_511676144222/TRY2015_511676144222_Jahr.dat", "building_data_pv.csv", 'pv_data_results.csv')
\ No newline at end of file
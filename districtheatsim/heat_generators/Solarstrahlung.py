@@ -3,8 +3,15 @@
 # https://www.scfw.de/)
 
 # Import Bibliotheken
+import os
+import hashlib
+import zipfile
+from collections import OrderedDict
+
 import numpy as np
 
+from utilities.cache import atomar_speichern
+
 # Konstante für Grad-Radian-Konversion
 DEG_TO_RAD = np.pi / 180
 
@@ -17,6 +24,95 @@ def deg_to_rad(deg):
     """
     return deg * DEG_TO_RAD
 
+# Zwischenspeicher für bereits berechnete Strahlungsgeometrien (LRU im Speicher, optional zusätzlich als .npz auf der Festplatte)
+CACHE_GRÖSSE = 32
+CACHE_FELDER = ("GT_H_Gk", "K_beam", "GbT", "GdT_H_Dk")
+_cache = OrderedDict()
+_cache_verzeichnis = None
+
+def setze_cache_verzeichnis(pfad):
+    """
+    Aktiviert den Festplatten-Cache im angegebenen Verzeichnis, None deaktiviert ihn.
+
+    :param pfad: Verzeichnis für die .npz-Dateien
+    """
+    global _cache_verzeichnis
+    if pfad is not None:
+        os.makedirs(pfad, exist_ok=True)
+    _cache_verzeichnis = pfad
+
+def leere_cache():
+    """
+    Leert den Zwischenspeicher im Speicher. Dateien im Cache-Verzeichnis bleiben erhalten.
+    """
+    _cache.clear()
+
+def cache_schlüssel(*args):
+    """
+    Bildet einen Schlüssel aus allen Eingangsgrößen der Strahlungsberechnung.
+
+    :param args: Arrays, Zahlen und Dictionaries (IAM-Daten)
+    :return: Hexadezimaler Hashwert
+    """
+    h = hashlib.sha1()
+    for arg in args:
+        if isinstance(arg, dict):
+            h.update(repr(sorted(arg.items())).encode())
+        elif isinstance(arg, np.ndarray):
+            h.update(str(arg.dtype).encode())
+            h.update(np.ascontiguousarray(arg).tobytes())
+        else:
+            h.update(repr(float(arg)).encode())
+        h.update(b"|")
+    return h.hexdigest()
+
+def IAM_Tabelle(iam_data):
+    """
+    Wandelt ein IAM-Dictionary (Stützstellen in 10°-Schritten) in ein Array für die indizierte Interpolation um.
+    Fehlende Stützstellen und Winkel ab 100° ergeben NaN.
+
+    :param iam_data: Dictionary mit Einstrahlungs-Winkelabhängigkeitsdaten
+    :return: Array mit den IAM-Werten je 10°-Stufe
+    """
+    tabelle = np.full(12, np.nan)
+    for winkel, wert in iam_data.items():
+        if winkel % 10 == 0 and 0 <= winkel <= 100:
+            tabelle[int(winkel // 10)] = wert
+    return tabelle
+
+def IAM(Incidence_angle, tabelle):
+    """
+    Lineare Interpolation der IAM-Werte zwischen den 10°-Stützstellen.
+
+    :param Incidence_angle: Einfallswinkel (°)
+    :param tabelle: IAM-Tabelle aus IAM_Tabelle
+    :return: IAM-Werte
+    """
+    winkel = np.abs(Incidence_angle)
+    sverweis_1 = winkel - winkel % 10
+    sverweis_3 = (winkel + 10) - (winkel + 10) % 10
+
+    # Stützstellen außerhalb der Tabelle zeigen auf den letzten Eintrag (NaN)
+    index_1 = np.where(np.isfinite(sverweis_1), np.minimum(sverweis_1 // 10, len(tabelle) - 1), len(tabelle) - 1).astype(int)
+    index_3 = np.where(np.isfinite(sverweis_3), np.minimum(sverweis_3 // 10, len(tabelle) - 1), len(tabelle) - 1).astype(int)
+    sverweis_2 = tabelle[index_1]
+    sverweis_4 = tabelle[index_3]
+
+    return sverweis_2 + (winkel - sverweis_1) / (sverweis_3 - sverweis_1) * (sverweis_4 - sverweis_2)
+
+def lese_cache_datei(dateiname):
+    """
+    Liest eine .npz-Datei des Festplatten-Caches. Fehlende, unvollständige oder beschädigte Dateien gelten als nicht vorhanden.
+
+    :param dateiname: Pfad der .npz-Datei
+    :return: Ergebnis wie Berechnung_Solarstrahlung oder None
+    """
+    try:
+        with np.load(dateiname) as daten:
+            return tuple(daten[name] for name in CACHE_FELDER)
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+        return None
+
 def Berechnung_Solarstrahlung(Globalstrahlung_L, D_L, Tag_des_Jahres_L, time_steps, Longitude, STD_Longitude, Latitude, Albedo, IAM_W, IAM_N,
                               EWCaa, CTA):
     """
@@ -38,8 +134,43 @@ def Berechnung_Solarstrahlung(Globalstrahlung_L, D_L, Tag_des_Jahres_L, time_ste
     :param CTA: Neigungswinkel des Kollektors (°)
     :return: Gesamtstrahlung auf der schrägen Oberfläche, Einstrahlungsfaktor, Direkte Strahlung auf der schrägen Oberfläche,
     Diffuse Strahlung auf der schrägen Oberfläche
+
+    Die Ergebnisse werden anhand aller Eingangsgrößen zwischengespeichert und schreibgeschützt zurückgegeben.
     """
-    
+    Globalstrahlung_L, D_L = np.asarray(Globalstrahlung_L), np.asarray(D_L)
+    Tag_des_Jahres_L, time_steps = np.asarray(Tag_des_Jahres_L), np.asarray(time_steps)
+
+    schlüssel = cache_schlüssel(Globalstrahlung_L, D_L, Tag_des_Jahres_L, time_steps, Longitude, STD_Longitude, Latitude, Albedo, 
+                                IAM_W, IAM_N, EWCaa, CTA)
+
+    if schlüssel in _cache:
+        _cache.move_to_end(schlüssel)
+        return _cache[schlüssel]
+
+    dateiname = os.path.join(_cache_verzeichnis, f"Solarstrahlung_{schlüssel}.npz") if _cache_verzeichnis else None
+    ergebnis = lese_cache_datei(dateiname) if dateiname else None
+    if ergebnis is None:
+        ergebnis = _Berechnung_Solarstrahlung(Globalstrahlung_L, D_L, Tag_des_Jahres_L, time_steps, Longitude, STD_Longitude, Latitude, Albedo, 
+                                              IAM_Tabelle(IAM_W), IAM_Tabelle(IAM_N), EWCaa, CTA)
+        if dateiname:
+            try:
+                atomar_speichern(dateiname, lambda datei: np.savez(datei, **dict(zip(CACHE_FELDER, ergebnis))))
+            except OSError:
+                # z.B. kein Schreibrecht, das Ergebnis bleibt dann nur im Speicher
+                pass
+
+    for werte in ergebnis:
+        werte.setflags(write=False)
+
+    _cache[schlüssel] = ergebnis
+    if len(_cache) > CACHE_GRÖSSE:
+        _cache.popitem(last=False)
+
+    return ergebnis
+
+def _Berechnung_Solarstrahlung(Globalstrahlung_L, D_L, Tag_des_Jahres_L, time_steps, Longitude, STD_Longitude, Latitude, Albedo, IAM_W, IAM_N,
+                               EWCaa, CTA):
+    # Eigentliche Berechnung, IAM_W und IAM_N als Tabellen aus IAM_Tabelle
     Stunde_L = (time_steps - time_steps.astype('datetime64[D]')).astype('timedelta64[m]').astype(float) / 60
 
     # Berechnet den Tag des Jahres als Winkel
@@ -85,16 +216,6 @@ def Berechnung_Solarstrahlung(Globalstrahlung_L, D_L, Tag_des_Jahres_L, time_ste
     Incidence_angle_EW = np.where(condition, f_EW, 89.999)
     Incidence_angle_NS = np.where(condition, f_NS, 89.999)
 
-    def IAM(Incidence_angle, iam_data):
-        sverweis_1 = np.abs(Incidence_angle) - np.abs(Incidence_angle) % 10
-        sverweis_2 = np.vectorize(iam_data.get)(sverweis_1)
-        sverweis_3 = (np.abs(Incidence_angle) + 10) - (np.abs(Incidence_angle) + 10) % 10
-        sverweis_4 = np.vectorize(iam_data.get)(sverweis_3)
-
-        ergebnis = sverweis_2 + (np.abs(Incidence_angle) - sverweis_1) / (sverweis_3 - sverweis_1) * (sverweis_4 -
-                                                                                                      sverweis_2)
-        return ergebnis
-
     # Für IAM_EW
     IAM_EW = IAM(Incidence_angle_EW, IAM_W)
     # Für IAM_NS
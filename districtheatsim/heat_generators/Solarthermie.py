@@ -4,124 +4,32 @@
 # Import Bibliotheken
 from math import pi, exp, log, sqrt
 import numpy as np
-from datetime import datetime, timezone
 
 from heat_generators.Solarstrahlung import Berechnung_Solarstrahlung
+from heat_generators.jit import jit, rechenkern
+from utilities.time_axis import day_of_year
+from utilities.test_reference_year import TRY_Zeitschritte
     
-def Berechnung_STA(Bruttofläche_STA, VS, Typ, Last_L, VLT_L, RLT_L, TRY, time_steps, calc1, calc2, duration, Tsmax=90, Longitude=-14.4222, STD_Longitude=-15, Latitude=51.1676,
-                   East_West_collector_azimuth_angle=0, Collector_tilt_angle=36, Tm_rl=60, Qsa=0, Vorwärmung_K=8, DT_WT_Solar_K=5, DT_WT_Netz_K=5):
-    Temperatur_L, Windgeschwindigkeit_L, Direktstrahlung_L, Globalstrahlung_L = TRY[0], TRY[1], TRY[2], TRY[3]
-
-    # Bestimmen Sie das kleinste Zeitintervall in time_steps
-    min_interval = np.min(np.diff(time_steps)).astype('timedelta64[m]').astype(int)
-
-    # Anpassen der stündlichen Werte an die time_steps
-    # Wiederholen der stündlichen Werte entsprechend des kleinsten Zeitintervalls
-    repeat_factor = 60 // min_interval  # Annahme: min_interval teilt 60 ohne Rest
-    Temperatur_L = np.repeat(Temperatur_L, repeat_factor)[calc1:calc2]
-    Windgeschwindigkeit_L = np.repeat(Windgeschwindigkeit_L, repeat_factor)[calc1:calc2]
-    Direktstrahlung_L = np.repeat(Direktstrahlung_L, repeat_factor)[calc1:calc2]
-    Globalstrahlung_L = np.repeat(Globalstrahlung_L, repeat_factor)[calc1:calc2]
-
-    if Bruttofläche_STA == 0 or VS == 0:
-        return 0, np.zeros_like(Last_L), np.zeros_like(Last_L), np.zeros_like(Last_L)
-    
-    Tag_des_Jahres_L = np.array([datetime.fromtimestamp(t.astype('datetime64[s]').astype(np.int64), tz=timezone.utc).timetuple().tm_yday for t in time_steps])
-
-    # Definition Albedo-Wert
-    Albedo = 0.2
-    # Definition Korrekturfaktor Windgeschwindigkeit
-    wcorr = 0.5
-
-    if Typ == "Flachkollektor":
-        # Vorgabewerte Flachkollektor Vitosol 200-F XL13
-        # Bruttofläche ist Bezugsfläche
-        Eta0b_neu = 0.763
-        Kthetadiff = 0.931
-        Koll_c1 = 1.969
-        Koll_c2 = 0.015
-        Koll_c3 = 0
-        KollCeff_A = 9.053
-        KollAG = 13.17
-        KollAAp = 12.35
-
-        Aperaturfläche = Bruttofläche_STA * (KollAAp / KollAG)
-        Bezugsfläche = Bruttofläche_STA
-
-        IAM_W = {0: 1, 10: 1, 20: 0.99, 30: 0.98, 40: 0.96, 50: 0.91, 60: 0.82, 70: 0.53, 80: 0.27, 90: 0.0}
-        IAM_N = {0: 1, 10: 1, 20: 0.99, 30: 0.98, 40: 0.96, 50: 0.91, 60: 0.82, 70: 0.53, 80: 0.27, 90: 0.0}
-
-    if Typ == "Vakuumröhrenkollektor":
-        # Vorgabewerte Vakuumröhrenkollektor
-        # Aperaturfläche ist Bezugsfläche
-        Eta0hem = 0.688
-        a1 = 0.583
-        a2 = 0.003
-        KollCeff_A = 8.78
-        KollAG = 4.94
-        KollAAp = 4.5
-
-        Koll_c1 = a1
-        Koll_c2 = a2
-        Koll_c3 = 0
-        Eta0b_neu = 0.693
-        Kthetadiff = 0.951
-
-        Aperaturfläche = Bruttofläche_STA * (KollAAp / KollAG)
-        Bezugsfläche = Aperaturfläche
-
-        IAM_W = {0: 1, 10: 1.02, 20: 1.03, 30: 1.03, 40: 1.03, 50: 0.96, 60: 1.07, 70: 1.19, 80: 0.595, 90: 0.0}
-        IAM_N = {0: 1, 10: 1, 20: 0.99, 30: 0.96, 40: 0.93, 50: 0.9, 60: 0.87, 70: 0.86, 80: 0.43, 90: 0.0}
-
-    # Vorgabewerte Rohrleitungen
-    Y_R = 2  # 1 oberirdisch, 2 erdverlegt, 3...
-    Lrbin_E = 80
-    Drbin_E = 0.1071
-    P_KR_E = 0.26
-
-    AR = Lrbin_E * Drbin_E * 3.14
-    KR_E = P_KR_E * Lrbin_E / AR
-    VRV_bin = Lrbin_E * (Drbin_E / 2) ** 2 * 3.14
-
-    D46 = 0.035
-    D47 = D46 / KR_E / 2
-    L_Erdreich = 2
-    D49 = 0.8
-    D51 = L_Erdreich / D46 * log((Drbin_E / 2 + D47) / (Drbin_E / 2))
-    D52 = log(2 * D49 / (Drbin_E / 2 + D47)) + D51 + log(sqrt(1 + (D49 / Drbin_E) ** 2))
-    hs_RE = 1 / D52
-    D54 = 2 * pi * L_Erdreich * hs_RE
-    D55 = 2 * D54
-    D56 = pi * (Drbin_E + 2 * D47)
-    Keq_RE = D55 / D56
-    CRK = VRV_bin * 3790 / 3.6 / AR  # 3790 für Glykol, 4180 für Wasser
-
-    # Interne Verrohrung
-    VRV = 0.0006
-    KK = 0.06
-    CKK = VRV * 3790 / 3.6
-
-    # Vorgabewerte Speicher
-    QSmax = 1.16 * VS * (Tsmax - Tm_rl)
+@jit
+def _STA_Zeitschritte(Tag_des_Jahres_L, K_beam_L, GbT_L, GdT_H_Dk_L, Temperatur_L, Windgeschwindigkeit_L, Last_L, VLT_L, RLT_L, duration,
+                      Eta0b_neu, Kthetadiff, Koll_c1, Koll_c2, Koll_c3, KollCeff_A, Bezugsfläche, wcorr, Lrbin_E, VRV_bin, L_Erdreich, hs_RE,
+                      Keq_RE, CRK, VRV, KK, CKK, VS, QSmax, Tsmax, Tm_rl, Qsa, Vorwärmung_K, DT_WT_Solar_K, DT_WT_Netz_K):
+    # Zeitschrittweise Berechnung von Kollektorfeld, Rohrleitungsverlusten und Speicher
+    # Wird je nach engine als reiner Python-Code oder mit numba kompiliert ausgeführt
+    n = len(Last_L)
+    Speicher_Wärmeoutput_L = np.zeros(n)
+    Speicherladung_L = np.zeros(n)
+    Speicherfüllstand_L = np.zeros(n)
+    Gesamtwärmemenge = 0.0
+
+    for i in range(n):
+        Tag_des_Jahres, K_beam, GbT, GdT_H_Dk = Tag_des_Jahres_L[i], K_beam_L[i], GbT_L[i], GdT_H_Dk_L[i]
+        Temperatur, Windgeschwindigkeit, Last, VLT, RLT = Temperatur_L[i], Windgeschwindigkeit_L[i], Last_L[i], VLT_L[i], RLT_L[i]
 
-    GT_H_Gk, K_beam_L, GbT_L, GdT_H_Dk_L = Berechnung_Solarstrahlung(Globalstrahlung_L, Direktstrahlung_L, 
-                                                                     Tag_des_Jahres_L, time_steps, Longitude,
-                                                                     STD_Longitude, Latitude, Albedo, IAM_W, IAM_N,
-                                                                     East_West_collector_azimuth_angle,
-                                                                     Collector_tilt_angle)
-
-    Speicher_Wärmeoutput_L = []
-    Speicherladung_L = []
-    Speicherfüllstand_L = []
-    Gesamtwärmemenge = 0
-
-    Zähler = 0
-
-    for Tag_des_Jahres, K_beam, GbT, GdT_H_Dk, Temperatur, Windgeschwindigkeit, Last, VLT, RLT in zip(Tag_des_Jahres_L, K_beam_L, GbT_L, GdT_H_Dk_L, Temperatur_L, Windgeschwindigkeit_L, Last_L, VLT_L, RLT_L):
         Eta0b_neu_K_beam_GbT = Eta0b_neu * K_beam * GbT
         Eta0b_neu_Kthetadiff_GdT_H_Dk = Eta0b_neu * Kthetadiff * GdT_H_Dk
 
-        if Zähler < 1:
+        if i < 1:
             TS_unten = RLT
             Zieltemperatur_Solaranlage = TS_unten + Vorwärmung_K + DT_WT_Solar_K + DT_WT_Netz_K
             TRL_Solar = RLT
@@ -328,11 +236,358 @@ def Berechnung_STA(Bruttofläche_STA, VS, Typ, Last_L, VLT_L, RLT_L, TRY, time_s
 
             S_HFG = QS / QSmax  # Speicherfüllungsgrad
 
-        Speicherfüllstand_L.append(S_HFG)
-        Speicherladung_L.append(QS)
-        Speicher_Wärmeoutput_L.append(PSout)
+        Speicherfüllstand_L[i] = S_HFG
+        Speicherladung_L[i] = QS
+        Speicher_Wärmeoutput_L[i] = PSout
         Gesamtwärmemenge += (PSout / 1000) * duration
 
-        Zähler += 1
+    return Gesamtwärmemenge, Speicher_Wärmeoutput_L, Speicherladung_L, Speicherfüllstand_L
+
+def Wetterdaten_STA(TRY, time_steps, calc1, calc2):
+    Temperatur_L, Windgeschwindigkeit_L, Direktstrahlung_L, Globalstrahlung_L = TRY[0], TRY[1], TRY[2], TRY[3]
+
+    # Bestimmen Sie das kleinste Zeitintervall in time_steps
+    min_interval = np.min(np.diff(time_steps)).astype('timedelta64[m]').astype(int)
+
+    # Anpassen der stündlichen Werte an die time_steps
+    # Wiederholen der stündlichen Werte entsprechend des kleinsten Zeitintervalls
+    repeat_factor = 60 // min_interval  # Annahme: min_interval teilt 60 ohne Rest
+    dateiname = getattr(TRY, "dateiname", None)
+    if dateiname is not None:
+        # aus import_TRY: zwischengespeicherte, schreibgeschützte Zeitschritte je Datei
+        werte = TRY_Zeitschritte(dateiname, repeat_factor)
+        Temperatur_L, Windgeschwindigkeit_L, Direktstrahlung_L, Globalstrahlung_L = werte["t"], werte["WG"], werte["B"], werte["G"]
+    else:
+        Temperatur_L = np.repeat(Temperatur_L, repeat_factor)
+        Windgeschwindigkeit_L = np.repeat(Windgeschwindigkeit_L, repeat_factor)
+        Direktstrahlung_L = np.repeat(Direktstrahlung_L, repeat_factor)
+        Globalstrahlung_L = np.repeat(Globalstrahlung_L, repeat_factor)
+
+    Temperatur_L, Windgeschwindigkeit_L = Temperatur_L[calc1:calc2], Windgeschwindigkeit_L[calc1:calc2]
+    Direktstrahlung_L, Globalstrahlung_L = Direktstrahlung_L[calc1:calc2], Globalstrahlung_L[calc1:calc2]
+
+    return Temperatur_L, Windgeschwindigkeit_L, Direktstrahlung_L, Globalstrahlung_L
+
+def Kollektordaten(Typ):
+    # Gibt Kollektorkennwerte, IAM-Tabellen und das Verhältnis Bezugsfläche zu Bruttofläche zurück
+    if Typ == "Flachkollektor":
+        # Vorgabewerte Flachkollektor Vitosol 200-F XL13
+        # Bruttofläche ist Bezugsfläche
+        Eta0b_neu = 0.763
+        Kthetadiff = 0.931
+        Koll_c1 = 1.969
+        Koll_c2 = 0.015
+        Koll_c3 = 0
+        KollCeff_A = 9.053
+        KollAG = 13.17
+        KollAAp = 12.35
+
+        Bezugsfläche_Anteil = 1
+
+        IAM_W = {0: 1, 10: 1, 20: 0.99, 30: 0.98, 40: 0.96, 50: 0.91, 60: 0.82, 70: 0.53, 80: 0.27, 90: 0.0}
+        IAM_N = {0: 1, 10: 1, 20: 0.99, 30: 0.98, 40: 0.96, 50: 0.91, 60: 0.82, 70: 0.53, 80: 0.27, 90: 0.0}
+
+    if Typ == "Vakuumröhrenkollektor":
+        # Vorgabewerte Vakuumröhrenkollektor
+        # Aperaturfläche ist Bezugsfläche
+        Eta0hem = 0.688
+        a1 = 0.583
+        a2 = 0.003
+        KollCeff_A = 8.78
+        KollAG = 4.94
+        KollAAp = 4.5
+
+        Koll_c1 = a1
+        Koll_c2 = a2
+        Koll_c3 = 0
+        Eta0b_neu = 0.693
+        Kthetadiff = 0.951
+
+        Bezugsfläche_Anteil = KollAAp / KollAG
+
+        IAM_W = {0: 1, 10: 1.02, 20: 1.03, 30: 1.03, 40: 1.03, 50: 0.96, 60: 1.07, 70: 1.19, 80: 0.595, 90: 0.0}
+        IAM_N = {0: 1, 10: 1, 20: 0.99, 30: 0.96, 40: 0.93, 50: 0.9, 60: 0.87, 70: 0.86, 80: 0.43, 90: 0.0}
+
+    return Eta0b_neu, Kthetadiff, Koll_c1, Koll_c2, Koll_c3, KollCeff_A, Bezugsfläche_Anteil, IAM_W, IAM_N
+
+def Rohrleitungsdaten():
+    # Vorgabewerte Rohrleitungen
+    Y_R = 2  # 1 oberirdisch, 2 erdverlegt, 3...
+    Lrbin_E = 80
+    Drbin_E = 0.1071
+    P_KR_E = 0.26
+
+    AR = Lrbin_E * Drbin_E * 3.14
+    KR_E = P_KR_E * Lrbin_E / AR
+    VRV_bin = Lrbin_E * (Drbin_E / 2) ** 2 * 3.14
+
+    D46 = 0.035
+    D47 = D46 / KR_E / 2
+    L_Erdreich = 2
+    D49 = 0.8
+    D51 = L_Erdreich / D46 * log((Drbin_E / 2 + D47) / (Drbin_E / 2))
+    D52 = log(2 * D49 / (Drbin_E / 2 + D47)) + D51 + log(sqrt(1 + (D49 / Drbin_E) ** 2))
+    hs_RE = 1 / D52
+    D54 = 2 * pi * L_Erdreich * hs_RE
+    D55 = 2 * D54
+    D56 = pi * (Drbin_E + 2 * D47)
+    Keq_RE = D55 / D56
+    CRK = VRV_bin * 3790 / 3.6 / AR  # 3790 für Glykol, 4180 für Wasser
+
+    # Interne Verrohrung
+    VRV = 0.0006
+    KK = 0.06
+    CKK = VRV * 3790 / 3.6
+
+    return Lrbin_E, VRV_bin, L_Erdreich, hs_RE, Keq_RE, CRK, VRV, KK, CKK
+
+def Berechnung_STA(Bruttofläche_STA, VS, Typ, Last_L, VLT_L, RLT_L, TRY, time_steps, calc1, calc2, duration, Tsmax=90, Longitude=-14.4222, STD_Longitude=-15, Latitude=51.1676,
+                   East_West_collector_azimuth_angle=0, Collector_tilt_angle=36, Tm_rl=60, Qsa=0, Vorwärmung_K=8, DT_WT_Solar_K=5, DT_WT_Netz_K=5, engine="python"):
+    # engine: "python" für den reinen Python-Rechenkern, "numba" für den kompilierten Rechenkern (gleiche Ergebnisse)
+    Temperatur_L, Windgeschwindigkeit_L, Direktstrahlung_L, Globalstrahlung_L = Wetterdaten_STA(TRY, time_steps, calc1, calc2)
+
+    if Bruttofläche_STA == 0 or VS == 0:
+        return 0, np.zeros_like(Last_L), np.zeros_like(Last_L), np.zeros_like(Last_L)
+    
+    Tag_des_Jahres_L = day_of_year(time_steps)
+
+    # Definition Albedo-Wert
+    Albedo = 0.2
+    # Definition Korrekturfaktor Windgeschwindigkeit
+    wcorr = 0.5
+
+    Eta0b_neu, Kthetadiff, Koll_c1, Koll_c2, Koll_c3, KollCeff_A, Bezugsfläche_Anteil, IAM_W, IAM_N = Kollektordaten(Typ)
+    Bezugsfläche = Bruttofläche_STA * Bezugsfläche_Anteil
+
+    Lrbin_E, VRV_bin, L_Erdreich, hs_RE, Keq_RE, CRK, VRV, KK, CKK = Rohrleitungsdaten()
+
+    # Vorgabewerte Speicher
+    QSmax = 1.16 * VS * (Tsmax - Tm_rl)
+
+    GT_H_Gk, K_beam_L, GbT_L, GdT_H_Dk_L = Berechnung_Solarstrahlung(Globalstrahlung_L, Direktstrahlung_L, 
+                                                                     Tag_des_Jahres_L, time_steps, Longitude,
+                                                                     STD_Longitude, Latitude, Albedo, IAM_W, IAM_N,
+                                                                     East_West_collector_azimuth_angle,
+                                                                     Collector_tilt_angle)
+
+    kernel = rechenkern(_STA_Zeitschritte, engine)
+    Gesamtwärmemenge, Speicher_Wärmeoutput_L, Speicherladung_L, Speicherfüllstand_L = kernel(
+        np.asarray(Tag_des_Jahres_L, dtype=np.int64), np.asarray(K_beam_L, dtype=np.float64), np.asarray(GbT_L, dtype=np.float64),
+        np.asarray(GdT_H_Dk_L, dtype=np.float64), np.asarray(Temperatur_L, dtype=np.float64), np.asarray(Windgeschwindigkeit_L, dtype=np.float64),
+        np.asarray(Last_L, dtype=np.float64), np.asarray(VLT_L, dtype=np.float64), np.asarray(RLT_L, dtype=np.float64), float(duration),
+        Eta0b_neu, Kthetadiff, Koll_c1, Koll_c2, Koll_c3, KollCeff_A, Bezugsfläche, wcorr, Lrbin_E, VRV_bin, L_Erdreich, hs_RE,
+        Keq_RE, CRK, VRV, KK, CKK, VS, QSmax, Tsmax, Tm_rl, Qsa, Vorwärmung_K, DT_WT_Solar_K, DT_WT_Netz_K)
+
+    return Gesamtwärmemenge, Speicher_Wärmeoutput_L, Speicherladung_L, Speicherfüllstand_L
+
+def _STA_Zeitschritte_batch(Tag_des_Jahres_L, K_beam_L, GbT_L, GdT_H_Dk_L, Temperatur_L, Windgeschwindigkeit_L, Last_L, VLT_L, RLT_L, duration,
+                            Eta0b_neu, Kthetadiff, Koll_c1, Koll_c2, Koll_c3, KollCeff_A, Bezugsfläche, wcorr, Lrbin_E, VRV_bin, L_Erdreich, hs_RE,
+                            Keq_RE, CRK, VRV, KK, CKK, VS, QSmax, Tsmax, Tm_rl, Qsa, Vorwärmung_K, DT_WT_Solar_K, DT_WT_Netz_K):
+    # Gleicher Rechengang wie _STA_Zeitschritte, jedoch für alle Auslegungsvarianten (Bezugsfläche, VS, QSmax als Arrays) im Gleichschritt
+    n, m = len(Last_L), len(Bezugsfläche)
+    Speicher_Wärmeoutput_L = np.zeros((m, n))
+    Speicherladung_L = np.zeros((m, n))
+    Speicherfüllstand_L = np.zeros((m, n))
+
+    exp_koll = exp(-Koll_c1 / KollCeff_A * 3.6)
+    exp_bin = exp(-Keq_RE / CRK)
+    exp_int = exp(-KK / CKK)
+
+    for i in range(n):
+        Tag_des_Jahres, K_beam, GbT, GdT_H_Dk = Tag_des_Jahres_L[i], K_beam_L[i], GbT_L[i], GdT_H_Dk_L[i]
+        Temperatur, Windgeschwindigkeit, Last, VLT, RLT = Temperatur_L[i], Windgeschwindigkeit_L[i], Last_L[i], VLT_L[i], RLT_L[i]
+
+        Eta0b_neu_K_beam_GbT = Eta0b_neu * K_beam * GbT
+        Eta0b_neu_Kthetadiff_GdT_H_Dk = Eta0b_neu * Kthetadiff * GdT_H_Dk
+
+        if i < 1:
+            Zieltemperatur_Solaranlage = np.full(m, RLT + Vorwärmung_K + DT_WT_Solar_K + DT_WT_Netz_K)
+            Tm_a = (Zieltemperatur_Solaranlage + RLT) / 2
+            Tgkoll_a = np.full(m, 9.3)
+            T_koll_a = Temperatur - (Temperatur - Tgkoll_a) * exp_koll
+            T_koll_b = np.full(m, Temperatur - Temperatur * exp_koll)
+            Tgkoll = np.full(m, 9.3)  # Kollektortemperatur im Gleichgewicht
+
+            TRV_bin_vl = TRV_bin_rl = TRV_int_vl = TRV_int_rl = np.full(m, Temperatur)
+            Summe_PRV = np.zeros(m)  # Rohrleitungsverluste aufsummiert
+            Kollektorfeldertrag = np.zeros(m)
+            PSout = np.full(m, min(0, Last))
+            QS = np.full(m, Qsa * 1000.0)
+            PSV = np.zeros(m)
+            Tag_des_Jahres_alt = Tag_des_Jahres
+            Stagnation = np.zeros(m, dtype=bool)
+            S_HFG = QS / QSmax  # Speicherfüllungsgrad
+
+        else:
+            T_koll_a_alt = T_koll_a
+            T_koll_b_alt = T_koll_b
+            Tgkoll_a_alt = Tgkoll_a
+            Tgkoll_alt = Tgkoll
+            Summe_PRV_alt = Summe_PRV
+            Zieltemperatur_Solaranlage_alt = Zieltemperatur_Solaranlage
+            Kollektorfeldertrag_alt = Kollektorfeldertrag
+
+            # Speichertemperatur unten
+            TS_unten = np.where(QS/QSmax >= 0.8,
+                                RLT + DT_WT_Netz_K + (2/3 * (VLT - RLT) / 0.2 * QS/QSmax) + (1 / 3 * (VLT - RLT)) - (2/3 * (VLT - RLT) / 0.2 * QS/QSmax),
+                                RLT + DT_WT_Netz_K + (1 / 3 * (VLT - RLT) / 0.8) * QS/QSmax)
+
+            Zieltemperatur_Solaranlage = TS_unten + Vorwärmung_K + DT_WT_Solar_K + DT_WT_Netz_K
+            TRL_Solar = TS_unten + DT_WT_Solar_K
+
+            # Kollektor A
+            dT = Tm_a - Temperatur
+            Pkoll_a = np.maximum(0, (Eta0b_neu_K_beam_GbT + Eta0b_neu_Kthetadiff_GdT_H_Dk - Koll_c1 * dT - Koll_c2 * dT ** 2 - Koll_c3 * wcorr * Windgeschwindigkeit * dT) * Bezugsfläche / 1000)
+            T_koll_a = Temperatur - (Temperatur - Tgkoll_a_alt) * exp_koll + (Pkoll_a * 3600) / (KollCeff_A * Bezugsfläche)
+
+            # Kollektor B
+            dT = T_koll_b_alt - Temperatur
+            Pkoll_b = np.maximum(0, (Eta0b_neu_K_beam_GbT + Eta0b_neu_Kthetadiff_GdT_H_Dk - Koll_c1 * dT - Koll_c2 * dT ** 2 - Koll_c3 * wcorr * Windgeschwindigkeit * dT) * Bezugsfläche / 1000)
+            T_koll_b = Temperatur - (Temperatur - Tgkoll_a_alt) * exp_koll + (Pkoll_b * 3600) / (KollCeff_A * Bezugsfläche)
+
+            Tgkoll_a = np.minimum(Zieltemperatur_Solaranlage, T_koll_a)
+            Tm_a = (Zieltemperatur_Solaranlage + TRL_Solar) / 2
+
+            # mittlere Kollektortemperatur
+            Tm_koll_alt = (T_koll_a_alt + T_koll_b_alt) / 2
+            Tm_koll = (T_koll_a + T_koll_b) / 2
+            Tm_sys = (Zieltemperatur_Solaranlage + TRL_Solar) / 2
+            Tm = np.where((Tm_koll < Tm_sys) & (Tm_koll_alt < Tm_sys), Tm_koll, Tm_sys)
+
+            # Kollektorleistung und Kollektortemperatur
+            dT = Tm - Temperatur
+            Pkoll = np.maximum(0, (Eta0b_neu_K_beam_GbT + Eta0b_neu_Kthetadiff_GdT_H_Dk - Koll_c1 * dT - Koll_c2 * dT ** 2 - Koll_c3 * wcorr * Windgeschwindigkeit * dT) * Bezugsfläche / 1000)
+            T_koll = Temperatur - (Temperatur - Tgkoll) * exp_koll + (Pkoll * 3600) / (KollCeff_A * Bezugsfläche)
+            Tgkoll = np.minimum(Zieltemperatur_Solaranlage, T_koll)
+
+            ziel_erreich = (Tgkoll >= Zieltemperatur_Solaranlage) & (Pkoll > 0)
+            ziel_erhöht = Zieltemperatur_Solaranlage >= Zieltemperatur_Solaranlage_alt
+
+            # Verluste Verbindungsleitung
+            TRV_bin_vl_alt = TRV_bin_vl
+            TRV_bin_rl_alt = TRV_bin_rl
+            TRV_bin_vl = np.where(ziel_erreich, Zieltemperatur_Solaranlage, Temperatur - (Temperatur - TRV_bin_vl_alt) * exp_bin)
+            TRV_bin_rl = np.where(ziel_erreich, TRL_Solar, Temperatur - (Temperatur - TRV_bin_rl_alt) * exp_bin)
+
+            P_RVT_bin = Lrbin_E / 1000 * ((TRV_bin_vl + TRV_bin_rl) / 2 - Temperatur) * 2 * pi * L_Erdreich * hs_RE
+            P_RVK_bin_vl = np.where(ziel_erhöht, np.maximum((TRV_bin_vl_alt - TRV_bin_vl) * VRV_bin * 3790 / 3600, 0), 0)
+            P_RVK_bin_rl = np.where(ziel_erhöht, np.maximum((TRV_bin_rl_alt - TRV_bin_rl) * VRV_bin * 3790 / 3600, 0), 0)
+
+            # Verluste interne Rohrleitungen
+            TRV_int_vl_alt = TRV_int_vl
+            TRV_int_rl_alt = TRV_int_rl
+            TRV_int_vl = np.where(ziel_erreich, Zieltemperatur_Solaranlage, Temperatur - (Temperatur - TRV_int_vl_alt) * exp_int)
+            TRV_int_rl = np.where(ziel_erreich, TRL_Solar, Temperatur - (Temperatur - TRV_int_rl_alt) * exp_int)
+
+            P_RVT_int_vl = (TRV_int_vl - Temperatur) * KK * Bezugsfläche / 1000 / 2
+            P_RVT_int_rl = (TRV_int_rl - Temperatur) * KK * Bezugsfläche / 1000 / 2
+            P_RVK_int_vl = np.where(ziel_erhöht, np.maximum((TRV_int_vl_alt - TRV_int_vl) * VRV * Bezugsfläche / 2 * 3790 / 3600, 0), 0)
+            P_RVK_int_rl = np.where(ziel_erhöht, np.maximum((TRV_int_rl_alt - TRV_int_rl) * VRV * Bezugsfläche / 2 * 3790 / 3600, 0), 0)
+
+            PRV = np.maximum(np.maximum(P_RVT_bin, P_RVK_bin_vl), 0) + np.maximum(np.maximum(P_RVT_bin, P_RVK_bin_rl), 0) + \
+                  np.maximum(np.maximum(P_RVT_int_vl, P_RVK_int_vl), 0) + np.maximum(np.maximum(P_RVT_int_rl, P_RVK_int_rl), 0)  # Rohrleitungsverluste
+
+            # Kollektorfeldertrag
+            Anteil = np.where(Tgkoll >= Zieltemperatur_Solaranlage, (T_koll - Tgkoll) / np.where(T_koll > Tgkoll_alt, T_koll - Tgkoll_alt, 1) * Pkoll, 0)
+            Kollektorfeldertrag = np.where((T_koll > Tgkoll_alt) & ~Stagnation, np.maximum(0, np.minimum(Pkoll, Anteil)), 0)
+
+            # Rohrleitungsverluste aufsummiert
+            Summe_PRV = np.where(((Kollektorfeldertrag == 0) & (Kollektorfeldertrag_alt == 0)) | (Kollektorfeldertrag <= Summe_PRV_alt),
+                                 PRV + Summe_PRV_alt - Kollektorfeldertrag, PRV)
+            Zwischenwert = np.where(Kollektorfeldertrag > Summe_PRV_alt, Kollektorfeldertrag - Summe_PRV_alt, 0)
+
+            PSout = np.where(Zwischenwert + QS > 0, np.minimum(Zwischenwert + QS, Last), 0)
+            Zwischenwert_Stag_verl = np.maximum(0, QS - PSV + Zwischenwert - PSout - QSmax)
+            PSin = Zwischenwert - Zwischenwert_Stag_verl
+
+            QS = np.minimum(QS - PSV + PSin - PSout, QSmax)
+
+            # Mitteltemperatur im Speicher
+            S = QS / QSmax
+            value2 = Zieltemperatur_Solaranlage - DT_WT_Solar_K
+            value3 = (value2 - Tm_rl) / (Tsmax - Tm_rl)
+            ergebnis1 = np.where(QS <= 0, value2, np.where(S < value3, VLT + DT_WT_Netz_K, Tsmax))
+            Tms = S * ergebnis1 + (1 - S) * TS_unten
+
+            PSV = 0.75 * (VS * 1000) ** 0.5 * 0.16 * (Tms - Temperatur) / 1000
+
+            if Tag_des_Jahres == Tag_des_Jahres_alt:
+                Stagnation = Stagnation | ((Zwischenwert > Last) & (QS >= QSmax))
+            else:
+                Stagnation = np.zeros(m, dtype=bool)
+
+            S_HFG = QS / QSmax  # Speicherfüllungsgrad
+
+        Speicherfüllstand_L[:, i] = S_HFG
+        Speicherladung_L[:, i] = QS
+        Speicher_Wärmeoutput_L[:, i] = PSout
+
+    Gesamtwärmemenge = np.sum(Speicher_Wärmeoutput_L / 1000, axis=1) * duration
+
+    return Gesamtwärmemenge, Speicher_Wärmeoutput_L, Speicherladung_L, Speicherfüllstand_L
+
+def Berechnung_STA_batch(Bruttofläche_STA_L, VS_L, Typ, Last_L, VLT_L, RLT_L, TRY, time_steps, calc1, calc2, duration, Tsmax=90, Longitude=-14.4222, STD_Longitude=-15, Latitude=51.1676,
+                         East_West_collector_azimuth_angle=0, Collector_tilt_angle=36, Tm_rl=60, Qsa=0, Vorwärmung_K=8, DT_WT_Solar_K=5, DT_WT_Netz_K=5, engine="python"):
+    # Berechnung mehrerer Auslegungsvarianten (Paare aus Bruttofläche_STA_L und VS_L) in einem Aufruf
+    # Wetterdaten, Tag des Jahres und Solarstrahlung werden nur einmal für alle Varianten berechnet
+    # engine: "python" rechnet alle Varianten vektorisiert im Gleichschritt, "numba" nacheinander mit dem kompilierten Rechenkern
+    # Rückgabe: Wärmemengen je Variante sowie Matrizen (Varianten x Zeitschritte) für Wärmeoutput, Speicherladung und Speicherfüllstand
+    Bruttofläche_STA_L = np.atleast_1d(np.asarray(Bruttofläche_STA_L, dtype=np.float64))
+    VS_L = np.atleast_1d(np.asarray(VS_L, dtype=np.float64))
+    Bruttofläche_STA_L, VS_L = np.broadcast_arrays(Bruttofläche_STA_L, VS_L)
+
+    Temperatur_L, Windgeschwindigkeit_L, Direktstrahlung_L, Globalstrahlung_L = Wetterdaten_STA(TRY, time_steps, calc1, calc2)
+
+    n = len(Last_L)
+    Gesamtwärmemenge = np.zeros(len(VS_L))
+    Speicher_Wärmeoutput_L = np.zeros((len(VS_L), n))
+    Speicherladung_L = np.zeros((len(VS_L), n))
+    Speicherfüllstand_L = np.zeros((len(VS_L), n))
+
+    # Varianten ohne Kollektorfläche oder Speicher liefern keinen Ertrag
+    aktiv = (Bruttofläche_STA_L != 0) & (VS_L != 0)
+    if not np.any(aktiv):
+        return Gesamtwärmemenge, Speicher_Wärmeoutput_L, Speicherladung_L, Speicherfüllstand_L
+
+    Tag_des_Jahres_L = day_of_year(time_steps)
+
+    # Definition Albedo-Wert
+    Albedo = 0.2
+    # Definition Korrekturfaktor Windgeschwindigkeit
+    wcorr = 0.5
+
+    Eta0b_neu, Kthetadiff, Koll_c1, Koll_c2, Koll_c3, KollCeff_A, Bezugsfläche_Anteil, IAM_W, IAM_N = Kollektordaten(Typ)
+    Bezugsfläche = Bruttofläche_STA_L[aktiv] * Bezugsfläche_Anteil
+    VS = VS_L[aktiv]
+
+    Lrbin_E, VRV_bin, L_Erdreich, hs_RE, Keq_RE, CRK, VRV, KK, CKK = Rohrleitungsdaten()
+
+    # Vorgabewerte Speicher
+    QSmax = 1.16 * VS * (Tsmax - Tm_rl)
+
+    GT_H_Gk, K_beam_L, GbT_L, GdT_H_Dk_L = Berechnung_Solarstrahlung(Globalstrahlung_L, Direktstrahlung_L, 
+                                                                     Tag_des_Jahres_L, time_steps, Longitude,
+                                                                     STD_Longitude, Latitude, Albedo, IAM_W, IAM_N,
+                                                                     East_West_collector_azimuth_angle,
+                                                                     Collector_tilt_angle)
 
-    return Gesamtwärmemenge, np.array(Speicher_Wärmeoutput_L).astype("float64"), np.array(Speicherladung_L).astype("float64"), np.array(Speicherfüllstand_L).astype("float64")
+    Zeitreihen = (np.asarray(Tag_des_Jahres_L, dtype=np.int64), np.asarray(K_beam_L, dtype=np.float64), np.asarray(GbT_L, dtype=np.float64),
+                  np.asarray(GdT_H_Dk_L, dtype=np.float64), np.asarray(Temperatur_L, dtype=np.float64), np.asarray(Windgeschwindigkeit_L, dtype=np.float64),
+                  np.asarray(Last_L, dtype=np.float64), np.asarray(VLT_L, dtype=np.float64), np.asarray(RLT_L, dtype=np.float64), float(duration))
+    Kennwerte = (Eta0b_neu, Kthetadiff, Koll_c1, Koll_c2, Koll_c3, KollCeff_A)
+    Rohrleitung = (wcorr, Lrbin_E, VRV_bin, L_Erdreich, hs_RE, Keq_RE, CRK, VRV, KK, CKK)
+    Speicher = (Tsmax, Tm_rl, Qsa, Vorwärmung_K, DT_WT_Solar_K, DT_WT_Netz_K)
+
+    if engine == "python":
+        with np.errstate(divide='ignore', invalid='ignore'):
+            Ergebnisse = _STA_Zeitschritte_batch(*Zeitreihen, *Kennwerte, Bezugsfläche, *Rohrleitung, VS, QSmax, *Speicher)
+        for Matrix, Werte in zip((Gesamtwärmemenge, Speicher_Wärmeoutput_L, Speicherladung_L, Speicherfüllstand_L), Ergebnisse):
+            Matrix[aktiv] = Werte
+    else:
+        kernel = rechenkern(_STA_Zeitschritte, engine)
+        for i, j in enumerate(np.flatnonzero(aktiv)):
+            Ergebnisse = kernel(*Zeitreihen, *Kennwerte, Bezugsfläche[i], *Rohrleitung, VS[i], QSmax[i], *Speicher)
+            for Matrix, Werte in zip((Gesamtwärmemenge, Speicher_Wärmeoutput_L, Speicherladung_L, Speicherfüllstand_L), Ergebnisse):
+                Matrix[j] = Werte
+
+    return Gesamtwärmemenge, Speicher_Wärmeoutput_L, Speicherladung_L, Speicherfüllstand_L
@@ -1,30 +1,32 @@
 import numpy as np
 from math import pi, sqrt
+import hashlib
+import inspect
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 
 from scipy.optimize import minimize
-from scipy.interpolate import RegularGridInterpolator
+from scipy.stats import qmc
 
 from heat_generators.Solarthermie import Berechnung_STA
 from heat_generators.Photovoltaik import Calculate_PV
+from heat_generators.jit import jit, rechenkern
+from utilities.cop_map import get_cop_map
 
 # Wirtschaftlichkeitsberechnung für technische Anlagen nach VDI 2067
+# q, r, T, Energiebedarf, Energiekosten, E1 und stundensatz können auch als numpy-Arrays übergeben werden (Auswertung vieler Szenarien)
 def annuität(A0, TN, f_Inst, f_W_Insp, Bedienaufwand=0, q=1.05, r=1.03, T=20, Energiebedarf=0, Energiekosten=0, E1=0, stundensatz=45):
-    if T > TN:
-        n = T // TN
-    else:
-        n = 0
+    # Anzahl der Ersatzbeschaffungen
+    n = np.where(T > TN, T // TN, 0)
 
     a = (q - 1) / (1 - (q ** (-T)))  # Annuitätsfaktor
     b = (1 - (r / q) ** T) / (q - r)  # preisdynamischer Barwertfaktor
     b_v = b_B = b_IN = b_s = b_E = b
 
-    # kapitalgebundene Kosten
-    AN = A0
-    AN_L = [A0]
-    for i in range(1, n+1):
-        Ai = A0*((r**(n*TN))/(q**(n*TN)))
-        AN += Ai
-        AN_L.append(Ai)
+    # kapitalgebundene Kosten, n gleiche Ersatzbeschaffungen
+    Ai = A0*((r**(n*TN))/(q**(n*TN)))
+    AN = A0 + n*Ai
 
     R_W = A0 * (r**(n*TN)) * (((n+1)*TN-T)/TN) * 1/(q**T)
     A_N_K = (AN - R_W) * a
@@ -57,12 +59,8 @@ class HeatPump:
         self.spezifische_Investitionskosten_WP = spezifische_Investitionskosten_WP
 
     def COP_WP(self, VLT_L, QT, COP_data):
-        # Interpolationsformel für den COP
-        values = COP_data  # np.genfromtxt('Kennlinien WP.csv', delimiter=';')
-        row_header = values[0, 1:]  # Vorlauftemperaturen
-        col_header = values[1:, 0]  # Quelltemperaturen
-        values = values[1:, 1:]
-        f = RegularGridInterpolator((col_header, row_header), values, method='linear')
+        # Interpolation im COP-Kennfeld, das Kennfeld wird je COP_data nur einmal aufbereitet
+        f = get_cop_map(COP_data)
 
         # technische Grenze der Wärmepumpe ist Temperaturhub von 75 °C
         VLT_L = np.minimum(VLT_L, 75+QT)
@@ -78,7 +76,7 @@ class HeatPump:
             QT_array = QT
 
         # Berechnung von COP_L
-        COP_L = f(np.column_stack((QT_array, VLT_L)))
+        COP_L = f(QT_array, VLT_L)
 
         return COP_L, VLT_L
     
@@ -220,7 +218,8 @@ class Geothermal(HeatPump):
         self.Vollbenutzungsstunden = Vollbenutzungsstunden
         self.Abstand_Sonden = Abstand_Sonden
 
-    def Geothermie(self, Last_L, VLT_L, COP_data, duration):
+    def Geothermie(self, Last_L, VLT_L, COP_data, duration, gewichte=None):
+        # gewichte: Anzahl der vertretenen Zeitschritte je Zeitschritt (Typtage), None für die vollständige Zeitreihe
         if self.Fläche == 0 or self.Bohrtiefe == 0:
             return 0, 0, np.zeros_like(Last_L), np.zeros_like(VLT_L)
 
@@ -235,35 +234,29 @@ class Geothermal(HeatPump):
 
         # tatsächliche Anzahl der Betriebsstunden der Wärmepumpe hängt von der Wärmeleistung ab,
         # diese hängt über Entzugsleistung von der angenommenen Betriebsstundenzahl ab
-        B_min = 1
-        B_max = 8760
-        tolerance = 0.5
-        while B_max - B_min > tolerance:
-            B = (B_min + B_max) / 2
-            # Berechnen der Entzugsleistung
-            Entzugsleistung = Entzugswärmemenge * 1000 / B  # kW
-            # Berechnen der Wärmeleistung und elektrischen Leistung
-            Wärmeleistung_L = Entzugsleistung / (1 - (1 / COP_L))
-            el_Leistung_L = Wärmeleistung_L - Entzugsleistung
-
-            # Berechnen der tatsächlichen Werte
-            Wärmeleistung_tat_L = Wärmeleistung_L * np.minimum(1, Last_L / Wärmeleistung_L)
-            el_Leistung_tat_L = el_Leistung_L * np.minimum(1, Last_L / Wärmeleistung_L)
-            Entzugsleistung_tat_L = Wärmeleistung_tat_L - el_Leistung_tat_L
-            Entzugswärme = np.sum(Entzugsleistung_tat_L) / 1000
+        B = self.Betriebsstunden(Entzugswärmemenge, self.Lastkennwerte(Last_L, COP_L, gewichte), duration)
+
+        # Berechnen der Entzugsleistung
+        Entzugsleistung = Entzugswärmemenge * 1000 / B  # kW
+        # Berechnen der Wärmeleistung und elektrischen Leistung
+        Wärmeleistung_L = Entzugsleistung / (1 - (1 / COP_L))
+        el_Leistung_L = Wärmeleistung_L - Entzugsleistung
+
+        # Berechnen der tatsächlichen Werte
+        Wärmeleistung_tat_L = Wärmeleistung_L * np.minimum(1, Last_L / Wärmeleistung_L)
+        el_Leistung_tat_L = el_Leistung_L * np.minimum(1, Last_L / Wärmeleistung_L)
+        if gewichte is None:
             Wärmemenge = np.sum(Wärmeleistung_tat_L) / 1000
             Strombedarf = np.sum(el_Leistung_tat_L) / 1000
-            Betriebsstunden = np.count_nonzero(Wärmeleistung_tat_L)
-
-            # Falls es keine Nutzung gibt, wird das Ergebnis 0
-            if Betriebsstunden == 0:
-                Wärmeleistung_tat_L = np.array([0])
-                el_Leistung_tat_L = np.array([0])
+        else:
+            Wärmemenge = np.sum(Wärmeleistung_tat_L * gewichte) / 1000
+            Strombedarf = np.sum(el_Leistung_tat_L * gewichte) / 1000
+        Betriebsstunden = np.count_nonzero(Wärmeleistung_tat_L)
 
-            if Entzugswärme > Entzugswärmemenge:
-                B_min = B
-            else:
-                B_max = B
+        # Falls es keine Nutzung gibt, wird das Ergebnis 0
+        if Betriebsstunden == 0:
+            Wärmeleistung_tat_L = np.array([0])
+            el_Leistung_tat_L = np.array([0])
 
         self.max_Wärmeleistung = max(Wärmeleistung_tat_L)
         JAZ = Wärmemenge / Strombedarf
@@ -271,9 +264,93 @@ class Geothermal(HeatPump):
         
         return Wärmemenge, Strombedarf, Wärmeleistung_tat_L, el_Leistung_tat_L
     
+    def Lastkennwerte(self, Last_L, COP_L, gewichte=None):
+        # Je Zeitschritt gilt bei der Entzugsleistung P: Entzug = min(P, c), Wärme = min(P*g, Last), Strom = Wärme/COP
+        # mit g = 1/(1-1/COP) und c = Last/g. Nach c sortiert lassen sich die Jahressummen für beliebige P über
+        # kumulierte Summen bestimmen, ohne erneut über die Zeitreihe zu rechnen. Mit gewichte zählt jeder Zeitschritt entsprechend oft.
+        g = 1 / (1 - (1 / COP_L))
+        c = Last_L / g
+        w = np.ones_like(c) if gewichte is None else np.broadcast_to(np.asarray(gewichte, dtype=float), c.shape)
+        order = np.argsort(c)
+        c, g, Last_L, COP_L, w = c[order], g[order], Last_L[order], COP_L[order], w[order]
+
+        def kumuliert(werte):
+            return np.concatenate(([0], np.cumsum(werte)))
+        
+        def rest(werte):
+            return np.concatenate((np.cumsum(werte[::-1])[::-1], [0]))
+
+        return {
+            'c': c,
+            'n_oben': rest(w),
+            'Entzug_unten': kumuliert(c * w),
+            'Wärme_unten': kumuliert(Last_L * w),
+            'Strom_unten': kumuliert(Last_L / COP_L * w),
+            'g_oben': rest(g * w),
+            'g_Strom_oben': rest(g / COP_L * w),
+            'max_Last_unten': np.concatenate(([-np.inf], np.maximum.accumulate(Last_L))),
+            'max_g_oben': np.concatenate((np.maximum.accumulate(g[::-1])[::-1], [-np.inf]))
+        }
+    
+    def Jahreswerte(self, Entzugsleistung, kennwerte):
+        # Entzugswärme, Wärmemenge und Strombedarf (Summe der Zeitschritte / 1000) sowie maximale Wärmeleistung für Entzugsleistungen P
+        Entzugsleistung = np.asarray(Entzugsleistung, dtype=float)
+        k = np.searchsorted(kennwerte['c'], Entzugsleistung, side='right')
+        n_oben = kennwerte['n_oben'][k]
+
+        Entzugswärme = (kennwerte['Entzug_unten'][k] + Entzugsleistung * n_oben) / 1000
+        Wärmemenge = (kennwerte['Wärme_unten'][k] + Entzugsleistung * kennwerte['g_oben'][k]) / 1000
+        Strombedarf = (kennwerte['Strom_unten'][k] + Entzugsleistung * kennwerte['g_Strom_oben'][k]) / 1000
+        max_Wärmeleistung = np.maximum(kennwerte['max_Last_unten'][k], Entzugsleistung * kennwerte['max_g_oben'][k])
+
+        return Entzugswärme, Wärmemenge, Strombedarf, max_Wärmeleistung
+    
+    def Betriebsstunden(self, Entzugswärmemenge, kennwerte, duration=1):
+        # Bisektion der Betriebsstunden, gleichzeitig für beliebig viele Entzugswärmemengen
+        # duration: Länge der Zeitschritte in h, die Entzugswärme der Zeitreihe wird damit in MWh umgerechnet
+        Entzugswärmemenge = np.asarray(Entzugswärmemenge, dtype=float)
+        B_min = np.ones_like(Entzugswärmemenge)
+        B_max = np.full_like(Entzugswärmemenge, 8760)
+        tolerance = 0.5
+        B = B_max
+        while np.max(B_max - B_min, initial=0) > tolerance:
+            B = (B_min + B_max) / 2
+            Entzugswärme = self.Jahreswerte(Entzugswärmemenge * 1000 / B, kennwerte)[0] * duration
+            B_min = np.where(Entzugswärme > Entzugswärmemenge, B, B_min)
+            B_max = np.where(Entzugswärme > Entzugswärmemenge, B_max, B)
+
+        return B
+    
+    def Geothermie_batch(self, Last_L, VLT_L, COP_data, duration, Flächen, Bohrtiefen):
+        # Jahreswerte für viele Kombinationen aus Fläche und Bohrtiefe bei gleicher Last (z.B. Sondenfeld-Variation)
+        # Die übrigen Parameter werden vom Objekt übernommen, Ergebnis als dict mit Arrays
+        Flächen, Bohrtiefen = np.broadcast_arrays(np.asarray(Flächen, dtype=float), np.asarray(Bohrtiefen, dtype=float))
+        aktiv = (Flächen != 0) & (Bohrtiefen != 0)
+
+        Anzahl_Sonden = (np.round(np.sqrt(Flächen)/self.Abstand_Sonden)+1)**2
+        Entzugsleistung_2400 = Bohrtiefen * self.spez_Entzugsleistung * Anzahl_Sonden / 1000
+        Entzugswärmemenge = Entzugsleistung_2400 * self.Vollbenutzungsstunden / 1000  # MWh
+        Investitionskosten_Sonden = Bohrtiefen * self.spez_Bohrkosten * Anzahl_Sonden
+
+        COP_L, VLT_WP = self.COP_WP(VLT_L, self.Temperatur_Geothermie, COP_data)
+        kennwerte = self.Lastkennwerte(Last_L, COP_L)
+
+        B = self.Betriebsstunden(np.where(aktiv, Entzugswärmemenge, 1), kennwerte, duration)
+        Entzugswärme, Wärmemenge, Strombedarf, max_Wärmeleistung = self.Jahreswerte(Entzugswärmemenge * 1000 / B, kennwerte)
+
+        batch_results = {
+            'Wärmemenge': np.where(aktiv, Wärmemenge*duration, 0),
+            'Strombedarf': np.where(aktiv, Strombedarf*duration, 0),
+            'max_Wärmeleistung': np.where(aktiv, np.maximum(max_Wärmeleistung, 0), 0),
+            'Investitionskosten_Sonden': np.where(aktiv, Investitionskosten_Sonden, 0),
+            'Betriebsstunden': np.where(aktiv, B, 0)
+        }
+
+        return batch_results
+
     def calculate(self, VLT_L, COP_data, Strompreis, q, r, T, BEW, stundensatz, duration, general_results):
         # Hier fügen Sie die spezifische Logik für die Geothermie-Berechnung ein
-        Wärmemenge, Strombedarf, Wärmeleistung_L, el_Leistung_Geothermie_L = self.Geothermie(general_results['Restlast_L'], VLT_L, COP_data, duration)
+        Wärmemenge, Strombedarf, Wärmeleistung_L, el_Leistung_Geothermie_L = self.Geothermie(general_results['Restlast_L'], VLT_L, COP_data, duration, general_results.get('Gewichte_L'))
 
         self.spez_Investitionskosten_Erdsonden = self.Investitionskosten_Sonden / self.max_Wärmeleistung
         WGK_Geothermie = self.WGK(self.max_Wärmeleistung, Wärmemenge, Strombedarf, self.spez_Investitionskosten_Erdsonden, Strompreis, q, r, T, BEW, stundensatz)
@@ -365,6 +442,135 @@ class CHP:
         }
 
 
+        return results
+
+@jit
+def _BHKW_Speicher_Zeitschritte(Last_L, duration, th_Leistung, Speicherkapazität, untere_Grenze, obere_Grenze, min_Laufzeit, min_Stillstand):
+    # Zustandsautomat BHKW mit Pufferspeicher (vgl. currently_not_used/BHKW_Speicher.py)
+    # Das BHKW startet, wenn der Füllstand die untere Grenze erreicht, und schaltet ab, wenn der Füllstand die obere Grenze überschreitet.
+    # Zusätzlich läuft das BHKW, solange der Speicher die aktuelle Last nicht für einen Zeitschritt decken kann (kleine Speicher).
+    # Mindestlaufzeit und Mindeststillstandszeit in Zeitschritten. Ist der Speicher voll, wird die Leistung auf Last + freie Speicherkapazität reduziert.
+    n = len(Last_L)
+    Wärmeleistung_L = np.zeros(n)  # an das Netz abgegebene Wärmeleistung (BHKW und Speicher)
+    Erzeugung_L = np.zeros(n)  # thermische Leistung des BHKW
+    Speicherfüllstand_L = np.zeros(n)
+
+    Speicherstand = 0.0
+    in_Betrieb = True
+    Schritte_im_Zustand = 0
+    Anzahl_Starts = 1
+
+    for i in range(n):
+        Last = max(Last_L[i], 0.0)
+        Füllstand = Speicherstand / Speicherkapazität if Speicherkapazität > 0 else 0.0
+
+        if in_Betrieb and Füllstand > obere_Grenze and Speicherstand >= Last * duration and Schritte_im_Zustand >= min_Laufzeit:
+            in_Betrieb = False
+            Schritte_im_Zustand = 0
+        elif not in_Betrieb and (Füllstand <= untere_Grenze or Speicherstand < Last * duration) and Schritte_im_Zustand >= min_Stillstand:
+            in_Betrieb = True
+            Schritte_im_Zustand = 0
+            Anzahl_Starts += 1
+
+        if in_Betrieb:
+            Erzeugung = min(th_Leistung, Last + (Speicherkapazität - Speicherstand) / duration)
+        else:
+            Erzeugung = 0.0
+
+        # Überschuss wird eingespeichert, Fehlmengen werden soweit möglich aus dem Speicher gedeckt
+        Speicherleistung = Erzeugung - Last
+        if Speicherleistung < 0:
+            Speicherleistung = max(Speicherleistung, -Speicherstand / duration)
+        Speicherstand = min(max(Speicherstand + Speicherleistung * duration, 0.0), Speicherkapazität)
+
+        Wärmeleistung_L[i] = Erzeugung - Speicherleistung
+        Erzeugung_L[i] = Erzeugung
+        Speicherfüllstand_L[i] = Speicherstand
+        Schritte_im_Zustand += 1
+
+    return Wärmeleistung_L, Erzeugung_L, Speicherfüllstand_L, Anzahl_Starts
+
+class CHPStorage(CHP):
+    # BHKW mit Pufferspeicher, Name "BHKW_Speicher" (Erdgas) oder "Holzgas-BHKW_Speicher"
+    def __init__(self, name, th_Leistung_BHKW, Speichervolumen_BHKW, spez_Investitionskosten_GBHKW=1500, spez_Investitionskosten_HBHKW=1850,
+                 spez_Investitionskosten_Speicher=750, Speicher_dT=30, untere_Grenze=0.2, obere_Grenze=0.8, min_Laufzeit=0, min_Stillstand=0, engine="numba"):
+        super().__init__(name, th_Leistung_BHKW, spez_Investitionskosten_GBHKW=spez_Investitionskosten_GBHKW, spez_Investitionskosten_HBHKW=spez_Investitionskosten_HBHKW)
+        self.Speichervolumen_BHKW = Speichervolumen_BHKW  # m³
+        self.spez_Investitionskosten_Speicher = spez_Investitionskosten_Speicher  # €/m³
+        self.Speicher_dT = Speicher_dT  # nutzbare Temperaturspreizung im Speicher in K
+        self.untere_Grenze = untere_Grenze
+        self.obere_Grenze = obere_Grenze
+        self.min_Laufzeit = min_Laufzeit  # h
+        self.min_Stillstand = min_Stillstand  # h
+        self.engine = engine
+
+    def BHKW(self, Last_L, duration, el_Wirkungsgrad=0.33, KWK_Wirkungsgrad=0.9):
+        thermischer_Wirkungsgrad = KWK_Wirkungsgrad - el_Wirkungsgrad
+        self.el_Leistung_Soll = self.th_Leistung_BHKW / thermischer_Wirkungsgrad * el_Wirkungsgrad
+
+        # Speicherkapazität in kWh (Wasser: 1,163 kWh/(m³K))
+        self.Speicherkapazität = self.Speichervolumen_BHKW * 1.163 * self.Speicher_dT
+
+        if self.th_Leistung_BHKW > 0:
+            Zeitschritte = rechenkern(_BHKW_Speicher_Zeitschritte, self.engine)
+            Wärmeleistung_BHKW_L, Erzeugung_L, self.Speicherfüllstand_L, self.Anzahl_Starts = Zeitschritte(np.asarray(Last_L, dtype=float), float(duration), float(self.th_Leistung_BHKW), 
+                                                                                                             float(self.Speicherkapazität), float(self.untere_Grenze), float(self.obere_Grenze), 
+                                                                                                             int(np.ceil(self.min_Laufzeit / duration)), int(np.ceil(self.min_Stillstand / duration)))
+        else:
+            Wärmeleistung_BHKW_L, Erzeugung_L, self.Speicherfüllstand_L, self.Anzahl_Starts = np.zeros_like(Last_L), np.zeros_like(Last_L), np.zeros_like(Last_L), 0
+
+        # Strom und Brennstoff richten sich nach der Erzeugung des BHKW, nicht nach der Abgabe ans Netz
+        el_Leistung_BHKW_L = Erzeugung_L / thermischer_Wirkungsgrad * el_Wirkungsgrad
+        self.Erzeugung_BHKW_L = Erzeugung_L
+
+        Wärmemenge_BHKW = np.sum(Wärmeleistung_BHKW_L / 1000)*duration
+        Strommenge_BHKW = np.sum(el_Leistung_BHKW_L / 1000)*duration
+        Brennstoffbedarf_BHKW = (np.sum(Erzeugung_L / 1000)*duration + Strommenge_BHKW) / KWK_Wirkungsgrad
+
+        return Wärmeleistung_BHKW_L, el_Leistung_BHKW_L, Wärmemenge_BHKW, Strommenge_BHKW, Brennstoffbedarf_BHKW
+
+    def WGK(self, Wärmemenge, Strommenge, Brennstoffbedarf, Brennstoffkosten, Strompreis, q, r, T, BEW, stundensatz):
+        if Wärmemenge == 0:
+            return 0
+        if self.name == "BHKW_Speicher":
+            spez_Investitionskosten = self.spez_Investitionskosten_GBHKW  # €/kW
+        elif self.name == "Holzgas-BHKW_Speicher":
+            spez_Investitionskosten = self.spez_Investitionskosten_HBHKW  # €/kW
+
+        self.Investitionskosten_BHKW = spez_Investitionskosten * self.th_Leistung_BHKW
+        self.Investitionskosten_Speicher = self.spez_Investitionskosten_Speicher * self.Speichervolumen_BHKW
+        self.Investitionskosten = self.Investitionskosten_BHKW + self.Investitionskosten_Speicher
+
+        Stromeinnahmen = Strommenge * Strompreis
+
+        # BHKW: 15 Jahre, Speicher: 20 Jahre (wie Solarthermiespeicher)
+        A_N_BHKW = annuität(self.Investitionskosten_BHKW, 15, 6, 2, 0, q, r, T, Brennstoffbedarf, Brennstoffkosten, Stromeinnahmen, stundensatz)
+        A_N_Speicher = annuität(self.Investitionskosten_Speicher, 20, 0.5, 1, 0, q, r, T, stundensatz=stundensatz)
+        WGK_a = (A_N_BHKW + A_N_Speicher) / Wärmemenge
+
+        return WGK_a
+
+    def calculate(self, Gaspreis, Holzpreis, Strompreis, q, r, T, BEW, stundensatz, duration, general_results):
+        Wärmeleistung_BHKW_L, el_Leistung_BHKW_L, Wärmemenge, Strommenge_BHKW, Brennstoffbedarf_BHKW = self.BHKW(general_results["Restlast_L"], duration)
+        
+        if self.name == "BHKW_Speicher":
+            Brennstoffpreis = Gaspreis
+        elif self.name == "Holzgas-BHKW_Speicher":
+            Brennstoffpreis = Holzpreis
+
+        wgk_BHKW = self.WGK(Wärmemenge, Strommenge_BHKW, Brennstoffbedarf_BHKW, Brennstoffpreis, Strompreis, q, r, T, BEW, stundensatz)
+
+        results = {
+            'Wärmemenge': Wärmemenge,
+            'Wärmeleistung_L': Wärmeleistung_BHKW_L,
+            'Brennstoffbedarf': Brennstoffbedarf_BHKW,
+            'WGK': wgk_BHKW,
+            'Strommenge': Strommenge_BHKW,
+            'el_Leistung_L': el_Leistung_BHKW_L,
+            'Speicherfüllstand_L': self.Speicherfüllstand_L,
+            'color': "gold"
+        }
+
         return results
 
 class BiomassBoiler:
@@ -459,7 +665,7 @@ class GasBoiler:
 
 class SolarThermal:
     def __init__(self, name, bruttofläche_STA, vs, Typ, kosten_speicher_spez=750, kosten_fk_spez=430, kosten_vrk_spez=590, Tsmax=90, Longitude=-14.4222, 
-                 STD_Longitude=-15, Latitude=51.1676, East_West_collector_azimuth_angle=0, Collector_tilt_angle=36, Tm_rl=60, Qsa=0, Vorwärmung_K=8, DT_WT_Solar_K=5, DT_WT_Netz_K=5):
+                 STD_Longitude=-15, Latitude=51.1676, East_West_collector_azimuth_angle=0, Collector_tilt_angle=36, Tm_rl=60, Qsa=0, Vorwärmung_K=8, DT_WT_Solar_K=5, DT_WT_Netz_K=5, engine="python"):
         self.name = name
         self.bruttofläche_STA = bruttofläche_STA
         self.vs = vs
@@ -478,6 +684,7 @@ class SolarThermal:
         self.Vorwärmung_K = Vorwärmung_K
         self.DT_WT_Solar_K = DT_WT_Solar_K
         self.DT_WT_Netz_K = DT_WT_Netz_K
+        self.engine = engine
 
     def calc_WGK(self, Wärmemenge, q, r, T, BEW, stundensatz):
         if Wärmemenge == 0:
@@ -522,7 +729,7 @@ class SolarThermal:
         Wärmemenge, Wärmeleistung_Solarthermie_L, Speicherladung_L, Speicherfüllstand_L = Berechnung_STA(self.bruttofläche_STA, self.vs, self.Typ, general_results['Restlast_L'], VLT_L, RLT_L, 
                                                                                                         TRY, time_steps, calc1, calc2, duration, self.Tsmax, self.Longitude, self.STD_Longitude, 
                                                                                                         self.Latitude, self.East_West_collector_azimuth_angle, self.Collector_tilt_angle, self.Tm_rl, 
-                                                                                                        self.Qsa, self.Vorwärmung_K, self.DT_WT_Solar_K, self.DT_WT_Netz_K)
+                                                                                                        self.Qsa, self.Vorwärmung_K, self.DT_WT_Solar_K, self.DT_WT_Netz_K, self.engine)
 
         WGK_Solarthermie = self.calc_WGK(Wärmemenge, q, r, T, BEW, stundensatz)
 
@@ -541,7 +748,92 @@ def calculate_factors(Kapitalzins, Preissteigerungsrate, Betrachtungszeitraum):
     T = Betrachtungszeitraum
     return q, r, T
 
-def Berechnung_Erzeugermix(tech_order, initial_data, start, end, TRY, COP_data, Gaspreis, Strompreis, Holzpreis, BEW, variables=[], variables_order=[], kapitalzins=5, preissteigerungsrate=3, betrachtungszeitraum=20, stundensatz=45):
+# Zwischenspeicher für Ergebnisse einzelner Erzeuger innerhalb von Berechnung_Erzeugermix
+# Schlüssel: Parameter des Erzeugers, eingehende Restlast und Randbedingungen der Berechnung
+ERGEBNIS_CACHE_GRÖSSE = 64
+_ergebnis_cache = OrderedDict()
+
+def leere_Ergebnis_Cache():
+    _ergebnis_cache.clear()
+
+def _hash_update(h, wert):
+    if isinstance(wert, np.ndarray):
+        h.update(str(wert.dtype).encode())
+        h.update(str(wert.shape).encode())
+        h.update(np.ascontiguousarray(wert).tobytes())
+    elif isinstance(wert, (list, tuple)):
+        h.update(b"(")
+        for w in wert:
+            _hash_update(h, w)
+        h.update(b")")
+    elif isinstance(wert, dict):
+        h.update(b"{")
+        for k in sorted(wert, key=str):
+            h.update(repr(k).encode())
+            _hash_update(h, wert[k])
+        h.update(b"}")
+    elif isinstance(wert, (bool, np.bool_)) or wert is None or isinstance(wert, str):
+        h.update(repr(wert).encode())
+    elif isinstance(wert, (int, float, np.integer, np.floating)):
+        h.update(repr(float(wert)).encode())
+    else:
+        h.update(repr(wert).encode())
+    h.update(b"|")
+
+def hash_werte(*werte):
+    h = hashlib.sha1()
+    for wert in werte:
+        _hash_update(h, wert)
+    return h.hexdigest()
+
+def tech_parameter(tech):
+    # Parameter eines Erzeugers laut Konstruktor (ohne abgeleitete Attribute aus vorherigen Berechnungen)
+    parameter = inspect.signature(tech.__class__.__init__).parameters
+    return {name: getattr(tech, name, None) for name in parameter if name != "self"}
+
+def berechne_tech(tech, VLT_L, RLT_L, TRY, time_steps, start, end, COP_data, Gaspreis, Strompreis, Holzpreis, q, r, T, BEW, stundensatz, duration, Last_L, general_results):
+    # Aufruf der Berechnung je Erzeugertyp, None für unbekannte Erzeugertypen
+    if tech.name == "Solarthermie":
+        return tech.calculate(VLT_L, RLT_L, TRY, time_steps, start, end, q, r, T, BEW, stundensatz, duration, general_results)
+
+    elif tech.name == "Abwärme" or tech.name == "Abwasserwärme":
+        return tech.calculate(VLT_L, COP_data, Strompreis, q, r, T, BEW, stundensatz, duration, general_results)
+    
+    elif tech.name == "Flusswasser":
+        return tech.calculate(VLT_L, COP_data, Strompreis, q, r, T, BEW, stundensatz, duration, general_results)
+
+    elif tech.name == "Geothermie":
+        return tech.calculate(VLT_L, COP_data, Strompreis, q, r, T, BEW, stundensatz, duration, general_results)
+        
+    elif tech.name in ["BHKW", "Holzgas-BHKW", "BHKW_Speicher", "Holzgas-BHKW_Speicher"]:
+        return tech.calculate(Gaspreis, Holzpreis, Strompreis, q, r, T, BEW, stundensatz, duration, general_results)
+        
+    elif tech.name == "Biomassekessel":
+        return tech.calculate(Holzpreis, q, r, T, BEW, stundensatz, duration, general_results)
+        
+    elif tech.name == "Gaskessel":
+        return tech.calculate(Gaspreis, q, r, T, BEW, stundensatz, duration, Last_L, general_results)
+    
+    return None
+
+def gewichtete_Jahreswerte(tech_results, gewichte_L, duration):
+    # Jahreswerte eines Erzeugers bei Berechnung auf Typtagen: Zeitschritte werden mit der Anzahl der vertretenen Zeitschritte gewichtet
+    Wärmemenge = np.sum(tech_results['Wärmeleistung_L'] * gewichte_L / 1000) * duration
+    faktor = Wärmemenge / tech_results['Wärmemenge'] if tech_results['Wärmemenge'] > 0 else 0
+
+    tech_results['Wärmemenge'] = Wärmemenge
+    if 'Brennstoffbedarf' in tech_results:
+        tech_results['Brennstoffbedarf'] = tech_results['Brennstoffbedarf'] * faktor
+    if 'Strommenge' in tech_results:
+        tech_results['Strommenge'] = np.sum(tech_results['el_Leistung_L'] * gewichte_L / 1000) * duration
+    if 'Strombedarf' in tech_results:
+        tech_results['Strombedarf'] = np.sum(tech_results['el_Leistung_L'] * gewichte_L / 1000) * duration
+
+    return tech_results
+
+def Berechnung_Erzeugermix(tech_order, initial_data, start, end, TRY, COP_data, Gaspreis, Strompreis, Holzpreis, BEW, variables=[], variables_order=[], kapitalzins=5, preissteigerungsrate=3, betrachtungszeitraum=20, stundensatz=45, cache=True, gewichte=None):
+    # cache: Ergebnisse einzelner Erzeuger werden wiederverwendet, wenn sich deren Parameter und die eingehende Restlast nicht geändert haben
+    # gewichte: Gewicht je Zeitschritt bei Berechnung auf Typtagen (siehe typtage.py), Jahreswerte und WGK werden damit hochgerechnet
     # Kapitalzins und Preissteigerungsrate in % -> Umrechung in Zinsfaktor und Preissteigerungsfaktor
     q, r, T = calculate_factors(kapitalzins, preissteigerungsrate, betrachtungszeitraum)
     time_steps, Last_L, VLT_L, RLT_L = initial_data
@@ -549,14 +841,17 @@ def Berechnung_Erzeugermix(tech_order, initial_data, start, end, TRY, COP_data,
     duration = np.diff(time_steps[0:2]) / np.timedelta64(1, 'h')
     duration = duration[0]
 
+    Jahreswärmebedarf = (np.sum(Last_L)/1000) * duration if gewichte is None else (np.sum(Last_L * gewichte)/1000) * duration
+
     general_results = {
         'time_steps': time_steps,
         'Last_L': Last_L,
         'VLT_L': VLT_L,
         'RLT_L': RLT_L,
-        'Jahreswärmebedarf': (np.sum(Last_L)/1000) * duration,
+        'Gewichte_L': gewichte,
+        'Jahreswärmebedarf': Jahreswärmebedarf,
         'WGK_Gesamt': 0,
-        'Restwärmebedarf': (np.sum(Last_L)/1000) * duration,
+        'Restwärmebedarf': Jahreswärmebedarf,
         'Restlast_L': Last_L.copy(),
         'Wärmeleistung_L': [],
         'colors': [],
@@ -569,9 +864,13 @@ def Berechnung_Erzeugermix(tech_order, initial_data, start, end, TRY, COP_data,
         'el_Leistung_L': np.zeros_like(Last_L),
         'el_Leistung_ges_L': np.zeros_like(Last_L),
         'specific_emissions': 1,
-        'techs': []
+        'techs': [],
+        'tech_results': []
     }
 
+    if cache:
+        kontext = hash_werte(time_steps, Last_L, VLT_L, RLT_L, start, end, TRY, COP_data, Gaspreis, Strompreis, Holzpreis, BEW, q, r, T, stundensatz, gewichte)
+
     # zunächst Berechnung der Erzeugung
     for tech in tech_order.copy():
         if len(variables) > 0:
@@ -585,35 +884,40 @@ def Berechnung_Erzeugermix(tech_order, initial_data, start, end, TRY, COP_data,
                 tech.Fläche, tech.Bohrtiefe = variables[variables_order.index("Fläche")], variables[variables_order.index("Bohrtiefe")]
             elif tech.name == "BHKW" or tech.name == "Holzgas-BHKW":
                 tech.th_Leistung_BHKW = variables[variables_order.index("th_Leistung_BHKW")]
+            elif tech.name == "BHKW_Speicher" or tech.name == "Holzgas-BHKW_Speicher":
+                tech.th_Leistung_BHKW, tech.Speichervolumen_BHKW = variables[variables_order.index("th_Leistung_BHKW")], variables[variables_order.index("Speichervolumen_BHKW")]
             elif tech.name == "Biomassekessel":
                 tech.P_BMK = variables[variables_order.index("P_BMK")]
 
-        if tech.name == "Solarthermie":
-            tech_results = tech.calculate(VLT_L, RLT_L, TRY, time_steps, start, end, q, r, T, BEW, stundensatz, duration, general_results)
-
-        elif tech.name == "Abwärme" or tech.name == "Abwasserwärme":
-            tech_results = tech.calculate(VLT_L, COP_data, Strompreis, q, r, T, BEW, stundensatz, duration, general_results)
-        
-        elif tech.name == "Flusswasser":
-            tech_results = tech.calculate(VLT_L, COP_data, Strompreis, q, r, T, BEW, stundensatz, duration, general_results)
-
-        elif tech.name == "Geothermie":
-            tech_results = tech.calculate(VLT_L, COP_data, Strompreis, q, r, T, BEW, stundensatz, duration, general_results)
-            
-        elif tech.name == "BHKW" or tech.name == "Holzgas-BHKW":
-            tech_results = tech.calculate(Gaspreis, Holzpreis, Strompreis, q, r, T, BEW, stundensatz, duration, general_results)
-            
-        elif tech.name == "Biomassekessel":
-            tech_results = tech.calculate(Holzpreis, q, r, T, BEW, stundensatz, duration, general_results)
-            
-        elif tech.name == "Gaskessel":
-            tech_results = tech.calculate(Gaspreis, q, r, T, BEW, stundensatz, duration, Last_L, general_results)
-            
-        else:
-            tech_order.remove(tech)
-            print(f"{tech.name} ist kein gültiger Erzeugertyp und wird daher nicht betrachtet.")
+        tech_results = None
+        if cache:
+            schlüssel = hash_werte(kontext, type(tech).__name__, tech_parameter(tech), general_results['Restlast_L'])
+            if schlüssel in _ergebnis_cache:
+                _ergebnis_cache.move_to_end(schlüssel)
+                gespeicherte_results, tech_zustand = _ergebnis_cache[schlüssel]
+                # abgeleitete Attribute (z.B. Investitionskosten) wiederherstellen, Arrays als Kopie zurückgeben
+                tech.__dict__.update(tech_zustand)
+                tech_results = {key: value.copy() if isinstance(value, np.ndarray) else value for key, value in gespeicherte_results.items()}
+
+        if tech_results is None:
+            tech_results = berechne_tech(tech, VLT_L, RLT_L, TRY, time_steps, start, end, COP_data, Gaspreis, Strompreis, Holzpreis, q, r, T, BEW, stundensatz, duration, Last_L, general_results)
+
+            if tech_results is None:
+                tech_order.remove(tech)
+                print(f"{tech.name} ist kein gültiger Erzeugertyp und wird daher nicht betrachtet.")
+                continue
+
+            if gewichte is not None:
+                tech_results = gewichtete_Jahreswerte(tech_results, gewichte, duration)
+                tech_results['WGK'] = berechne_WGK(tech, tech_results, Gaspreis, Strompreis, Holzpreis, q, r, T, BEW, stundensatz)
+
+            if cache:
+                _ergebnis_cache[schlüssel] = ({key: value.copy() if isinstance(value, np.ndarray) else value for key, value in tech_results.items()}, dict(tech.__dict__))
+                if len(_ergebnis_cache) > ERGEBNIS_CACHE_GRÖSSE:
+                    _ergebnis_cache.popitem(last=False)
 
         if tech_results['Wärmemenge'] > 0:
+            general_results['tech_results'].append(tech_results)
             general_results['Wärmeleistung_L'].append(tech_results['Wärmeleistung_L'])
             general_results['Wärmemengen'].append(tech_results['Wärmemenge'])
             general_results['Anteile'].append(tech_results['Wärmemenge']/general_results['Jahreswärmebedarf'])
@@ -625,7 +929,7 @@ def Berechnung_Erzeugermix(tech_order, initial_data, start, end, TRY, COP_data,
             general_results['Restwärmebedarf'] -= tech_results['Wärmemenge']
             general_results['WGK_Gesamt'] += (tech_results['Wärmemenge']*tech_results['WGK'])/general_results['Jahreswärmebedarf']
 
-            if tech.name == "BHKW" or tech.name == "Holzgas-BHKW":
+            if tech.name in ["BHKW", "Holzgas-BHKW", "BHKW_Speicher", "Holzgas-BHKW_Speicher"]:
                 general_results['Strommenge'] += tech_results["Strommenge"]
                 general_results['el_Leistung_L'] += tech_results["el_Leistung_L"]
                 general_results['el_Leistung_ges_L'] += tech_results["el_Leistung_L"]
@@ -643,7 +947,77 @@ def Berechnung_Erzeugermix(tech_order, initial_data, start, end, TRY, COP_data,
 
     return general_results
 
-def optimize_mix(tech_order, initial_data, start, end, TRY, COP_data, Gaspreis, Strompreis, Holzpreis, BEW, kapitalzins, preissteigerungsrate, betrachtungszeitraum, stundensatz):
+def berechne_WGK(tech, tech_results, Gaspreis, Strompreis, Holzpreis, q, r, T, BEW, stundensatz):
+    # Wärmegestehungskosten eines Erzeugers aus den technischen Ergebnissen von Berechnung_Erzeugermix, ohne erneute Simulation
+    Wärmemenge = tech_results['Wärmemenge']
+
+    if tech.name == "Solarthermie":
+        return tech.calc_WGK(Wärmemenge, q, r, T, BEW, stundensatz)
+    
+    elif tech.name == "Abwärme" or tech.name == "Abwasserwärme":
+        return tech.WGK(tech.max_Wärmeleistung, Wärmemenge, tech_results['Strombedarf'], tech.spez_Investitionskosten_Abwärme, Strompreis, q, r, T, BEW, stundensatz)
+    
+    elif tech.name == "Flusswasser":
+        return tech.WGK(tech.Wärmeleistung_FW_WP, Wärmemenge, tech_results['Strombedarf'], tech.spez_Investitionskosten_Flusswasser, Strompreis, q, r, T, BEW, stundensatz)
+
+    elif tech.name == "Geothermie":
+        return tech.WGK(tech.max_Wärmeleistung, Wärmemenge, tech_results['Strombedarf'], tech.spez_Investitionskosten_Erdsonden, Strompreis, q, r, T, BEW, stundensatz)
+        
+    elif tech.name in ["BHKW", "Holzgas-BHKW", "BHKW_Speicher", "Holzgas-BHKW_Speicher"]:
+        Brennstoffpreis = Gaspreis if tech.name in ["BHKW", "BHKW_Speicher"] else Holzpreis
+        return tech.WGK(Wärmemenge, tech_results['Strommenge'], tech_results['Brennstoffbedarf'], Brennstoffpreis, Strompreis, q, r, T, BEW, stundensatz)
+        
+    elif tech.name == "Biomassekessel":
+        return tech.WGK(Wärmemenge, tech_results['Brennstoffbedarf'], Holzpreis, q, r, T, BEW, stundensatz)
+        
+    elif tech.name == "Gaskessel":
+        return tech.WGK(tech.P_max, Wärmemenge, tech_results['Brennstoffbedarf'], Gaspreis, q, r, T, BEW, stundensatz)
+
+def Wirtschaftlichkeit_Szenarien(tech_order, general_results, Gaspreis, Strompreis, Holzpreis, BEW="Nein", kapitalzins=5, preissteigerungsrate=3, betrachtungszeitraum=20, stundensatz=45, erzeuger_parameter=None):
+    # Neubewertung der Wirtschaftlichkeit nach VDI 2067 für viele Szenarien auf Basis eines bereits berechneten Erzeugermixes
+    # Preise, Zinsen, Betrachtungszeitraum, stundensatz und BEW ("Ja"/"Nein") können Arrays sein, die nach numpy-Regeln gegeneinander
+    # ausgewertet werden, z.B. Gaspreis[:, None] und kapitalzins[None, :] für ein Raster
+    # erzeuger_parameter: Kostenparameter einzelner Erzeuger, z.B. {"Solarthermie": {"kosten_vrk_spez": array}}
+    # tech_order und general_results müssen aus demselben Aufruf von Berechnung_Erzeugermix stammen
+    erzeuger_parameter = erzeuger_parameter or {}
+    q, r, T = calculate_factors(np.asarray(kapitalzins, dtype=float), np.asarray(preissteigerungsrate, dtype=float), np.asarray(betrachtungszeitraum))
+    BEW = np.asarray(BEW)
+    parameter_werte = [wert for parameter in erzeuger_parameter.values() for wert in parameter.values()]
+    form = np.broadcast_shapes(*[np.shape(wert) for wert in [Gaspreis, Strompreis, Holzpreis, q, r, T, BEW, stundensatz] + parameter_werte])
+
+    techs = {tech.name: tech for tech in tech_order}
+
+    szenario_results = {
+        'techs': general_results['techs'],
+        'WGK': [],
+        'WGK_Gesamt': np.zeros(form)
+    }
+
+    for name, tech_results in zip(general_results['techs'], general_results['tech_results']):
+        tech = techs[name]
+        # WGK-Methoden setzen Attribute (z.B. Annuität), der Zustand des Erzeugers wird danach wiederhergestellt
+        tech_zustand = dict(tech.__dict__)
+        try:
+            for attribut, wert in erzeuger_parameter.get(name, {}).items():
+                setattr(tech, attribut, wert)
+
+            if BEW.ndim == 0:
+                WGK = berechne_WGK(tech, tech_results, Gaspreis, Strompreis, Holzpreis, q, r, T, str(BEW), stundensatz)
+            else:
+                WGK = np.where(BEW == "Ja", berechne_WGK(tech, tech_results, Gaspreis, Strompreis, Holzpreis, q, r, T, "Ja", stundensatz),
+                               berechne_WGK(tech, tech_results, Gaspreis, Strompreis, Holzpreis, q, r, T, "Nein", stundensatz))
+        finally:
+            tech.__dict__.clear()
+            tech.__dict__.update(tech_zustand)
+
+        WGK = np.broadcast_to(WGK, form)
+        szenario_results['WGK'].append(WGK)
+        szenario_results['WGK_Gesamt'] += (tech_results['Wärmemenge']*WGK)/general_results['Jahreswärmebedarf']
+
+    return szenario_results
+
+def optimierungsvariablen(tech_order):
+    # Startwerte, Reihenfolge und Grenzen der Optimierungsvariablen
     # solar Fläche, Speichervolumen solar, Leistung Biomasse, Leistung BHKW
     initial_values = []
     variables_order = []
@@ -656,6 +1030,13 @@ def optimize_mix(tech_order, initial_data, start, end, TRY, COP_data, Gaspreis,
             initial_values.append(tech.vs)
             variables_order.append("vs")
             bounds.append((0, 100))
+        elif isinstance(tech, CHPStorage):
+            initial_values.append(tech.th_Leistung_BHKW)
+            variables_order.append("th_Leistung_BHKW")
+            bounds.append((0, 500))
+            initial_values.append(tech.Speichervolumen_BHKW)
+            variables_order.append("Speichervolumen_BHKW")
+            bounds.append((0, 100))
         elif isinstance(tech, CHP):
             initial_values.append(tech.th_Leistung_BHKW)
             variables_order.append("th_Leistung_BHKW")
@@ -680,42 +1061,248 @@ def optimize_mix(tech_order, initial_data, start, end, TRY, COP_data, Gaspreis,
             variables_order.append("Wärmeleistung_FW_WP")
             bounds.append((0, 1000))
 
+    return initial_values, variables_order, bounds
 
-    def objective(variables):
-        general_results = Berechnung_Erzeugermix(tech_order, initial_data, start, end, TRY, COP_data, Gaspreis, Strompreis, Holzpreis, BEW, variables, variables_order, \
-                                            kapitalzins=kapitalzins, preissteigerungsrate=preissteigerungsrate, betrachtungszeitraum=betrachtungszeitraum, stundensatz=stundensatz)
-        
-        return general_results["WGK_Gesamt"]
+def setze_optimierte_werte(tech_order, optimized_values, variables_order):
+    for tech in tech_order:
+        if isinstance(tech, SolarThermal):
+            tech.bruttofläche_STA, tech.vs = optimized_values[variables_order.index("bruttofläche_STA")], optimized_values[variables_order.index("vs")]
+        elif isinstance(tech, BiomassBoiler):
+            tech.P_BMK = optimized_values[variables_order.index("P_BMK")]
+        elif isinstance(tech, CHPStorage):
+            tech.th_Leistung_BHKW, tech.Speichervolumen_BHKW = optimized_values[variables_order.index("th_Leistung_BHKW")], optimized_values[variables_order.index("Speichervolumen_BHKW")]
+        elif isinstance(tech, CHP):
+            tech.th_Leistung_BHKW = optimized_values[variables_order.index("th_Leistung_BHKW")]
+        elif isinstance(tech, Geothermal):
+            tech.Fläche, tech.Bohrtiefe = optimized_values[variables_order.index("Fläche")], optimized_values[variables_order.index("Bohrtiefe")]
+        elif isinstance(tech, WasteHeatPump):
+            tech.Kühlleistung_Abwärme = optimized_values[variables_order.index("Kühlleistung_Abwärme")]
+        elif isinstance(tech, RiverHeatPump):
+            tech.Wärmeleistung_FW_WP = optimized_values[variables_order.index("Wärmeleistung_FW_WP")]
+
+# Daten der Zielfunktion in den Worker-Prozessen, werden einmalig beim Start des Prozesses übergeben
+_worker_daten = None
+
+def _initialisiere_worker(daten):
+    global _worker_daten
+    _worker_daten = daten
+
+# Berechnung_Erzeugermix entfernt Erzeuger ohne Wärmemenge dauerhaft aus tech_order, die folgenden Auswertungen rechnen
+# dann ohne diese Erzeuger. Die Worker rechnen daher mit den im Hauptprozess noch aktiven Erzeugern (Indizes der
+# vollständigen Liste) und geben zurück, welche Erzeuger danach noch aktiv sind.
+def _worker_zielfunktion(aufgabe):
+    variables, aktive = aufgabe
+    tech_order, *args = _worker_daten
+    erzeuger = [tech_order[i] for i in aktive]
+    f = zielfunktion(variables, erzeuger, *args)
+    return f, [i for i in aktive if any(tech_order[i] is tech for tech in erzeuger)]
+
+def _worker_optimierung(x0):
+    # jede Suche beginnt mit der vollständigen Erzeugerliste, wie optimize_mix
+    tech_order, variables_order, initial_data, start, end, TRY, COP_data, Gaspreis, Strompreis, Holzpreis, BEW, kapitalzins, preissteigerungsrate, betrachtungszeitraum, stundensatz, gewichte = _worker_daten
+    erzeuger = list(tech_order)
+    optimum = lokale_optimierung(x0, erzeuger, *_worker_daten[1:])
+
+    # Bewertung mit den nach der Suche verbliebenen Erzeugern. Ist der Wärmebedarf damit nicht gedeckt (z.B. wenn alle
+    # Erzeuger entfernt wurden), ist WGK_Gesamt nicht aussagekräftig und das Ergebnis wird nicht verwendet
+    general_results = Berechnung_Erzeugermix(erzeuger, initial_data, start, end, TRY, COP_data, Gaspreis, Strompreis, Holzpreis, BEW, optimum["Werte"], variables_order, \
+                                             kapitalzins=kapitalzins, preissteigerungsrate=preissteigerungsrate, betrachtungszeitraum=betrachtungszeitraum, stundensatz=stundensatz, gewichte=gewichte)
+    optimum["WGK_Gesamt"] = float(general_results["WGK_Gesamt"])
+    optimum["Erzeuger"] = [i for i, tech in enumerate(tech_order) if any(tech is verbleibend for verbleibend in erzeuger)]
+    if not general_results["Restwärmebedarf"] <= 1e-6 * general_results["Jahreswärmebedarf"]:
+        optimum["success"] = False
+        optimum["message"] = "Wärmebedarf nicht gedeckt"
+
+    return optimum
+
+def zielfunktion(variables, tech_order, variables_order, initial_data, start, end, TRY, COP_data, Gaspreis, Strompreis, Holzpreis, BEW, kapitalzins, preissteigerungsrate, betrachtungszeitraum, stundensatz, gewichte=None):
+    general_results = Berechnung_Erzeugermix(tech_order, initial_data, start, end, TRY, COP_data, Gaspreis, Strompreis, Holzpreis, BEW, variables, variables_order, \
+                                        kapitalzins=kapitalzins, preissteigerungsrate=preissteigerungsrate, betrachtungszeitraum=betrachtungszeitraum, stundensatz=stundensatz, gewichte=gewichte)
+    
+    return general_results["WGK_Gesamt"]
+
+def parallele_auswertung(executor, alle, tech_order, bounds):
+    """
+    Auswertung der Punkte für die Vorwärtsdifferenzen von SLSQP im Prozesspool (als workers an minimize übergeben).
+
+    Seriell werden die Punkte nacheinander berechnet und ein dabei entfernter Erzeuger fehlt bei allen folgenden Punkten.
+    Alle Punkte werden zunächst mit den aktuell aktiven Erzeugern berechnet. Entfernt ein Punkt einen Erzeuger, werden die
+    folgenden Punkte mit der verkleinerten Liste erneut berechnet und tech_order wie bei der seriellen Berechnung angepasst.
+
+    alle: vollständige Erzeugerliste, wie sie den Workern übergeben wurde
+    """
+    lower, upper = np.array(bounds, dtype=float).T
+
+    def auswerten(fun, punkte):
+        # fun ist die Zielfunktion im Hauptprozess, die Punkte werden stattdessen in den Workern berechnet
+        punkte = [np.clip(np.asarray(x, dtype=float), lower, upper) for x in punkte]
+        werte = []
+        while len(werte) < len(punkte):
+            aktive = [i for i, tech in enumerate(alle) if any(tech is aktiv for aktiv in tech_order)]
+            offen = punkte[len(werte):]
+            for f, verbleibend in executor.map(_worker_zielfunktion, [(x, aktive) for x in offen]):
+                werte.append(np.atleast_1d(f))
+                if verbleibend != aktive:
+                    tech_order[:] = [alle[i] for i in verbleibend]
+                    break
+        return werte
+
+    return auswerten
+
+def lokale_optimierung(x0, tech_order, variables_order, *args, workers=None):
+    # SLSQP-Suche von einem Startpunkt aus, Rückgabe als einfaches dict (für die Übergabe zwischen Prozessen)
+    # tech_order wird wie bei optimize_mix während der Suche um Erzeuger ohne Wärmemenge verkleinert
+    bounds = optimierungsvariablen(tech_order)[2]
+    objective = lambda variables: zielfunktion(variables, tech_order, variables_order, *args)
+    options = {'maxiter': 100} if workers is None else {'maxiter': 100, 'workers': workers}
+    result = minimize(objective, x0, method='SLSQP', bounds=bounds, options=options)
+    
+    return {"Startwerte": np.array(x0, dtype=float), "Werte": result.x, "WGK_Gesamt": float(result.fun), "success": result.success, "message": result.message, "nit": result.nit, "nfev": result.nfev}
+
+def optimize_mix(tech_order, initial_data, start, end, TRY, COP_data, Gaspreis, Strompreis, Holzpreis, BEW, kapitalzins, preissteigerungsrate, betrachtungszeitraum, stundensatz, parallel=False, max_workers=None, gewichte=None):
+    # parallel: die Punkte der Vorwärtsdifferenzen werden in einem Prozesspool (max_workers Prozesse) berechnet, das Ergebnis
+    # entspricht der seriellen Berechnung. Schneller nur, wenn eine Auswertung deutlich länger dauert als der Austausch mit
+    # den Prozessen und es mehrere Variablen gibt (benötigt scipy >= 1.16, sonst wird seriell gerechnet)
+    # gewichte: Berechnung auf Typtagen, siehe typtage.optimize_mix_typtage
+    initial_values, variables_order, bounds = optimierungsvariablen(tech_order)
+    args = (variables_order, initial_data, start, end, TRY, COP_data, Gaspreis, Strompreis, Holzpreis, BEW, kapitalzins, preissteigerungsrate, betrachtungszeitraum, stundensatz, gewichte)
 
     # optimization
-    result = minimize(objective, initial_values, method='SLSQP', bounds=bounds, options={'maxiter': 100})
+    if parallel:
+        alle = list(tech_order)
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_initialisiere_worker, initargs=((alle,) + args,)) as executor:
+            optimum = lokale_optimierung(initial_values, tech_order, *args, workers=parallele_auswertung(executor, alle, tech_order, bounds))
+    else:
+        optimum = lokale_optimierung(initial_values, tech_order, *args)
 
-    if result.success:
-        optimized_values = result.x
-        optimized_WGK_Gesamt = objective(optimized_values)
+    if optimum["success"]:
+        optimized_values = optimum["Werte"]
+        optimized_WGK_Gesamt = zielfunktion(optimized_values, tech_order, *args)
         print(f"Optimierte Werte: {optimized_values}")
         print(f"Minimale Wärmegestehungskosten: {optimized_WGK_Gesamt:.2f} €/MWh")
 
-        for tech in tech_order:
-            if isinstance(tech, SolarThermal):
-                tech.bruttofläche_STA, tech.vs = optimized_values[variables_order.index("bruttofläche_STA")], optimized_values[variables_order.index("vs")]
-            elif isinstance(tech, BiomassBoiler):
-                tech.P_BMK = optimized_values[variables_order.index("P_BMK")]
-            elif isinstance(tech, CHP):
-                tech.th_Leistung_BHKW = optimized_values[variables_order.index("th_Leistung_BHKW")]
-            elif isinstance(tech, Geothermal):
-                tech.Fläche, tech.Bohrtiefe = optimized_values[variables_order.index("Fläche")], optimized_values[variables_order.index("Bohrtiefe")]
-            elif isinstance(tech, WasteHeatPump):
-                tech.Kühlleistung_Abwärme = optimized_values[variables_order.index("Kühlleistung_Abwärme")]
-            elif isinstance(tech, RiverHeatPump):
-                tech.Wärmeleistung_FW_WP = optimized_values[variables_order.index("Wärmeleistung_FW_WP")]
+        setze_optimierte_werte(tech_order, optimized_values, variables_order)
 
         return tech_order
     else:
         print("Optimierung nicht erfolgreich")
-        print(result.message)
+        print(optimum["message"])
+
+def optimize_mix_multistart(tech_order, initial_data, start, end, TRY, COP_data, Gaspreis, Strompreis, Holzpreis, BEW, kapitalzins, preissteigerungsrate, betrachtungszeitraum, stundensatz, anzahl_starts=8, max_workers=None, seed=None, gewichte=None):
+    # Mehrere SLSQP-Suchen parallel von Startpunkten aus einem Latin-Hypercube-Plan, der erste Startpunkt sind die aktuellen Werte
+    # Jede Suche entspricht optimize_mix von ihrem Startpunkt aus, das beste Ergebnis ist daher nie schlechter als optimize_mix.
+    # Die Rechenzeit entspricht etwa anzahl_starts / max_workers seriellen Optimierungen.
+    # Rückgabe: tech_order mit dem besten Ergebnis (unverändert, wenn keine Suche erfolgreich war) und alle gefundenen lokalen Optima (erfolgreiche zuerst, aufsteigend nach WGK_Gesamt)
+    initial_values, variables_order, bounds = optimierungsvariablen(tech_order)
+    alle = list(tech_order)
+    args = (variables_order, initial_data, start, end, TRY, COP_data, Gaspreis, Strompreis, Holzpreis, BEW, kapitalzins, preissteigerungsrate, betrachtungszeitraum, stundensatz, gewichte)
+
+    lower, upper = np.array(bounds, dtype=float).T
+    starts = [np.array(initial_values, dtype=float)]
+    if anzahl_starts > 1:
+        sample = qmc.LatinHypercube(d=len(bounds), seed=seed).random(anzahl_starts - 1)
+        starts += list(qmc.scale(sample, lower, upper))
+
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_initialisiere_worker, initargs=((alle,) + args,)) as executor:
+        optima = list(executor.map(_worker_optimierung, starts))
+
+    optima.sort(key=lambda optimum: (not optimum["success"], optimum["WGK_Gesamt"]))
+    best = optima[0]
+    if not best["success"]:
+        # kein Startpunkt war erfolgreich, tech_order bleibt unverändert
+        print("Optimierung nicht erfolgreich")
+        print(best["message"])
+        return tech_order, optima
+
+    print(f"Optimierte Werte: {best['Werte']}")
+    print(f"Minimale Wärmegestehungskosten: {best['WGK_Gesamt']:.2f} €/MWh")
+    
+    # Berechnung mit den besten Werten im Hauptprozess, damit die Erzeugerobjekte den passenden Zustand haben,
+    # tech_order enthält wie bei optimize_mix nur die Erzeuger, die nach der Suche noch im Mix sind
+    tech_order[:] = [alle[i] for i in best["Erzeuger"]]
+    zielfunktion(best["Werte"], tech_order, *args)
+    setze_optimierte_werte(tech_order, best["Werte"], variables_order)
+
+    return tech_order, optima
+
+def blockmittel(werte, schritte):
+    # Mittelwerte über Blöcke von schritte Zeitschritten. Der Block mit dem Maximum erhält den Maximalwert,
+    # die übrigen Blöcke werden so skaliert, dass die Summe (Energie) erhalten bleibt
+    werte = np.asarray(werte, dtype=float)
+    blöcke = werte.reshape(-1, schritte)
+    mittel = blöcke.mean(axis=1)
+    if schritte == 1:
+        return mittel
+
+    spitze = np.argmax(blöcke.max(axis=1))
+    rest_soll = werte.sum() / schritte - werte.max()
+    rest_ist = mittel.sum() - mittel[spitze]
+    if rest_ist > 0 and rest_soll > 0:
+        mittel *= rest_soll / rest_ist
+    mittel[spitze] = werte.max()
+    return mittel
+
+def vergröberte_Daten(initial_data, start, end, Auflösung):
+    # Zeitreihen mit Zeitschritten von Auflösung h, Rückgabe: initial_data, start, end
+    time_steps, Last_L, VLT_L, RLT_L = initial_data
+    duration = np.diff(time_steps[0:2]) / np.timedelta64(1, 'h')
+    schritte = Auflösung / duration[0]
+    if not np.isclose(schritte, round(schritte)) or len(Last_L) % round(schritte) != 0 or start % round(schritte) != 0:
+        raise ValueError(f"Die Zeitreihe lässt sich nicht in Zeitschritte von {Auflösung} h zusammenfassen.")
+    schritte = int(round(schritte))
+
+    initial_data_grob = (np.asarray(time_steps)[::schritte], blockmittel(Last_L, schritte), blockmittel(VLT_L, schritte), blockmittel(RLT_L, schritte))
+    return initial_data_grob, start // schritte, start // schritte + len(Last_L) // schritte
+
+def optimize_mix_mehrstufig(tech_order, initial_data, start, end, TRY, COP_data, Gaspreis, Strompreis, Holzpreis, BEW, kapitalzins, preissteigerungsrate, betrachtungszeitraum, stundensatz, Stufen=(24, 1)):
+    """
+    Optimierung von grob nach fein: zunächst auf Zeitschritten der Stufen (in h), zuletzt in der Auflösung der Zeitreihe.
+    Das Ergebnis jeder Stufe ist Startwert der nächsten. Last, Vor- und Rücklauftemperatur behalten Summe und Maximum.
+    Stufen, die nicht gröber als die Zeitreihe sind, entfallen. Solarthermie benötigt stündliche Wetterdaten, daher
+    entfallen mit Solarthermie im Mix Stufen über 1 h.
+
+    Rückgabe: tech_order (None, falls die letzte Stufe nicht konvergiert) und Liste mit Auflösung, Iterationen,
+    Funktionsaufrufen, Rechenzeit und WGK_Gesamt je Stufe
+    """
+    duration = float((np.diff(initial_data[0][0:2]) / np.timedelta64(1, 'h'))[0])
+    Auflösungen = [Auflösung for Auflösung in Stufen if Auflösung > duration and not (Auflösung > 1 and any(isinstance(tech, SolarThermal) for tech in tech_order))]
+
+    initial_values, variables_order, bounds = optimierungsvariablen(tech_order)
+    stufen = []
+    for Auflösung in Auflösungen + [duration]:
+        if Auflösung == duration:
+            daten, start_stufe, end_stufe = initial_data, start, end
+        else:
+            daten, start_stufe, end_stufe = vergröberte_Daten(initial_data, start, end, Auflösung)
+
+        beginn = time.perf_counter()
+        # jede Stufe beginnt wie optimize_mix mit der vollständigen Erzeugerliste
+        erzeuger = list(tech_order)
+        optimum = lokale_optimierung(initial_values, erzeuger, variables_order, daten, start_stufe, end_stufe, TRY, COP_data, Gaspreis, Strompreis, Holzpreis, BEW,
+                                     kapitalzins, preissteigerungsrate, betrachtungszeitraum, stundensatz)
+        stufen.append({"Auflösung": Auflösung, "Zeitschritte": len(daten[1]), "nit": optimum["nit"], "nfev": optimum["nfev"],
+                       "Zeit": time.perf_counter() - beginn, "WGK_Gesamt": optimum["WGK_Gesamt"], "success": optimum["success"]})
+        print(f"Stufe {Auflösung} h: {optimum['nit']} Iterationen, {stufen[-1]['Zeit']:.1f} s, {optimum['WGK_Gesamt']:.2f} €/MWh")
+
+        # hat die Suche alle Erzeuger entfernt, ist das Ergebnis kein sinnvoller Startwert für die nächste Stufe
+        if erzeuger:
+            initial_values = optimum["Werte"]
+        else:
+            print(f"Stufe {Auflösung} h: alle Erzeuger entfernt, Startwerte bleiben unverändert")
+
+    if not optimum["success"]:
+        print("Optimierung nicht erfolgreich")
+        print(optimum["message"])
+        return None, stufen
 
+    # Berechnung mit den optimierten Werten, damit die Erzeugerobjekte den passenden Zustand haben,
+    # tech_order enthält wie bei optimize_mix nur die Erzeuger, die nach der Suche der letzten Stufe noch im Mix sind
+    tech_order[:] = erzeuger
+    zielfunktion(optimum["Werte"], tech_order, variables_order, initial_data, start, end, TRY, COP_data, Gaspreis, Strompreis, Holzpreis, BEW,
+                 kapitalzins, preissteigerungsrate, betrachtungszeitraum, stundensatz)
+    setze_optimierte_werte(tech_order, optimum["Werte"], variables_order)
 
+    return tech_order, stufen
 
 # Diese Klasse ist nocht fertig implementiert und die Nutzung auch noch nicht durchdacht, Wie muss dass ganze bilanziert werden?
 class Photovoltaics:
@@ -0,0 +1,25 @@
+# Optionale JIT-Kompilierung der zeitschrittweisen Rechenkerne mit numba
+# Ist numba nicht installiert, werden die Kerne als reiner Python-Code ausgeführt
+
+try:
+    from numba import njit
+    NUMBA_VERFÜGBAR = True
+except ImportError:
+    njit = None
+    NUMBA_VERFÜGBAR = False
+
+def jit(func):
+    # Kompiliert die Funktion mit numba, falls verfügbar. Die unkompilierte Funktion bleibt über py_func erreichbar.
+    if not NUMBA_VERFÜGBAR:
+        func.py_func = func
+        return func
+    return njit(cache=True)(func)
+
+def rechenkern(func, engine):
+    # Auswahl zwischen kompiliertem ("numba") und reinem Python-Rechenkern ("python")
+    if engine == "numba":
+        return func
+    elif engine == "python":
+        return func.py_func
+    else:
+        raise ValueError(f"Unbekannte engine '{engine}', erlaubt sind 'python' und 'numba'.")
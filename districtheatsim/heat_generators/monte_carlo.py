@@ -0,0 +1,101 @@
+# Erstellt von Jonas Pfeiffer
+# Monte-Carlo-Unsicherheitsanalyse der Wärmegestehungskosten eines Erzeugermixes
+# Die Erzeugung (Berechnung_Erzeugermix) wird je Auslegung nur einmal berechnet, die Stichproben werden über
+# Wirtschaftlichkeit_Szenarien als Arrays ausgewertet
+
+import numpy as np
+
+from heat_generators.heat_generator_classes import Wirtschaftlichkeit_Szenarien
+
+# Verteilungen: Funktionen, die für einen Zufallsgenerator und eine Anzahl ein Array von Stichproben liefern
+def normalverteilung(mittelwert, standardabweichung, minimum=None):
+    def ziehen(rng, anzahl):
+        werte = rng.normal(mittelwert, standardabweichung, anzahl)
+        return werte if minimum is None else np.maximum(werte, minimum)
+    return ziehen
+
+def lognormalverteilung(mittelwert, standardabweichung):
+    # Parameter beziehen sich auf die Verteilung selbst, nicht auf den Logarithmus
+    sigma = np.sqrt(np.log(1 + (standardabweichung / mittelwert) ** 2))
+    mu = np.log(mittelwert) - sigma ** 2 / 2
+    def ziehen(rng, anzahl):
+        return rng.lognormal(mu, sigma, anzahl)
+    return ziehen
+
+def gleichverteilung(minimum, maximum):
+    def ziehen(rng, anzahl):
+        return rng.uniform(minimum, maximum, anzahl)
+    return ziehen
+
+def dreiecksverteilung(minimum, modalwert, maximum):
+    def ziehen(rng, anzahl):
+        return rng.triangular(minimum, modalwert, maximum, anzahl)
+    return ziehen
+
+def stichproben(werte):
+    # empirische Verteilung, es wird mit Zurücklegen aus den übergebenen Werten gezogen
+    werte = np.asarray(werte, dtype=float)
+    def ziehen(rng, anzahl):
+        return rng.choice(werte, anzahl)
+    return ziehen
+
+def ziehe_stichproben(verteilung, rng, anzahl):
+    if callable(verteilung):
+        return np.asarray(verteilung(rng, anzahl), dtype=float)
+    # feste Werte werden nicht variiert
+    return verteilung
+
+def Monte_Carlo_WGK(tech_order, general_results, verteilungen, Gaspreis, Strompreis, Holzpreis, BEW="Nein", kapitalzins=5, preissteigerungsrate=3,
+                    betrachtungszeitraum=20, stundensatz=45, anzahl=10000, chunk_size=1000, perzentile=(5, 50, 95), seed=None):
+    """
+    Monte-Carlo-Auswertung der Wärmegestehungskosten für einen mit Berechnung_Erzeugermix berechneten Erzeugermix.
+
+    verteilungen: dict mit Verteilungen (siehe oben) für "Gaspreis", "Strompreis", "Holzpreis", "kapitalzins", "preissteigerungsrate"
+    und "stundensatz" sowie für Kostenparameter der Erzeuger als "Name.Attribut", z.B. "Solarthermie.kosten_vrk_spez" oder
+    "Geothermie.spez_Investitionskosten_Erdsonden". Nicht enthaltene Größen behalten die übergebenen Werte.
+    Die Stichproben werden in Blöcken von chunk_size ausgewertet, um den Speicherbedarf zu begrenzen.
+
+    Rückgabe: dict mit techs, WGK (Stichproben je Erzeuger), WGK_Gesamt (Stichproben), Perzentilen und Mittelwerten
+    """
+    rng = np.random.default_rng(seed)
+
+    wirtschaftliche_parameter = {"Gaspreis": Gaspreis, "Strompreis": Strompreis, "Holzpreis": Holzpreis, "kapitalzins": kapitalzins,
+                                 "preissteigerungsrate": preissteigerungsrate, "stundensatz": stundensatz}
+    for schlüssel in verteilungen:
+        if schlüssel not in wirtschaftliche_parameter and "." not in schlüssel:
+            raise ValueError(f"Unbekannte unsichere Größe '{schlüssel}'.")
+
+    techs = general_results['techs']
+    WGK = np.zeros((len(techs), anzahl))
+    WGK_Gesamt = np.zeros(anzahl)
+
+    for start in range(0, anzahl, chunk_size):
+        n = min(chunk_size, anzahl - start)
+
+        parameter = {name: ziehe_stichproben(verteilungen.get(name, wert), rng, n) for name, wert in wirtschaftliche_parameter.items()}
+        erzeuger_parameter = {}
+        for schlüssel, verteilung in verteilungen.items():
+            if "." in schlüssel:
+                name, attribut = schlüssel.split(".", 1)
+                erzeuger_parameter.setdefault(name, {})[attribut] = ziehe_stichproben(verteilung, rng, n)
+
+        szenario_results = Wirtschaftlichkeit_Szenarien(tech_order, general_results, parameter["Gaspreis"], parameter["Strompreis"], parameter["Holzpreis"], BEW,
+                                                        parameter["kapitalzins"], parameter["preissteigerungsrate"], betrachtungszeitraum, parameter["stundensatz"],
+                                                        erzeuger_parameter)
+
+        for i, WGK_tech in enumerate(szenario_results['WGK']):
+            WGK[i, start:start + n] = WGK_tech
+        WGK_Gesamt[start:start + n] = szenario_results['WGK_Gesamt']
+
+    mc_results = {
+        'techs': techs,
+        'WGK': WGK,
+        'WGK_Gesamt': WGK_Gesamt,
+        'perzentile': perzentile,
+        'WGK_Perzentile': np.percentile(WGK, perzentile, axis=1).T,
+        'WGK_Gesamt_Perzentile': np.percentile(WGK_Gesamt, perzentile),
+        'WGK_Mittelwert': WGK.mean(axis=1),
+        'WGK_Gesamt_Mittelwert': WGK_Gesamt.mean()
+    }
+
+    return mc_results
@@ -0,0 +1,226 @@
+# Erstellt von Jonas Pfeiffer
+# Preisgeführter Einsatz der Erzeuger (BHKW, Wärmepumpen, Kessel, Speicher) gegen stündliche Day-Ahead-Strompreise
+# Lineares Programm (HiGHS über scipy) im rollierenden Horizont: Fenster von z.B. 48 h, davon werden 24 h übernommen
+
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.optimize import linprog
+from scipy.sparse import bmat, csr_matrix, diags, hstack, identity
+
+from heat_generators.heat_generator_classes import CHP, CHPStorage, BiomassBoiler, GasBoiler, SolarThermal, WasteHeatPump, RiverHeatPump, Geothermal
+
+# Kosten für nicht gedeckte Last in €/MWh, hält das Problem auch ohne Gaskessel lösbar
+KOSTEN_UNGEDECKT = 10000
+
+def Strompreise_einlesen(dateiname):
+    # Day-Ahead-Preise in €/MWh aus dem Export der Energy-Charts (zweizeiliger Kopf, siehe currently_not_used/Strompreise_day_ahead_2023.csv)
+    df = pd.read_csv(dateiname, header=[0, 1], index_col=0)
+    df.columns = [f'{i[0]} {i[1]}' if i[1] else f'{i[0]}' for i in df.columns]
+    return df["Day Ahead Auktion Preis (EUR/MWh, EUR/tCO2)"].values.astype(float)
+
+def Erzeugerdaten(tech_order, general_results, COP_data, Strompreis_L, Gaspreis, Holzpreis):
+    """
+    Zeitreihen der regelbaren Erzeuger für das lineare Programm.
+
+    Rückgabe: Namen, maximale Wärmeleistung [Erzeuger x Zeitschritte] in kW, variable Kosten in €/kWh Wärme,
+    Stromerzeugung und Strombedarf je kWh Wärme, feste Erzeugung (Solarthermie) in kW, Speicherkapazität in kWh
+    und je Erzeuger, ob er den Speicher laden darf.
+
+    Die Pufferspeicher aller BHKW mit Speicher werden zu einem Speicher zusammengefasst, der nur von diesen BHKW geladen wird
+    (Ladeleistung höchstens ihre gemeinsame Erzeugung). Die Füllstandsgrenzen der Speicher werden nicht berücksichtigt.
+    """
+    Last_L, VLT_L = general_results['Last_L'], general_results['VLT_L']
+    n = len(Last_L)
+
+    namen, P_max, Kosten, Strom_erzeugt, Strom_bezogen, Speicher_laden = [], [], [], [], [], []
+    feste_Erzeugung = np.zeros(n)
+    Speicherkapazität = 0
+
+    def erzeuger(name, leistung, kosten, erzeugt=0, bezogen=0, laden=False):
+        namen.append(name)
+        Speicher_laden.append(laden)
+        P_max.append(np.broadcast_to(np.asarray(leistung, dtype=float), (n,)))
+        Kosten.append(np.broadcast_to(np.asarray(kosten, dtype=float), (n,)))
+        Strom_erzeugt.append(np.broadcast_to(np.asarray(erzeugt, dtype=float), (n,)))
+        Strom_bezogen.append(np.broadcast_to(np.asarray(bezogen, dtype=float), (n,)))
+
+    for tech in tech_order:
+        if isinstance(tech, SolarThermal):
+            # nicht regelbar, Erzeugung aus Berechnung_Erzeugermix
+            if tech.name in general_results['techs']:
+                feste_Erzeugung += general_results['Wärmeleistung_L'][general_results['techs'].index(tech.name)]
+
+        elif isinstance(tech, CHP):
+            el_Wirkungsgrad, KWK_Wirkungsgrad = 0.33, 0.9
+            Stromkennzahl = el_Wirkungsgrad / (KWK_Wirkungsgrad - el_Wirkungsgrad)
+            Brennstoffpreis = Holzpreis if "Holzgas" in tech.name else Gaspreis
+            Brennstoff = (1 + Stromkennzahl) / KWK_Wirkungsgrad
+            erzeuger(tech.name, tech.th_Leistung_BHKW, (Brennstoff * Brennstoffpreis - Stromkennzahl * Strompreis_L) / 1000, erzeugt=Stromkennzahl, laden=isinstance(tech, CHPStorage))
+            if isinstance(tech, CHPStorage):
+                Speicherkapazität += tech.Speichervolumen_BHKW * 1.163 * tech.Speicher_dT
+
+        elif isinstance(tech, WasteHeatPump):
+            COP_L, _ = tech.COP_WP(VLT_L, tech.Temperatur_Abwärme, COP_data)
+            erzeuger(tech.name, tech.Kühlleistung_Abwärme / (1 - (1 / COP_L)), Strompreis_L / COP_L / 1000, bezogen=1 / COP_L)
+
+        elif isinstance(tech, RiverHeatPump):
+            COP_L, VLT_L_WP = tech.COP_WP(VLT_L, tech.Temperatur_FW_WP, COP_data)
+            erzeuger(tech.name, np.where(VLT_L_WP < VLT_L - tech.dT, 0, tech.Wärmeleistung_FW_WP), Strompreis_L / COP_L / 1000, bezogen=1 / COP_L)
+
+        elif isinstance(tech, Geothermal):
+            # Leistung aus Berechnung_Erzeugermix, die jährliche Entzugswärmemenge wird im Fenster nicht begrenzt
+            COP_L, _ = tech.COP_WP(VLT_L, tech.Temperatur_Geothermie, COP_data)
+            erzeuger(tech.name, getattr(tech, 'max_Wärmeleistung', 0), Strompreis_L / COP_L / 1000, bezogen=1 / COP_L)
+
+        elif isinstance(tech, BiomassBoiler):
+            erzeuger(tech.name, tech.P_BMK, Holzpreis / 0.8 / 1000)
+
+        elif isinstance(tech, GasBoiler):
+            erzeuger(tech.name, np.max(Last_L), Gaspreis / 0.9 / 1000)
+
+    return namen, np.array(P_max), np.array(Kosten), np.array(Strom_erzeugt), np.array(Strom_bezogen), feste_Erzeugung, Speicherkapazität, np.array(Speicher_laden, dtype=bool)
+
+def Fenstermatrix(U, H, duration, Speicher_laden=None):
+    # Gleichungsnebenbedingungen eines Fensters: Summe Erzeugung + ungedeckt - Speicherladung = Restlast
+    # Variablen: Erzeugung [U x H] (zeitschrittweise je Erzeuger), ungedeckt [H], Speicherstand [H]
+    # Mit Speicher (Speicher_laden: Maske der Erzeuger, die laden dürfen) zusätzlich die Ungleichung
+    # Speicherladung - Erzeugung der ladenden Erzeuger <= 0
+    # Die Struktur ist für alle Fenster gleicher Länge identisch und wird wiederverwendet
+    # Rückgabe: A_eq, A_ub (ohne Speicher None)
+    A_Erzeugung = hstack([identity(H)] * U)
+    if Speicher_laden is None:
+        return bmat([[A_Erzeugung, identity(H)]], format='csr'), None
+
+    # (s_t - s_t-1) / duration
+    A_Ladung = diags([np.ones(H), -np.ones(H - 1)], [0, -1]) / duration
+    A_eq = bmat([[A_Erzeugung, identity(H), -A_Ladung]], format='csr')
+    keine = csr_matrix((H, H))
+    A_ub = bmat([[-identity(H) if laden else keine for laden in Speicher_laden] + [keine, A_Ladung]], format='csr')
+    return A_eq, A_ub
+
+def löse_fenster(A_eq, A_ub, Restlast, P_max, Kosten, duration, Speicherkapazität, Speicherstand_0):
+    # Lösung eines Fensters, Rückgabe: Erzeugung [U x H], ungedeckt [H], Speicherstand [H], Status, Lösungszeit in s
+    U, H = P_max.shape
+    mit_Speicher = A_ub is not None
+    b_ub = None
+
+    c = np.concatenate((Kosten.ravel() * duration, np.full(H, KOSTEN_UNGEDECKT / 1000 * duration)))
+    upper = np.concatenate((P_max.ravel(), np.full(H, np.inf)))
+    b_eq = np.array(Restlast, dtype=float)
+    if mit_Speicher:
+        c = np.concatenate((c, np.zeros(H)))
+        upper = np.concatenate((upper, np.full(H, Speicherkapazität)))
+        b_eq[0] -= Speicherstand_0 / duration
+        b_ub = np.zeros(H)
+        b_ub[0] = Speicherstand_0 / duration
+    bounds = np.column_stack((np.zeros_like(upper), upper))
+
+    start = time.perf_counter()
+    result = linprog(c, A_ub=A_ub, b_ub=b_ub, A_eq=A_eq, b_eq=b_eq, bounds=bounds, method='highs')
+    Lösungszeit = time.perf_counter() - start
+
+    if result.x is None:
+        raise ValueError(f"Einsatzoptimierung nicht lösbar: {result.message}")
+
+    x = result.x
+    Erzeugung = x[:U * H].reshape(U, H)
+    ungedeckt = x[U * H:U * H + H]
+    Speicherstand = x[U * H + H:] if mit_Speicher else np.zeros(H)
+
+    return Erzeugung, ungedeckt, Speicherstand, result.status, Lösungszeit
+
+def _löse_fenster_unabhängig(args):
+    A_eq, Restlast, P_max, Kosten, duration = args
+    return löse_fenster(A_eq, None, Restlast, P_max, Kosten, duration, 0, 0)
+
+def Rolling_Horizon_Dispatch(tech_order, general_results, COP_data, Strompreis_L, Gaspreis, Holzpreis, Fenster=48, Übernahme=24, max_workers=None):
+    """
+    Kostenminimaler Einsatz der Erzeuger eines mit Berechnung_Erzeugermix berechneten Mixes gegen zeitlich veränderliche Strompreise.
+
+    Je Fenster (Fenster in h) wird ein LP mit HiGHS gelöst, die ersten Übernahme h werden übernommen und der Speicherstand
+    am Ende der Übernahme ist Startwert des nächsten Fensters. Die Matrix der Nebenbedingungen wird für alle Fenster
+    wiederverwendet. Ohne Speicher sind die Fenster unabhängig und werden parallel im Prozesspool gelöst
+    (max_workers, max_workers=1: nacheinander im aktuellen Prozess). Zum Speichermodell siehe Erzeugerdaten.
+    Strompreis_L in €/MWh, stündliche Preise werden bei kürzeren Zeitschritten wiederholt.
+
+    Rückgabe: dict mit Wärmeleistung je Erzeuger, Strombedarf/-erzeugung, Speicherfüllstand, ungedeckter Last,
+    variablen Kosten in € sowie Lösungsstatus und -zeit je Fenster
+    """
+    time_steps, Last_L = general_results['time_steps'], general_results['Last_L']
+    duration = np.diff(time_steps[0:2]) / np.timedelta64(1, 'h')
+    duration = duration[0]
+    n = len(Last_L)
+
+    Strompreis_L = np.asarray(Strompreis_L, dtype=float)
+    if len(Strompreis_L) != n:
+        if n % len(Strompreis_L) != 0:
+            raise ValueError("Die Länge der Strompreise passt nicht zum Lastgang.")
+        Strompreis_L = np.repeat(Strompreis_L, n // len(Strompreis_L))
+
+    namen, P_max, Kosten, Strom_erzeugt, Strom_bezogen, feste_Erzeugung, Speicherkapazität, Speicher_laden = Erzeugerdaten(tech_order, general_results, COP_data, Strompreis_L, Gaspreis, Holzpreis)
+    Restlast_L = np.maximum(Last_L - feste_Erzeugung, 0)
+    U = len(namen)
+    mit_Speicher = Speicherkapazität > 0
+
+    H = int(round(Fenster / duration))
+    C = int(round(Übernahme / duration))
+    starts = list(range(0, n, C))
+
+    Erzeugung_L = np.zeros((U, n))
+    ungedeckt_L = np.zeros(n)
+    Speicherfüllstand_L = np.zeros(n)
+    Lösungen = []
+
+    matrizen = {}
+    def matrix(länge):
+        if länge not in matrizen:
+            matrizen[länge] = Fenstermatrix(U, länge, duration, Speicher_laden if mit_Speicher else None)
+        return matrizen[länge]
+
+    def übernehmen(start, Erzeugung, ungedeckt, Speicherstand, status, Lösungszeit):
+        ende = min(start + C, n)
+        Erzeugung_L[:, start:ende] = Erzeugung[:, :ende - start]
+        ungedeckt_L[start:ende] = ungedeckt[:ende - start]
+        Speicherfüllstand_L[start:ende] = Speicherstand[:ende - start]
+        Lösungen.append({'Start': start, 'Ende': ende, 'Status': status, 'Lösungszeit': Lösungszeit})
+
+    if mit_Speicher:
+        # Fenster sind über den Speicherstand gekoppelt und werden nacheinander gelöst
+        Speicherstand_0 = 0
+        for start in starts:
+            ende = min(start + H, n)
+            ergebnis = löse_fenster(*matrix(ende - start), Restlast_L[start:ende], P_max[:, start:ende], Kosten[:, start:ende], duration, Speicherkapazität, Speicherstand_0)
+            übernehmen(start, *ergebnis)
+            Speicherstand_0 = Speicherfüllstand_L[min(start + C, n) - 1]
+    else:
+        aufgaben = [(matrix(min(start + H, n) - start)[0], Restlast_L[start:start + H], P_max[:, start:start + H], Kosten[:, start:start + H], duration) for start in starts]
+        if max_workers == 1:
+            for start, aufgabe in zip(starts, aufgaben):
+                übernehmen(start, *_löse_fenster_unabhängig(aufgabe))
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                for start, ergebnis in zip(starts, executor.map(_löse_fenster_unabhängig, aufgaben)):
+                    übernehmen(start, *ergebnis)
+
+    Wärmeleistung_L = [Erzeugung_L[i] for i in range(U)]
+    Stromerzeugung_L = np.sum(Erzeugung_L * Strom_erzeugt, axis=0)
+    Strombedarf_L = np.sum(Erzeugung_L * Strom_bezogen, axis=0)
+
+    dispatch_results = {
+        'techs': namen,
+        'Wärmeleistung_L': Wärmeleistung_L,
+        'Wärmemengen': [np.sum(W / 1000) * duration for W in Wärmeleistung_L],
+        'feste_Erzeugung_L': feste_Erzeugung,
+        'Stromerzeugung_L': Stromerzeugung_L,
+        'Strombedarf_L': Strombedarf_L,
+        'Speicherfüllstand_L': Speicherfüllstand_L,
+        'ungedeckte_Last_L': ungedeckt_L,
+        'Kosten_variabel': np.sum(Erzeugung_L * Kosten) * duration,
+        'Strompreis_L': Strompreis_L,
+        'Lösungen': Lösungen
+    }
+
+    return dispatch_results
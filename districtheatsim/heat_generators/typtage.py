@@ -0,0 +1,151 @@
+# Erstellt von Jonas Pfeiffer
+# Zeitreihenaggregation auf Typtage für die Optimierung des Erzeugermixes
+# Die Tage werden über k-Medoide nach Last, Vor- und Rücklauftemperatur, Außentemperatur und Globalstrahlung gruppiert,
+# der Tag mit der höchsten Last bleibt als eigener Typtag erhalten. Die Optimierung läuft auf den gewichteten Typtagen,
+# das Ergebnis wird anschließend mit dem vollständigen Jahr überprüft.
+
+import numpy as np
+
+from heat_generators.heat_generator_classes import Berechnung_Erzeugermix, optimize_mix
+from heat_generators.Solarthermie import Wetterdaten_STA
+
+def Tagesmerkmale(initial_data, TRY, start, end):
+    # Tageszeitreihen der Merkmale [Tage x Zeitschritte je Tag] sowie Zeitschritte je Tag
+    time_steps, Last_L, VLT_L, RLT_L = initial_data
+    duration = np.diff(time_steps[0:2]) / np.timedelta64(1, 'h')
+    Schritte_pro_Tag = int(round(24 / duration[0]))
+
+    n = len(Last_L)
+    if n % Schritte_pro_Tag != 0:
+        raise ValueError("Für die Bildung von Typtagen muss der Betrachtungszeitraum aus ganzen Tagen bestehen.")
+
+    Temperatur_L, _, _, Globalstrahlung_L = Wetterdaten_STA(TRY, time_steps, start, end)
+
+    merkmale = {"Last": Last_L, "VLT": VLT_L, "RLT": RLT_L, "Temperatur": Temperatur_L, "Globalstrahlung": Globalstrahlung_L}
+    return {name: np.asarray(werte, dtype=float).reshape(-1, Schritte_pro_Tag) for name, werte in merkmale.items()}, Schritte_pro_Tag
+
+def k_medoide(distanzen, k, rng, wiederholungen=10, max_iterationen=100):
+    # Medoide und Zuordnung mit minimaler Summe der Abstände aus mehreren Durchläufen (Initialisierung nach k-medoids++)
+    n = len(distanzen)
+    bestes = None
+    for _ in range(wiederholungen):
+        medoide = [rng.integers(n)]
+        for _ in range(1, k):
+            d = distanzen[:, medoide].min(axis=1) ** 2
+            medoide.append(rng.choice(n, p=d / d.sum()) if d.sum() > 0 else rng.integers(n))
+        medoide = np.array(medoide)
+
+        for _ in range(max_iterationen):
+            zuordnung = np.argmin(distanzen[:, medoide], axis=1)
+            neue_medoide = medoide.copy()
+            for j in range(k):
+                mitglieder = np.flatnonzero(zuordnung == j)
+                if len(mitglieder) > 0:
+                    neue_medoide[j] = mitglieder[np.argmin(distanzen[np.ix_(mitglieder, mitglieder)].sum(axis=1))]
+            if np.array_equal(neue_medoide, medoide):
+                break
+            medoide = neue_medoide
+
+        zuordnung = np.argmin(distanzen[:, medoide], axis=1)
+        kosten = distanzen[np.arange(n), medoide[zuordnung]].sum()
+        if bestes is None or kosten < bestes[0]:
+            bestes = (kosten, medoide, zuordnung)
+
+    return bestes[1], bestes[2]
+
+def Typtage(initial_data, TRY, start, end, anzahl_typtage=12, seed=None):
+    """
+    Auswahl von Typtagen über k-Medoide. Die Merkmale werden je Größe auf den Bereich 0 bis 1 normiert.
+    Der Tag mit der höchsten Last ist immer ein eigener Typtag mit Gewicht 1.
+
+    Rückgabe: dict mit den Indizes der Typtage (aufsteigend), Gewichten (Anzahl vertretener Tage), Zuordnung jedes Tages
+    zu einem Typtag, Zeitschritten je Tag und dem Aggregationsfehler je Merkmal (mittlere quadratische Abweichung und
+    Abweichung der Jahressumme in %)
+    """
+    merkmale, Schritte_pro_Tag = Tagesmerkmale(initial_data, TRY, start, end)
+    Anzahl_Tage = len(merkmale["Last"])
+    if not 1 < anzahl_typtage <= Anzahl_Tage:
+        raise ValueError(f"Die Anzahl der Typtage muss zwischen 2 und {Anzahl_Tage} liegen.")
+
+    normiert = []
+    for werte in merkmale.values():
+        spanne = werte.max() - werte.min()
+        normiert.append((werte - werte.min()) / spanne if spanne > 0 else np.zeros_like(werte))
+    X = np.hstack(normiert)
+    distanzen = np.sqrt(np.maximum(np.sum(X**2, axis=1)[:, None] + np.sum(X**2, axis=1)[None, :] - 2 * X @ X.T, 0))
+
+    # Spitzenlasttag als eigener Typtag, die übrigen Tage werden gruppiert
+    Spitzentag = int(np.argmax(merkmale["Last"].max(axis=1)))
+    übrige = np.delete(np.arange(Anzahl_Tage), Spitzentag)
+    medoide, zuordnung_übrige = k_medoide(distanzen[np.ix_(übrige, übrige)], anzahl_typtage - 1, np.random.default_rng(seed))
+
+    Tage = np.sort(np.append(übrige[medoide], Spitzentag))
+    Zuordnung = np.empty(Anzahl_Tage, dtype=int)
+    Zuordnung[übrige] = np.searchsorted(Tage, übrige[medoide][zuordnung_übrige])
+    Zuordnung[Spitzentag] = np.searchsorted(Tage, Spitzentag)
+    Gewichte = np.bincount(Zuordnung, minlength=len(Tage))
+
+    Fehler = {}
+    for name, werte in merkmale.items():
+        rekonstruiert = werte[Tage][Zuordnung]
+        summe = np.sum(werte)
+        Fehler[name] = {"RMSE": np.sqrt(np.mean((rekonstruiert - werte) ** 2)),
+                        "Jahressumme_%": (np.sum(rekonstruiert) - summe) / summe * 100 if summe != 0 else 0}
+
+    return {"Tage": Tage, "Gewichte": Gewichte, "Zuordnung": Zuordnung, "Schritte_pro_Tag": Schritte_pro_Tag, "Fehler": Fehler}
+
+def reduzierte_Daten(initial_data, TRY, start, typtage):
+    # Zeitreihen und Wetterdaten der Typtage für Berechnung_Erzeugermix, Rückgabe: initial_data, TRY, start, end, Gewichte je Zeitschritt
+    time_steps, Last_L, VLT_L, RLT_L = initial_data
+    Schritte_pro_Tag, Tage = typtage["Schritte_pro_Tag"], typtage["Tage"]
+    Schritte_pro_Stunde = Schritte_pro_Tag // 24
+    if start % Schritte_pro_Stunde != 0:
+        raise ValueError("Der Betrachtungszeitraum muss zu einer vollen Stunde beginnen.")
+
+    index = (Tage[:, None] * Schritte_pro_Tag + np.arange(Schritte_pro_Tag)).ravel()
+    # Wetterdaten liegen stündlich ab Jahresbeginn vor
+    stunden = (start // Schritte_pro_Stunde + Tage[:, None] * 24 + np.arange(24)).ravel()
+
+    initial_data_typtage = (np.asarray(time_steps)[index], np.asarray(Last_L)[index], np.asarray(VLT_L)[index], np.asarray(RLT_L)[index])
+    TRY_typtage = tuple(np.asarray(werte)[stunden] for werte in TRY)
+    Gewichte_L = np.repeat(typtage["Gewichte"], Schritte_pro_Tag).astype(float)
+
+    return initial_data_typtage, TRY_typtage, 0, len(index), Gewichte_L
+
+def optimize_mix_typtage(tech_order, initial_data, start, end, TRY, COP_data, Gaspreis, Strompreis, Holzpreis, BEW, kapitalzins, preissteigerungsrate, betrachtungszeitraum, stundensatz,
+                         anzahl_typtage=12, seed=None, parallel=False, max_workers=None):
+    """
+    Optimierung des Erzeugermixes auf Typtagen mit anschließender Berechnung des vollständigen Zeitraums.
+    Speicher (Solarthermie, BHKW) werden auf den aneinandergereihten Typtagen nur näherungsweise abgebildet.
+
+    Rückgabe: tech_order mit den optimierten Werten (None, falls die Optimierung nicht erfolgreich war) und dict mit
+    WGK_Gesamt auf Typtagen und im vollständigen Zeitraum, deren Abweichung in %, dem Aggregationsfehler und den
+    Ergebnissen des vollständigen Zeitraums
+    """
+    typtage = Typtage(initial_data, TRY, start, end, anzahl_typtage, seed)
+    initial_data_typtage, TRY_typtage, start_typtage, end_typtage, Gewichte_L = reduzierte_Daten(initial_data, TRY, start, typtage)
+
+    tech_order = optimize_mix(tech_order, initial_data_typtage, start_typtage, end_typtage, TRY_typtage, COP_data, Gaspreis, Strompreis, Holzpreis, BEW, kapitalzins,
+                              preissteigerungsrate, betrachtungszeitraum, stundensatz, parallel=parallel, max_workers=max_workers, gewichte=Gewichte_L)
+    if tech_order is None:
+        return None, {"Fehler": typtage["Fehler"]}
+
+    results_typtage = Berechnung_Erzeugermix(list(tech_order), initial_data_typtage, start_typtage, end_typtage, TRY_typtage, COP_data, Gaspreis, Strompreis, Holzpreis, BEW,
+                                             kapitalzins=kapitalzins, preissteigerungsrate=preissteigerungsrate, betrachtungszeitraum=betrachtungszeitraum, stundensatz=stundensatz,
+                                             gewichte=Gewichte_L)
+    general_results = Berechnung_Erzeugermix(tech_order, initial_data, start, end, TRY, COP_data, Gaspreis, Strompreis, Holzpreis, BEW, kapitalzins=kapitalzins,
+                                             preissteigerungsrate=preissteigerungsrate, betrachtungszeitraum=betrachtungszeitraum, stundensatz=stundensatz)
+
+    Abweichung = (results_typtage['WGK_Gesamt'] - general_results['WGK_Gesamt']) / general_results['WGK_Gesamt'] * 100
+    print(f"Wärmegestehungskosten vollständiger Zeitraum: {general_results['WGK_Gesamt']:.2f} €/MWh (Typtage: {results_typtage['WGK_Gesamt']:.2f} €/MWh, {Abweichung:+.2f} %)")
+
+    validierung = {
+        'WGK_Gesamt_Typtage': results_typtage['WGK_Gesamt'],
+        'WGK_Gesamt': general_results['WGK_Gesamt'],
+        'Abweichung_WGK_%': Abweichung,
+        'Fehler': typtage['Fehler'],
+        'Typtage': typtage,
+        'general_results': general_results
+    }
+
+    return tech_order, validierung
@@ -4,6 +4,11 @@ import matplotlib.pyplot as plt
 
 import os
 import sys
+from functools import lru_cache
+
+from utilities.time_axis import get_time_axis
+from utilities.test_reference_year import lade_TRY
+from utilities.cache import cache_dateiname, atomar_speichern
 
 def get_resource_path(relative_path):
     """ Get the absolute path to the resource, works for dev and for PyInstaller """
@@ -17,37 +22,14 @@ def get_resource_path(relative_path):
     return os.path.join(base_path, relative_path)
 
 def import_TRY(filename):
-    # Import TRY
-    # Define column widths
-    col_widths = [8, 8, 3, 3, 3, 6, 5, 4, 5, 2, 5, 4, 5, 5, 4, 5, 3]
-    # Define column names
-    col_names = ["RW", "HW", "MM", "DD", "HH", "t", "p", "WR", "WG", "N", "x", "RF", "B", "D", "A", "E", "IL"]
-
-    # Read the file
-    data = pd.read_fwf(filename, widths=col_widths, names=col_names, skiprows=34)
-
-    # Store the columns as numpy arrays
-    temperature = data['t'].values
-
-    return temperature
+    # hourly air temperature of the TRY
+    return lade_TRY(filename)["t"]
 
 def generate_year_months_days_weekdays(year):
-    # First day of the year
-    start_date = np.datetime64(f'{year}-01-01')
-    # Number of days in the year (consider leap year)
-    num_days = 366 if np.datetime64(f'{year}-12-31') - np.datetime64(f'{year}-01-01') == np.timedelta64(365, 'D') else 365
-
-    # Create an array with all days of the year
-    days_of_year = np.arange(start_date, start_date + np.timedelta64(num_days, 'D'), dtype='datetime64[D]')
-    # Extract month (values between 1 and 12)
-    months = days_of_year.astype('datetime64[M]').astype(int) % 12 + 1
-    # Extract day of the month
-    days = days_of_year - days_of_year.astype('datetime64[M]') + 1
+    time_axis = get_time_axis(year)
 
-    # Extract weekday (Sunday=1, Saturday=7)
-    weekdays = ((days_of_year.astype('datetime64[D]').astype(int) + 4) % 7) + 1
-
-    return days_of_year, months, days, weekdays
+    # days of the year, month (1-12), day of the month and weekday (Sunday=1, Saturday=7)
+    return time_axis.days, time_axis.month_daily, time_axis.day_of_month_daily, time_axis.weekday_daily
 
 def calculate_daily_averages(temperature):
     # Assumption: The length of each array corresponds to the number of hours in a year
@@ -63,60 +45,111 @@ def calculate_daily_averages(temperature):
     return daily_avg_temperature
 
 def calculate_hourly_intervals(year):
-    # First day of the year
-    start_date = np.datetime64(f'{year}-01-01')
-    # Number of days in the year (consider leap year)
-    num_days = 366 if np.datetime64(f'{year}-12-31') - np.datetime64(f'{year}-01-01') == np.timedelta64(365, 'D') else 365
-
-    # Number of quarter-hour intervals in the year
-    num_hours = num_days * 24
-
-    # Create an array with all quarter-hourly intervals for the year
-    hourly_intervals = np.arange(start_date, start_date + np.timedelta64(num_hours, 'h'), dtype='datetime64[h]')
-
-    return hourly_intervals
+    # Create an array with all hourly intervals for the year
+    return get_time_axis(year).time_steps.astype('datetime64[h]')
+
+# Binary store of the BDEW coefficients, built once from the CSV files
+# daily_coefficients: [profile, (A, B, C, D, mH, bH, mW, bW)], weekday_factors: [profile, weekday 1-7]
+# hour_factors: [profile type, weekday 1-7, temperature bin, hour], NaN if not defined
+def factors_directory():
+    return get_resource_path(os.path.join('heat_requirement', 'BDEW factors'))
+
+def to_float(data):
+    # Dezimalkomma wird akzeptiert, nicht lesbare Werte werden NaN (Fehler erst bei Verwendung des Profils)
+    return data.apply(lambda column: pd.to_numeric(column.astype(str).str.replace(',', '.'), errors='coerce')).values.astype(float)
+
+def build_coefficient_store():
+    daily_data = pd.read_csv(os.path.join(factors_directory(), 'daily_coefficients.csv'), delimiter=';')
+    hourly_data = pd.read_csv(os.path.join(factors_directory(), 'hourly_coefficients.csv'), delimiter=';')
+
+    hourly_types = np.array(sorted(hourly_data['Typ'].unique()), dtype=str)
+    temperature_bins = np.sort(hourly_data['Temperatur'].unique()).astype(float)
+    hour_factors = np.full((len(hourly_types), 7, len(temperature_bins), 24), np.nan)
+    hour_factors[np.searchsorted(hourly_types, hourly_data['Typ'].values), hourly_data['Wochentag'].values - 1,
+                 np.searchsorted(temperature_bins, hourly_data['Temperatur'].values), hourly_data['Stunde'].values] = to_float(hourly_data[['Stundenfaktor']])[:, 0]
+
+    return {
+        'daily_profiles': daily_data['Standardlastprofil'].to_numpy(dtype=str),
+        'daily_coefficients': to_float(daily_data[['A', 'B', 'C', 'D', 'mH', 'bH', 'mW', 'bW']]),
+        'weekday_factors': to_float(daily_data[[str(day) for day in range(1, 8)]]),
+        'hourly_types': hourly_types,
+        'temperature_bins': temperature_bins,
+        'hour_factors': hour_factors
+    }
+
+@lru_cache(maxsize=None)
+def get_coefficient_store():
+    # Loaded once per process; the .npz in the user cache directory (see utilities/cache.py) is rebuilt if it is older than the CSV files
+    store_file = cache_dateiname(factors_directory(), "_coefficients_store.npz")
+    sources = [os.path.join(factors_directory(), f) for f in ('daily_coefficients.csv', 'hourly_coefficients.csv')]
+
+    if os.path.exists(store_file) and os.path.getmtime(store_file) >= max(os.path.getmtime(f) for f in sources):
+        with np.load(store_file) as data:
+            store = {key: data[key] for key in data.files}
+    else:
+        store = build_coefficient_store()
+        try:
+            atomar_speichern(store_file, lambda file: np.savez(file, **store))
+        except OSError:
+            # e.g. no write access to the cache directory, the store is then kept in memory only
+            pass
+
+    for array in store.values():
+        array.setflags(write=False)
+    return store
+
+def profile_index(profiletype, subtype):
+    profiles = get_coefficient_store()['daily_profiles']
+    index = np.flatnonzero(profiles == profiletype + subtype)
+    if len(index) == 0:
+        raise ValueError("Profil nicht gefunden")
+    return index[0]
 
 # function for getting the coefficients
-def get_coefficients(profiletype, subtype, daily_data):
-    profile = profiletype + subtype
-    row = daily_data[daily_data['Standardlastprofil'] == profile].iloc[0]
-    return float(row['A']), float(row['B']), float(row['C']), float(row['D']), float(row['mH']), float(row['bH']), float(row['mW']), float(row['bW'])
+def get_coefficients(profiletype, subtype, daily_data=None):
+    coefficients = get_coefficient_store()['daily_coefficients'][profile_index(profiletype, subtype)]
+    if np.isnan(coefficients).any():
+        raise ValueError(f"Ungültige Koeffizienten für Profil {profiletype + subtype}")
+    return tuple(float(value) for value in coefficients)
 
 # function for getting the weekday factor
-def get_weekday_factor(daily_weekdays, profiletype, subtype, daily_data):
-    profil = profiletype + subtype
-    profil_row = daily_data[daily_data['Standardlastprofil'] == profil]
-
-    if profil_row.empty:
+def get_weekday_factor(daily_weekdays, profiletype, subtype, daily_data=None):
+    return get_coefficient_store()['weekday_factors'][profile_index(profiletype, subtype), np.asarray(daily_weekdays) - 1]
+
+def get_hour_factors(profiletype, hourly_weekdays, temperatures, daily_hours):
+    # Stundenfaktoren für Wochentag, Temperatur und Stunde, NaN für Temperaturen ohne Stützstelle
+    store = get_coefficient_store()
+    type_index = np.flatnonzero(store['hourly_types'] == profiletype)
+    if len(type_index) == 0:
         raise ValueError("Profil nicht gefunden")
 
-    weekday_factors = np.array([profil_row.iloc[0][str(day)] for day in daily_weekdays]).astype(float)
+    temperature_bins = store['temperature_bins']
+    bin_index = np.minimum(np.searchsorted(temperature_bins, temperatures), len(temperature_bins) - 1)
+    valid = temperature_bins[bin_index] == temperatures
 
-    return weekday_factors
+    hour_factors = store['hour_factors'][type_index[0], hourly_weekdays - 1, bin_index, daily_hours]
+    return np.where(valid, hour_factors, np.nan)
 
-def calculation_load_profile(TRY, JWB_kWh, profiletype, subtype, holidays, year):
+@lru_cache(maxsize=64)
+def _unit_profile(TRY, TRY_mtime, profiletype, subtype, year):
+    # TRY_mtime is only part of the cache key, a changed weather file is read again
     days_of_year, months, days, daily_weekdays = generate_year_months_days_weekdays(year)
 
     # import weather data
-    hourly_temperature = import_TRY(TRY)
+    hourly_temperature = np.asarray(import_TRY(TRY), dtype=float)
 
     # process temperature data
     daily_avg_temperature = np.round(calculate_daily_averages(hourly_temperature), 1)
-    daily_reference_temperature = np.round((daily_avg_temperature+2.5)*2, -1)/2-2.5
-
-    daily_data = pd.read_csv(get_resource_path('heat_requirement\BDEW factors\daily_coefficients.csv'), delimiter=';')
 
     # calculate daily factors
-    h_A, h_B, h_C, h_D, mH, bH, mW, bW = get_coefficients(profiletype, subtype, daily_data)
+    h_A, h_B, h_C, h_D, mH, bH, mW, bW = get_coefficients(profiletype, subtype)
     lin = mH + bH + mW + bW
     h_T = h_A/(1+(h_B/(daily_avg_temperature-40))**h_C)+h_D+lin
 
     # calculate weekday factors
-    F_D = get_weekday_factor(daily_weekdays, profiletype, subtype, daily_data)
+    F_D = get_weekday_factor(daily_weekdays, profiletype, subtype)
     h_T_F_D = h_T * F_D
-    sum_h_T_F_D = np.sum(h_T_F_D)
-    KW_kWh = JWB_kWh/sum_h_T_F_D
-    daily_heat_demand = h_T_F_D * KW_kWh
+    daily_heat_demand = h_T_F_D / np.sum(h_T_F_D)
 
     # calculate hourly data
     hourly_reference_temperature = np.round((hourly_temperature+2.5)*2, -1)/2-2.5
@@ -126,68 +159,37 @@ def calculation_load_profile(TRY, JWB_kWh, profiletype, subtype, holidays, year)
     upper_limit = np.where(hourly_reference_temperature_2>hourly_reference_temperature, hourly_reference_temperature_2, hourly_reference_temperature)
     lower_limit = np.where(hourly_reference_temperature_2>hourly_reference_temperature, hourly_reference_temperature, hourly_reference_temperature_2)
 
-    daily_hours = np.tile(np.arange(24), len(days_of_year))
-    hourly_weekdays = np.repeat(daily_weekdays, 24)
+    time_axis = get_time_axis(year)
     hourly_daily_heat_demand = np.repeat(daily_heat_demand, 24)
-    
-    hourly_data = pd.read_csv(get_resource_path('heat_requirement\BDEW factors\hourly_coefficients.csv'), delimiter=';')
-    filtered_hourly_data = hourly_data[hourly_data["Typ"]==profiletype]
-
-    # create dataframe
-    hourly_conditions = pd.DataFrame({
-        'Wochentag': hourly_weekdays,
-        'TemperaturLower': lower_limit,
-        'TemperaturUpper': upper_limit,
-        'Stunde': daily_hours
-    })
-
-    # merging data
-    merged_data_T1 = pd.merge(
-        hourly_conditions,
-        filtered_hourly_data,
-        how='left',
-        left_on=['Wochentag', 'TemperaturLower', 'Stunde'],
-        right_on=['Wochentag', 'Temperatur', 'Stunde']
-    )
-
-    merged_data_T2 = pd.merge(
-        hourly_conditions,
-        filtered_hourly_data,
-        how='left',
-        left_on=['Wochentag', 'TemperaturUpper', 'Stunde'],
-        right_on=['Wochentag', 'Temperatur', 'Stunde']
-    )
-
-    hour_factor_T1 = merged_data_T1["Stundenfaktor"].values.astype(float)
-    hour_factor_T2 = merged_data_T2["Stundenfaktor"].values.astype(float)
+
+    hour_factor_T1 = get_hour_factors(profiletype, time_axis.weekday, lower_limit, time_axis.hour)
+    hour_factor_T2 = get_hour_factors(profiletype, time_axis.weekday, upper_limit, time_axis.hour)
 
     # final calculation
     hour_factor_interpolation = hour_factor_T2+(hour_factor_T1-hour_factor_T2)*((hourly_temperature-upper_limit)/(5))
     hourly_heat_demand = np.nan_to_num((hourly_daily_heat_demand*hour_factor_interpolation)/100).astype(float)
-    hourly_heat_demand_normed = (hourly_heat_demand / np.sum(hourly_heat_demand)) * JWB_kWh
+    hourly_heat_demand_normed = hourly_heat_demand / np.sum(hourly_heat_demand)
+
+    hourly_heat_demand_normed.setflags(write=False)
+    hourly_temperature.setflags(write=False)
+    return hourly_heat_demand_normed, hourly_temperature
+
+def calculation_load_profile(TRY, JWB_kWh, profiletype, subtype, holidays, year):
+    # Normiertes Profil (Summe 1) je Profiltyp, Wetterdaten und Jahr wird nur einmal berechnet
+    # JWB_kWh kann ein Array sein (z.B. je Gebäude), das Profil hat dann die Form [Gebäude, Stunden]
+    TRY = os.path.abspath(TRY)
+    hourly_heat_demand_normed, hourly_temperature = _unit_profile(TRY, os.path.getmtime(TRY), profiletype, subtype, year)
     hourly_intervals = calculate_hourly_intervals(year)
 
-    return hourly_intervals, hourly_heat_demand_normed.astype(float), hourly_temperature
+    return hourly_intervals, hourly_heat_demand_normed * np.asarray(JWB_kWh, dtype=float)[..., np.newaxis], hourly_temperature.copy()
 
-def calculate(JWB_kWh=10000, profiletype="HMF", subtyp="03", year=2021):
+def calculate(JWB_kWh=10000, profiletype="HMF", subtyp="03", year=2021, TRY=None):
     # holidays
-    Neujahr = "2021-01-01"
-    Karfreitag = "2021-04-02"
-    Ostermontag = "2021-04-05"
-    Maifeiertag = "2021-05-01"
-    Pfingstmontag = "2021-05-24"
-    Christi_Himmelfahrt = "2021-05-13"
-    Fronleichnam = "2021-06-03"
-    Tag_der_deutschen_Einheit = "2021-10-03"
-    Allerheiligen = "2021-11-01"
-    Weihnachtsfeiertag1 = "2021-12-25"
-    Weihnachtsfeiertag2 = "2021-12-26"
-
-    Feiertage = np.array([Neujahr, Karfreitag, Ostermontag, Maifeiertag, Pfingstmontag, 
-                Christi_Himmelfahrt, Fronleichnam, Tag_der_deutschen_Einheit, 
-                Allerheiligen, Weihnachtsfeiertag1, Weihnachtsfeiertag2]).astype('datetime64[D]')
-
-    TRY = get_resource_path('heat_requirement\TRY_511676144222\TRY2015_511676144222_Jahr.dat')
+    Feiertage = get_time_axis(year).holidays
+
+    # TRY: path of the weather file, by default the TRY2015 year
+    if TRY is None:
+        TRY = get_resource_path('heat_requirement\TRY_511676144222\TRY2015_511676144222_Jahr.dat')
 
     hourly_intervals, hourly_heat_demand, hourly_temperature = calculation_load_profile(TRY, JWB_kWh, profiletype, subtyp, Feiertage, year)
 
@@ -4,6 +4,11 @@ import matplotlib.pyplot as plt
 
 import os
 import sys
+from functools import lru_cache
+
+from utilities.time_axis import get_time_axis
+from utilities.test_reference_year import lade_TRY
+from utilities.cache import cache_dateiname, atomar_speichern
 
 # defines the map path
 def get_resource_path(relative_path):
@@ -37,42 +42,19 @@ def get_resource_path(relative_path):
 
 
 def import_TRY(filename):
-    # Import TRY
-    # Define column widths
-    col_widths = [8, 8, 3, 3, 3, 6, 5, 4, 5, 2, 5, 4, 5, 5, 4, 5, 3]
-    # Define column names
-    col_names = ["RW", "HW", "MM", "DD", "HH", "t", "p", "WR", "WG", "N", "x", "RF", "B", "D", "A", "E", "IL"]
-
-    # Read the file
-    data = pd.read_fwf(filename, widths=col_widths, names=col_names, skiprows=34)
-
-    # Store the columns as numpy arrays
-    temperature = data['t'].values
-    cloud_cover = data['N'].values
-
-    return temperature, cloud_cover
+    # hourly air temperature and cloud cover of the TRY
+    weather_data = lade_TRY(filename)
+    return weather_data["t"], weather_data["N"]
 
 def import_csv(filename):
     data = pd.read_csv(filename, sep=';')
     return data
 
 def generate_year_months_days_weekdays(year):
-    # First day of the year
-    start_date = np.datetime64(f'{year}-01-01')
-    # Number of days in the year (consider leap year)
-    num_days = 366 if np.datetime64(f'{year}-12-31') - np.datetime64(f'{year}-01-01') == np.timedelta64(365, 'D') else 365
+    time_axis = get_time_axis(year)
 
-    # Create an array with all days of the year
-    days_of_year = np.arange(start_date, start_date + np.timedelta64(num_days, 'D'), dtype='datetime64[D]')
-    # Extract month (values between 1 and 12)
-    months = days_of_year.astype('datetime64[M]').astype(int) % 12 + 1
-    # Extract day of the month
-    days = days_of_year - days_of_year.astype('datetime64[M]') + 1
-
-    # Extract weekday (Sunday=1, Saturday=7)
-    weekdays = ((days_of_year.astype('datetime64[D]').astype(int) + 4) % 7) + 1
-
-    return days_of_year, months, days, weekdays
+    # days of the year, month (1-12), day of the month and weekday (Sunday=1, Saturday=7)
+    return time_axis.days, time_axis.month_daily, time_axis.day_of_month_daily, time_axis.weekday_daily
 
 def calculate_daily_averages(temperature, cloud_cover):
     # Assumption: The length of each array corresponds to the number of hours in a year
@@ -90,20 +72,8 @@ def calculate_daily_averages(temperature, cloud_cover):
     return daily_avg_temperature, daily_avg_cloud_cover
 
 def calculate_quarter_hourly_intervals(year):
-    # First day of the year
-    start_date = np.datetime64(f'{year}-01-01')
-    # Number of days in the year (consider leap year)
-    num_days = 366 if np.datetime64(f'{year}-12-31') - np.datetime64(f'{year}-01-01') == np.timedelta64(365, 'D') else 365
-
-    # Number of quarter-hour intervals in the year
-    num_quarter_hours = num_days * 24 * 4
-
     # Create an array with all quarter-hourly intervals for the year
-    quarter_hourly_intervals = np.arange(start_date, 
-                                        start_date + np.timedelta64(num_quarter_hours, '15m'), 
-                                        dtype='datetime64[15m]')
-
-    return quarter_hourly_intervals
+    return get_time_axis(year, 15).time_steps.astype('datetime64[15m]')
 
 def quarter_hourly_data(data):
     # Number of quarter-hours in the year
@@ -114,116 +84,141 @@ def quarter_hourly_data(data):
 
     return quarter_hourly_intervals
 
-def standardized_quarter_hourly_profile(year, building_type, days_of_year, type_days):
-    quarter_hourly_intervals = calculate_quarter_hourly_intervals(year)
+# Binary store of the VDI 4655 type-day profiles and factors, built once from the CSV files
+# profiles: [building type, type day, (electricity, heating, hot water), quarter-hour of the day]
+# factors: [building type, climate zone 1-15, type day, (Fheiz,TT, Fel,TT, FTWW,TT)], NaN if not defined
+BUILDING_TYPES = ("EFH", "MFH")
+SEASONS, DAY_TYPES, COVERAGES = ("W", "Ü", "S"), ("W", "S"), ("H", "B", "X")
+TYPE_DAYS = tuple(season + day_type + coverage for season in SEASONS for day_type in DAY_TYPES for coverage in COVERAGES)
+
+def default_factors_path():
+    return get_resource_path(os.path.join('heat_requirement', 'VDI 4655 data', 'Faktoren.csv'))
+
+def profiles_directory():
+    return get_resource_path(os.path.join('heat_requirement', 'VDI 4655 load profiles'))
+
+def build_profile_store(factors):
+    profiles = np.full((len(BUILDING_TYPES), len(TYPE_DAYS), 3, 96), np.nan)
+    for b, building_type in enumerate(BUILDING_TYPES):
+        for t, type_day in enumerate(TYPE_DAYS):
+            filename = os.path.join(profiles_directory(), f'{building_type}{type_day}.csv')
+            if not os.path.exists(filename):
+                continue
+            data = import_csv(filename).dropna(subset=['Zeit'])
+            hours, minutes = data['Zeit'].str.split(':', expand=True).astype(int).values.T
+            quarter_hour = hours * 4 + minutes // 15
+            profiles[b, t, :, quarter_hour] = data[['Strombedarf normiert', 'Heizwärme normiert', 'Warmwasser normiert']].values
+
+    factors_array = np.full((len(BUILDING_TYPES), 15, len(TYPE_DAYS), 3), np.nan)
+    factor_data = import_csv(factors).dropna(subset=['Haustyp', 'Zone', 'Typtag'])
+    factor_data = factor_data[factor_data['Haustyp'].isin(BUILDING_TYPES) & factor_data['Typtag'].isin(TYPE_DAYS)]
+    b = factor_data['Haustyp'].map(BUILDING_TYPES.index).values
+    z = factor_data['Zone'].values.astype(int) - 1
+    t = factor_data['Typtag'].map(TYPE_DAYS.index).values
+    factors_array[b, z, t] = factor_data[['Fheiz,TT', 'Fel,TT', 'FTWW,TT']].values
+
+    return {"profiles": profiles, "factors": factors_array}
+
+@lru_cache(maxsize=None)
+def get_profile_store(factors=None):
+    # Loaded once per process; the .npz in the user cache directory (see utilities/cache.py) is rebuilt if it is older than the CSV files
+    factors = factors or default_factors_path()
+    store_file = cache_dateiname(factors, "_store.npz")
+    sources = [factors] + [os.path.join(profiles_directory(), f) for f in os.listdir(profiles_directory()) if f.endswith('.csv')]
+
+    if os.path.exists(store_file) and os.path.getmtime(store_file) >= max(os.path.getmtime(f) for f in sources):
+        with np.load(store_file) as data:
+            store = {key: data[key] for key in data.files}
+    else:
+        store = build_profile_store(factors)
+        try:
+            atomar_speichern(store_file, lambda file: np.savez(file, **store))
+        except OSError:
+            # e.g. no write access to the cache directory, the store is then kept in memory only
+            pass
+
+    for array in store.values():
+        array.setflags(write=False)
+    return store
+
+def type_day_indices(daily_avg_temperature, daily_avg_degree_of_coverage, weekdays, is_holiday):
+    # index into TYPE_DAYS for every day of the year
+    season = np.where(daily_avg_temperature < 5, 0, np.where((daily_avg_temperature >= 5) & (daily_avg_temperature <= 15), 1, 2))
+    day_type = np.where((weekdays == 1) | is_holiday, 1, 0)
+    coverage = np.where(season == 2, 2, np.where((daily_avg_degree_of_coverage >= 0) & (daily_avg_degree_of_coverage < 4), 0, 1))
+    return (season * len(DAY_TYPES) + day_type) * len(COVERAGES) + coverage
+
+def standardized_quarter_hourly_profile(year, building_type, days_of_year, type_days, factors=None):
+    # type_days: type-day index (see type_day_indices) for every day of the year
+    profiles = get_profile_store(factors)["profiles"][BUILDING_TYPES.index(building_type), type_days]
+
+    # [days, 96] -> quarter-hourly series of the year
+    electricity_demand, heating_demand, hot_water_demand = (profiles[:, i].ravel() for i in range(3))
+
+    return calculate_quarter_hourly_intervals(year), electricity_demand, heating_demand, hot_water_demand
+
+@lru_cache(maxsize=64)
+def _unit_profiles(TRY, TRY_mtime, factors, building_type, number_people_household, holidays, climate_zone, year):
+    # TRY_mtime is only part of the cache key, a changed weather file is read again
+    time_axis = get_time_axis(year)
 
-    # Vectorized conversion to daily dates and matching with days_of_year
-    daily_dates = np.array([np.datetime64(dt, 'D') for dt in quarter_hourly_intervals])
-    indices = np.searchsorted(days_of_year, daily_dates)
-    quarterly_type_days = type_days[indices % len(type_days)]  # Modulo for safety
-    
-    all_type_days = np.unique(quarterly_type_days)
+    # import weather data
+    temperature, degree_of_coverage = import_TRY(TRY)
+    daily_avg_temperature, daily_avg_degree_of_coverage = calculate_daily_averages(temperature, degree_of_coverage)
 
-    # Read all CSV files once and filter as needed
-    all_data = {f"{building_type}{type_day}": import_csv(get_resource_path(f'heat_requirement\VDI 4655 load profiles\{building_type}{type_day}.csv')) 
-                for type_day in all_type_days}
+    type_days = type_day_indices(daily_avg_temperature, daily_avg_degree_of_coverage, time_axis.weekday_daily,
+                                 np.isin(time_axis.days, np.array(holidays, dtype='datetime64[D]')))
 
-    profile_days = np.char.add(building_type, quarterly_type_days)
+    # factors of each day: Fheiz,TT, Fel,TT, FTWW,TT
+    f_tt = get_profile_store(factors)["factors"][BUILDING_TYPES.index(building_type), int(climate_zone) - 1, type_days]
+    if np.isnan(f_tt).any():
+        raise ValueError(f"VDI 4655 factors missing for {building_type} in climate zone {climate_zone}.")
 
-    # Convert to a string and extract the time
-    times_str = np.datetime_as_string(quarter_hourly_intervals, unit='m')
-    times = np.array([t.split('T')[1] for t in times_str])
+    # daily energy per kWh of yearly energy usage, the yearly energy usage itself cancels out in the normalization below
+    daily_electricity = (1/365) + (number_people_household*f_tt[:, 1])
+    daily_heating = f_tt[:, 0]
+    daily_hot_water = (1/365) + (number_people_household*f_tt[:, 2])
 
-    # Create a DataFrame from repeated_times and profile_days
-    times_profile_df = pd.DataFrame({
-        'Datum': np.repeat(days_of_year, 24*4),  # Create a date for each hour of the day
-        'Zeit': times,
-        'ProfileDay': profile_days})
-    
-    # Combine all DataFrames in dataframes_type_days into one DataFrame
-    combined_df = pd.concat([df.assign(ProfileDay=profile_day) for profile_day, df in all_data.items()])
+    quarter_hourly_intervals, electricity, heating, hot_water = standardized_quarter_hourly_profile(year, building_type, None, type_days, factors)
 
-    # Perform a left merge to maintain the structure of times_profile_df
-    merged_df = pd.merge(times_profile_df, combined_df, on=['Zeit', 'ProfileDay'], how='left')
+    unit_profiles = []
+    for profile, daily in ((electricity, daily_electricity), (heating, daily_heating), (hot_water, daily_hot_water)):
+        normed = profile * quarter_hourly_data(daily)
+        normed = normed / np.sum(normed)
+        normed.setflags(write=False)
+        unit_profiles.append(normed)
 
-    # Extract the required columns
-    electricity_demand = merged_df['Strombedarf normiert'].values
-    heating_demand = merged_df['Heizwärme normiert'].values
-    hot_water_demand = merged_df['Warmwasser normiert'].values
+    temperature = np.asarray(temperature, dtype=float)
+    temperature.setflags(write=False)
+    return quarter_hourly_intervals, *unit_profiles, temperature
 
-    return quarter_hourly_intervals, electricity_demand, heating_demand, hot_water_demand
+def unit_profiles(TRY, factors, building_type, number_people_household, holidays, climate_zone="9", year=2019):
+    # quarter-hourly profiles (sum 1) of electricity, heating and hot water, cached per building type, household size, weather and year
+    holidays = tuple(np.asarray(holidays).astype('datetime64[D]').astype(str))
+    TRY = os.path.abspath(TRY)
+    return _unit_profiles(TRY, os.path.getmtime(TRY), factors, building_type, float(number_people_household), holidays, str(climate_zone), year)
 
 # YEU - yearly energy usage
 def calculation_load_profile(TRY, factors, building_type, number_people_household, YEU_electricity_kWh, 
                        YEU_heating_kWh, YEU_hot_water_kWh, holidays, climate_zone="9", year=2019):
+    # YEU can also be arrays (e.g. one value per building), the profiles then have the shape [buildings, quarter-hours]
+    quarter_hourly_intervals, electricity, heating, hot_water, temperature = unit_profiles(TRY, factors, building_type, number_people_household,
+                                                                                            holidays, climate_zone, year)
 
-    days_of_year, months, days, weekdays = generate_year_months_days_weekdays(year)
-
-    # import weather data
-    temperature, degree_of_coverage = import_TRY(TRY)
-
-    daily_avg_temperature, daily_avg_degree_of_coverage = calculate_daily_averages(temperature, degree_of_coverage)
-    
-    season = np.where(daily_avg_temperature < 5, "W", np.where((daily_avg_temperature >= 5) & (daily_avg_temperature <= 15), "Ü", "S"))
-    day_type = np.where((weekdays == 1) | np.isin(days_of_year, holidays), "S", "W")
-    degree_of_coverage = np.where(season == "S", "X", np.where((daily_avg_degree_of_coverage >= 0) & (daily_avg_degree_of_coverage < 4), "H", "B"))
-    
-    type_day = np.char.add(np.char.add(season, day_type), degree_of_coverage)
-    profile_day = np.char.add((building_type + climate_zone), type_day)
-
-    factor_data = import_csv(factors)
-
-    # vetorized calculation of the neccessary factors
-    f_heating_tt = np.zeros(len(profile_day))
-    f_el_tt = np.zeros(len(profile_day))
-    f_hotwater_tt = np.zeros(len(profile_day))
-    
-    for i, tag in enumerate(profile_day):
-        index = factor_data[factor_data['Profiltag'] == tag].index[0]
-        f_heating_tt[i] = factor_data.loc[index, 'Fheiz,TT']
-        f_el_tt[i] = factor_data.loc[index, 'Fel,TT']
-        f_hotwater_tt[i] = factor_data.loc[index, 'FTWW,TT']
-
-    daily_electricity = YEU_electricity_kWh * ((1/365) + (number_people_household*f_el_tt))
-    daily_heating = YEU_heating_kWh * f_heating_tt
-    daily_hot_water = YEU_hot_water_kWh * ((1/365) + (number_people_household*f_hotwater_tt))
-
-    quarter_hourly_intervals, electricity_kWh, heating_kWh, hot_water_kWh = standardized_quarter_hourly_profile(year, building_type, days_of_year, type_day)
-
-    quarter_hourly_daily_electricity = quarter_hourly_data(daily_electricity)
-    quarter_hourly_daily_heating = quarter_hourly_data(daily_heating)
-    quarte_hourly_daily_hot_water = quarter_hourly_data(daily_hot_water)
-
-    electricity_normed = electricity_kWh * quarter_hourly_daily_electricity
-    heating_normed = heating_kWh * quarter_hourly_daily_heating
-    hot_water_normed = hot_water_kWh * quarte_hourly_daily_hot_water
-
-    electricity_corrected = electricity_normed/sum(electricity_normed)*YEU_electricity_kWh
-    heating_corrected = heating_normed/sum(heating_normed)*YEU_heating_kWh
-    hot_water_corrected = hot_water_normed/sum(hot_water_normed)*YEU_hot_water_kWh
+    electricity_corrected = electricity * np.asarray(YEU_electricity_kWh, dtype=float)[..., np.newaxis]
+    heating_corrected = heating * np.asarray(YEU_heating_kWh, dtype=float)[..., np.newaxis]
+    hot_water_corrected = hot_water * np.asarray(YEU_hot_water_kWh, dtype=float)[..., np.newaxis]
 
-    return quarter_hourly_intervals, electricity_corrected, heating_corrected, hot_water_corrected, temperature
+    return quarter_hourly_intervals.copy(), electricity_corrected, heating_corrected, hot_water_corrected, temperature.copy()
 
 # YEU - yearly energy usage
-def calculate(YEU_heating_kWh, YEU_hot_water_kWh, YEU_electricity_kWh=1, building_type="MFH", number_people_household=2, year=2019, climate_zone="9"):
+def calculate(YEU_heating_kWh, YEU_hot_water_kWh, YEU_electricity_kWh=1, building_type="MFH", number_people_household=2, year=2019, climate_zone="9", TRY=None):
     # holidays
-    Neujahr = "2019-01-01"
-    Karfreitag = "2019-04-19"
-    Ostermontag = "2019-04-22"
-    Maifeiertag = "2019-05-01"
-    Pfingstmontag = "2019-05-30"
-    Christi_Himmelfahrt = "2019-06-10"
-    Fronleichnam = "2019-06-20"
-    Tag_der_deutschen_Einheit = "2019-10-03"
-    Allerheiligen = "2019-11-01"
-    Weihnachtsfeiertag1 = "2019-12-25"
-    Weihnachtsfeiertag2 = "2019-12-26"
-
-    holidays = np.array([Neujahr, Karfreitag, Ostermontag, Maifeiertag, Pfingstmontag, 
-                Christi_Himmelfahrt, Fronleichnam, Tag_der_deutschen_Einheit, 
-                Allerheiligen, Weihnachtsfeiertag1, Weihnachtsfeiertag2]).astype('datetime64[D]')
+    holidays = get_time_axis(year).holidays
     
-    TRY = get_resource_path('heat_requirement\TRY_511676144222\TRY2015_511676144222_Jahr.dat')
+    # TRY: path of the weather file, by default the TRY2015 year
+    if TRY is None:
+        TRY = get_resource_path('heat_requirement\TRY_511676144222\TRY2015_511676144222_Jahr.dat')
     factors = get_resource_path('heat_requirement\VDI 4655 data\Faktoren.csv')
 
     time_15min, electricity_kWh_15min, heating_kWh_15min, hot_water_kWh_15min, temperature = calculation_load_profile(TRY, factors, building_type, number_people_household, \
@@ -0,0 +1,190 @@
+# Erstellt von Jonas Pfeiffer
+# Gebäudespeicher für LOD2-Kacheln: eine GeoParquet-Datei mit einer Zeile je Gebäude (Grundriss, Flächen, Volumen, Höhen, Adresse)
+# Die Kacheln werden parallel mit process_lod2 verarbeitet, neue oder geänderte Kacheln werden beim nächsten Aufruf ergänzt.
+# Die Gebäude sind entlang einer Hilbert-Kurve sortiert und in kleine Row Groups mit Bounding-Box-Spalte aufgeteilt,
+# Abfragen für ein Gebiet lesen dadurch nur die Row Groups, deren Gebäude das Gebiet berühren können.
+
+import os
+import glob
+import json
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+import pyarrow.parquet as pq
+from pyproj import CRS
+
+from lod2.scripts.filter_LOD2 import process_lod2_gdf
+
+# Spalten des Gebäudespeichers neben ID, Kachel und Geometrie (Grundriss)
+GEBÄUDESPALTEN = ['Ground_Area', 'Wall_Area', 'Roof_Area', 'Volume', 'H_Traufe', 'H_Boden',
+                  'Adresse', 'Stadt', 'Bundesland', 'Land', 'Koordinate_X', 'Koordinate_Y']
+ADRESSSPALTEN = ['Adresse', 'Stadt', 'Bundesland', 'Land', 'Koordinate_X', 'Koordinate_Y']
+
+def LOD2_Kacheln(ordner):
+    # Kacheln eines Ordners (auch in Unterordnern, z.B. lod2_33484_5638_2_sn_shape) als {Kachel: Dateipfad}
+    dateien = sorted(glob.glob(os.path.join(ordner, '**', '*.shp'), recursive=True) + glob.glob(os.path.join(ordner, '**', '*.geojson'), recursive=True))
+    return {os.path.splitext(os.path.basename(datei))[0]: datei for datei in dateien}
+
+def grundriss(info):
+    # Grundriss als 2D-Geometrie aus den Ground-Flächen, fehlen diese, aus den Dachflächen
+    flächen = info['Ground'] or info['Roof']
+    if not flächen:
+        return None
+    if len(flächen) == 1:
+        return shapely.force_2d(flächen[0])
+    return shapely.union_all(shapely.force_2d(np.asarray(flächen, dtype=object)))
+
+def verarbeite_kachel(datei):
+    # Gebäude einer Kachel als GeoDataFrame mit den Spalten des Gebäudespeichers
+    gdf = gpd.read_file(datei)
+    building_info = process_lod2_gdf(gdf)
+
+    gebäude = pd.DataFrame([{spalte: info[spalte] for spalte in GEBÄUDESPALTEN} for info in building_info.values()], columns=GEBÄUDESPALTEN)
+    gebäude.insert(0, 'ID', list(building_info.keys()))
+    gebäude.insert(1, 'Kachel', os.path.splitext(os.path.basename(datei))[0])
+    gebäude.insert(2, 'Kachel_Zeit', os.path.getmtime(datei))
+    for spalte in ['Volume', 'H_Traufe', 'H_Boden', 'Koordinate_X', 'Koordinate_Y']:
+        gebäude[spalte] = pd.to_numeric(gebäude[spalte], errors='coerce').astype(float)
+    for spalte in ['Adresse', 'Stadt', 'Bundesland', 'Land']:
+        gebäude[spalte] = gebäude[spalte].astype(object).where(gebäude[spalte].notna(), None)
+
+    return gpd.GeoDataFrame(gebäude, geometry=[grundriss(info) for info in building_info.values()], crs=gdf.crs)
+
+def hilbert_reihenfolge(gebäude):
+    # Sortierung entlang einer Hilbert-Kurve, damit benachbarte Gebäude in denselben Row Groups liegen
+    vorhanden = ~(gebäude.geometry.isna() | gebäude.geometry.is_empty).values
+    distanz = np.full(len(gebäude), np.iinfo(np.uint32).max, dtype=np.int64)
+    if vorhanden.any():
+        distanz[vorhanden] = gebäude.geometry[vorhanden].hilbert_distance().values
+    return np.argsort(distanz, kind='stable')
+
+def aktualisiere_gebaeudespeicher(kacheln, speicher_pfad, max_workers=None, row_group_size=1000):
+    """
+    Übernahme von LOD2-Kacheln in den Gebäudespeicher, je Kachel ein Prozess (max_workers=1: nacheinander im aktuellen Prozess).
+
+    kacheln: Ordner (siehe LOD2_Kacheln), Liste von Dateien oder {Kachel: Dateipfad}
+    speicher_pfad: GeoParquet-Datei, wird angelegt oder um neue und geänderte Kacheln ergänzt. Gebäude, die in mehreren Kacheln
+    enthalten sind, werden aus der zuletzt verarbeiteten Kachel übernommen.
+
+    Kacheln, die nicht verarbeitet werden können, bleiben mit ihren bisherigen Gebäuden im Speicher.
+
+    Rückgabe: Gebäudespeicher als GeoDataFrame (None, wenn es keinen Speicher gibt und keine Kachel verarbeitet werden konnte)
+    """
+    if isinstance(kacheln, str):
+        kacheln = LOD2_Kacheln(kacheln)
+    elif not isinstance(kacheln, dict):
+        kacheln = {os.path.splitext(os.path.basename(datei))[0]: datei for datei in kacheln}
+
+    bestand = gpd.read_parquet(speicher_pfad) if os.path.exists(speicher_pfad) else None
+    verarbeitet = {} if bestand is None else bestand.groupby('Kachel')['Kachel_Zeit'].first().to_dict()
+
+    # nur neue oder seit der letzten Übernahme geänderte Kacheln verarbeiten
+    neu = {kachel: datei for kachel, datei in kacheln.items() if verarbeitet.get(kachel) != os.path.getmtime(datei)}
+    if not neu:
+        print("Gebäudespeicher ist aktuell, keine neuen Kacheln.")
+        return bestand
+
+    # Kacheln, die nicht verarbeitet werden können, behalten ihren bisherigen Stand und werden beim nächsten Aufruf erneut versucht
+    ergebnisse = {}
+    if max_workers == 1:
+        for kachel, datei in neu.items():
+            try:
+                ergebnisse[kachel] = verarbeite_kachel(datei)
+            except Exception as e:
+                print(f"Kachel {kachel} konnte nicht verarbeitet werden: {e}")
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            aufträge = {kachel: executor.submit(verarbeite_kachel, datei) for kachel, datei in neu.items()}
+            for kachel, auftrag in aufträge.items():
+                try:
+                    ergebnisse[kachel] = auftrag.result()
+                except Exception as e:
+                    print(f"Kachel {kachel} konnte nicht verarbeitet werden: {e}")
+
+    if not ergebnisse:
+        print("Keine Kachel konnte verarbeitet werden, der Gebäudespeicher bleibt unverändert.")
+        return bestand
+
+    # Gebäude des bisherigen Speichers nur für erfolgreich verarbeitete Kacheln ersetzen
+    teile = list(ergebnisse.values())
+    if bestand is not None:
+        teile.insert(0, bestand[~bestand['Kachel'].isin(list(ergebnisse))])
+    crs = next((teil.crs for teil in teile if teil.crs is not None), None)
+    gebäude = pd.concat([teil.to_crs(crs) if teil.crs is not None and teil.crs != crs else teil for teil in teile], ignore_index=True)
+    gebäude = gpd.GeoDataFrame(gebäude, geometry='geometry', crs=crs).drop_duplicates(subset='ID', keep='last')
+    gebäude = gebäude.iloc[hilbert_reihenfolge(gebäude)].reset_index(drop=True)
+    # Adressspalten immer als Text speichern, auch wenn noch keine Kachel Adressen enthält
+    for spalte in ['Adresse', 'Stadt', 'Bundesland', 'Land']:
+        gebäude[spalte] = gebäude[spalte].astype('string')
+
+    # erst vollständig schreiben, dann ersetzen, damit bei einem Abbruch der bisherige Speicher erhalten bleibt
+    temporär = speicher_pfad + ".tmp"
+    gebäude.to_parquet(temporär, index=False, write_covering_bbox=True, row_group_size=row_group_size)
+    os.replace(temporär, speicher_pfad)
+    print(f"{len(ergebnisse)} von {len(neu)} Kachel(n) übernommen, {len(gebäude)} Gebäude im Gebäudespeicher.")
+
+    return gebäude
+
+def speicher_crs(speicher_pfad):
+    # Koordinatensystem aus den GeoParquet-Metadaten, ohne Daten zu lesen
+    geo = json.loads(pq.read_schema(speicher_pfad).metadata[b'geo'])
+    crs = geo['columns'][geo['primary_column']].get('crs', 'OGC:CRS84')
+    return None if crs is None else CRS.from_user_input(crs)
+
+def lade_gebaeude(speicher_pfad, bbox=None, columns=None):
+    # Gebäude aus dem Gebäudespeicher, mit bbox (minx, miny, maxx, maxy) werden nur die Row Groups gelesen, die das Rechteck berühren
+    return gpd.read_parquet(speicher_pfad, bbox=None if bbox is None else tuple(bbox), columns=columns)
+
+def filter_gebaeude_mit_polygon(speicher_pfad, polygon_shapefile_path):
+    # Gebäude, deren Grundriss vollständig innerhalb des Polygons liegt
+    polygon_gdf = gpd.read_file(polygon_shapefile_path)
+    polygon_union = shapely.union_all(polygon_gdf.to_crs(speicher_crs(speicher_pfad))['geometry'].buffer(0).values)
+    shapely.prepare(polygon_union)
+
+    gebäude = lade_gebaeude(speicher_pfad, bbox=polygon_union.bounds)
+    innerhalb = shapely.contains(polygon_union, shapely.buffer(gebäude.geometry.values, 0))
+    return gebäude[innerhalb].reset_index(drop=True)
+
+def filter_gebaeude_mit_koordinaten(speicher_pfad, csv_file_path):
+    # Gebäude, deren Grundriss einen Punkt der CSV-Datei enthält, Adressdaten und Koordinaten werden aus der CSV übernommen
+    df = pd.read_csv(csv_file_path, delimiter=';')
+    punkte = shapely.points(df.UTM_X.values, df.UTM_Y.values)
+
+    gebäude = lade_gebaeude(speicher_pfad, bbox=shapely.total_bounds(punkte)).reset_index(drop=True)
+    punkt_index, gebäude_index = gebäude.sindex.query(punkte, predicate='within')
+    # je Punkt das erste passende Gebäude, je Gebäude der letzte Punkt
+    reihenfolge = np.lexsort((gebäude_index, punkt_index))
+    punkt_index, erste = np.unique(punkt_index[reihenfolge], return_index=True)
+    gebäude_index = gebäude_index[reihenfolge][erste]
+
+    treffer = df.iloc[punkt_index].assign(Koordinate_X=df.UTM_X.values[punkt_index], Koordinate_Y=df.UTM_Y.values[punkt_index])
+    treffer.index = gebäude_index
+    treffer = treffer[~treffer.index.duplicated(keep='last')]
+
+    gefiltert = gebäude.iloc[np.unique(gebäude_index)].copy()
+    for spalte in ADRESSSPALTEN:
+        if spalte in treffer.columns:
+            if spalte not in ['Koordinate_X', 'Koordinate_Y']:
+                gefiltert[spalte] = gefiltert[spalte].astype(object)
+            gefiltert.loc[treffer.index, spalte] = treffer[spalte].values
+
+    return gefiltert.reset_index(drop=True)
+
+def building_info_aus_gebaeuden(gebäude):
+    # Gebäude aus dem Gebäudespeicher im Format von process_lod2, der Grundriss wird als einzige Ground-Fläche übergeben
+    building_info = {}
+    for zeile in gebäude.itertuples(index=False):
+        info = {'Ground': [] if zeile.geometry is None else [zeile.geometry], 'Wall': [], 'Roof': []}
+        for spalte in GEBÄUDESPALTEN:
+            wert = getattr(zeile, spalte)
+            info[spalte] = None if spalte not in ['Ground_Area', 'Wall_Area', 'Roof_Area'] and pd.isna(wert) else wert
+        building_info[zeile.ID] = info
+
+    return building_info
+
+def lade_gefilterte_gebaeude(geojson_path):
+    # gefilterte Gebäude (siehe filter_gebaeude_mit_polygon / filter_gebaeude_mit_koordinaten) aus der GeoJSON-Datei
+    return building_info_aus_gebaeuden(gpd.read_file(geojson_path))
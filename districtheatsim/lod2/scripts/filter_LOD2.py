@@ -1,11 +1,22 @@
 import numpy as np
 import pandas as pd
 import geopandas as gpd
+import shapely
 
 from shapely.geometry import Polygon, MultiPolygon, Point
 
 from geopy.geocoders import Nominatim
 
+from lod2.scripts.geometry_3d import flächen_3d
+
+def adress_schluessel(osm_gdf):
+    # "Stadt, Straße Hausnummer" je OSM-Gebäude, fehlende Werte werden wie bei der Formatierung einzelner Werte zu 'None' bzw. 'nan'
+    def als_text(spalte):
+        return pd.Series(np.asarray(osm_gdf[spalte], dtype=object).astype(str), index=osm_gdf.index)
+
+    hausnummer = als_text('addr:housenumber') if 'addr:housenumber' in osm_gdf.columns else ''
+    return (als_text('addr:city') + ', ' + als_text('addr:street') + ' ' + hausnummer).str.strip()
+
 def filter_LOD2_with_OSM_and_adress(csv_file_path, osm_geojson_path, lod_shapefile_path, output_geojson_path):
     # OSM-Gebäudedaten laden und nach Adressen filtern
     osm_gdf = gpd.read_file(osm_geojson_path)
@@ -16,19 +27,16 @@ def filter_LOD2_with_OSM_and_adress(csv_file_path, osm_geojson_path, lod_shapefi
     address_list = df['VollständigeAdresse'].unique().tolist()
 
     # Filtern der OSM-Daten basierend auf der Adressliste
-    osm_gdf_filtered = osm_gdf[osm_gdf.apply(lambda x: f"{x['addr:city']}, {x['addr:street']} {x.get('addr:housenumber', '')}".strip() in address_list, axis=1)]
+    osm_gdf_filtered = osm_gdf[adress_schluessel(osm_gdf).isin(address_list).values]
 
     # LOD-Daten laden
     lod_gdf = gpd.read_file(lod_shapefile_path)
 
-    # Räumlichen Join durchführen, um Übereinstimmungen zu finden (nur IDs extrahieren)
-    joined_gdf = gpd.sjoin(lod_gdf, osm_gdf_filtered, how='inner', predicate='intersects')
-
-    # IDs der übereinstimmenden LOD-Objekte extrahieren
-    matching_ids = joined_gdf.index.tolist()
+    # Räumlicher Index über die gefilterten OSM-Gebäude, gesucht werden die LOD-Objekte, die ein OSM-Gebäude schneiden
+    lod_positionen, _ = osm_gdf_filtered.sindex.query(lod_gdf.geometry.values, predicate='intersects')
 
-    # Original-LOD-Daten basierend auf den extrahierten IDs filtern
-    filtered_lod_gdf = lod_gdf[lod_gdf.index.isin(matching_ids)]
+    # Original-LOD-Daten basierend auf den gefundenen Positionen filtern
+    filtered_lod_gdf = lod_gdf.iloc[np.unique(lod_positionen)]
 
     # Gefilterte Daten in einer neuen geoJSON speichern
     filtered_lod_gdf.to_file(output_geojson_path, driver='GeoJSON')
@@ -42,23 +50,24 @@ def filter_LOD2_with_coordinates(lod_geojson_path, csv_file_path, output_geojson
     lod_gdf = gpd.read_file(lod_geojson_path)
 
     # Erstellen einer Geopandas GeoDataFrame aus den CSV-Koordinaten
-    geometry = [Point(xy) for xy in zip(df.UTM_X, df.UTM_Y)]
+    geometry = shapely.points(df.UTM_X.values, df.UTM_Y.values)
     csv_gdf = gpd.GeoDataFrame(df, geometry=geometry)
     csv_gdf.set_crs(lod_gdf.crs, inplace=True)
 
     # Filtern der LOD2-Daten basierend auf den Koordinaten in der CSV-Datei und "Ground" Geometrien
-    parent_ids = set()
     ground_geometries = lod_gdf[lod_gdf['Geometr_3D'] == 'Ground']
-    csv_gdf['parent_id'] = None
 
-    for idx, csv_row in csv_gdf.iterrows():
-        point = csv_row.geometry
-        for ground_idx, ground_row in ground_geometries.iterrows():
-            if point.within(ground_row['geometry']):
-                parent_id = ground_row['ID']
-                parent_ids.add(parent_id)
-                csv_gdf.at[idx, 'parent_id'] = parent_id
-                break
+    # Räumlicher Index über die Ground-Geometrien, Paare (Punkt, Ground) mit point.within(ground)
+    punkte, grounds = ground_geometries.sindex.query(csv_gdf.geometry.values, predicate='within')
+    # je Punkt die erste passende Ground-Geometrie
+    reihenfolge = np.lexsort((grounds, punkte))
+    punkte, erste = np.unique(punkte[reihenfolge], return_index=True)
+    treffer_ids = ground_geometries['ID'].values[grounds[reihenfolge][erste]]
+
+    parent_id = np.full(len(csv_gdf), None, dtype=object)
+    parent_id[punkte] = treffer_ids
+    csv_gdf['parent_id'] = parent_id
+    parent_ids = set(treffer_ids)
 
     # Alle Parent- und zugehörigen Child-Objekte übernehmen
     filtered_lod_gdf = lod_gdf[lod_gdf['ID'].isin(parent_ids) | lod_gdf['Obj_Parent'].isin(parent_ids)]
@@ -83,14 +92,20 @@ def spatial_filter_with_polygon(lod_geojson_path, polygon_shapefile_path, output
     polygon_gdf = polygon_gdf.to_crs(lod_gdf.crs)
 
     # Überprüfen der Gültigkeit und Reparieren von Polygon-Geometrien
-    polygon_gdf['geometry'] = polygon_gdf['geometry'].buffer(0)
+    polygon_union = shapely.union_all(polygon_gdf['geometry'].buffer(0).values)
+    shapely.prepare(polygon_union)
+
+    # Vorauswahl über den räumlichen Index: buffer(0) verkleinert die Umhüllende nicht über die Geometrie hinaus,
+    # Objekte innerhalb des Polygons müssen daher mit ihrer Umhüllenden die Umhüllende eines Teilpolygons schneiden
+    _, kandidaten = lod_gdf.sindex.query(shapely.get_parts(polygon_union))
+    kandidaten = np.unique(kandidaten)
 
     # 2D-Geometrien oder gepufferte Version für die Identifizierung der Objekt-IDs verwenden
-    lod_gdf_2d = lod_gdf.copy()
-    lod_gdf_2d['geometry'] = lod_gdf_2d['geometry'].buffer(0)
-    
+    geometrien_2d = shapely.buffer(lod_gdf.geometry.values[kandidaten], 0)
+
     # Identifiziere Objekte, die vollständig innerhalb des Polygons liegen, basierend auf der 2D-Repräsentation
-    ids_within_polygon = lod_gdf_2d[lod_gdf_2d.within(polygon_gdf.unary_union)]['ID'].unique()
+    innerhalb = shapely.contains(polygon_union, geometrien_2d)
+    ids_within_polygon = lod_gdf['ID'].values[kandidaten[innerhalb]]
 
     # Filtere die ursprünglichen LOD-Daten basierend auf den identifizierten IDs
     filtered_lod_gdf = lod_gdf[lod_gdf['ID'].isin(ids_within_polygon)]
@@ -99,89 +114,72 @@ def spatial_filter_with_polygon(lod_geojson_path, polygon_shapefile_path, output
     filtered_lod_gdf.to_file(output_geojson_path, driver='GeoJSON')
 
 def calculate_polygon_area_3d(polygon):
-    """Berechnet die Fläche eines 3D-Polygons durch Zerlegung in Dreiecke."""
+    """Berechnet die Fläche eines 3D-Polygons nach dem Newell-Verfahren."""
     if isinstance(polygon, Polygon):
-        coords = list(polygon.exterior.coords)
-        # Entferne den letzten Punkt, wenn er mit dem ersten identisch ist (geschlossene Polygone in Shapely).
-        if coords[0] == coords[-1]:
-            coords.pop()
-            
-        # Berechne die Fläche, indem Dreiecke verwendet werden.
-        area = 0.0
-        origin = coords[0]  # Wähle den ersten Punkt als Ursprung
-        
-        for i in range(1, len(coords) - 1):
-            # Berechne die Fläche des Dreiecks, das vom Ursprung und zwei aufeinanderfolgenden Punkten gebildet wird.
-            area += calculate_triangle_area_3d(origin, coords[i], coords[i+1])
-            
-        return area
+        return flächen_3d([polygon])[0]
     else:
         return None
 
-def calculate_triangle_area_3d(p1, p2, p3):
-    """Berechnet die Fläche eines Dreiecks im 3D-Raum mithilfe der Heron-Formel."""
-    a = calculate_distance_3d(p1, p2)
-    b = calculate_distance_3d(p2, p3)
-    c = calculate_distance_3d(p3, p1)
-    s = (a + b + c) / 2  # Semiperimeter
-    return np.sqrt(s * (s - a) * (s - b) * (s - c))  # Heron-Formel
-
-def calculate_distance_3d(point1, point2):
-    """Berechnet die Distanz zwischen zwei Punkten im 3D-Raum."""
-    return np.sqrt((point1[0] - point2[0])**2 + (point1[1] - point2[1])**2 + (point1[2] - point2[2])**2)
-
 def calculate_area_3d_for_feature(geometry):
     """Berechnet die 3D-Fläche für ein einzelnes Feature."""
-    total_area = 0
-    if isinstance(geometry, Polygon):
-        total_area = calculate_polygon_area_3d(geometry)
-    elif isinstance(geometry, MultiPolygon):
-        for polygon in geometry.geoms:
-            total_area += calculate_polygon_area_3d(polygon)
-    return total_area
+    return flächen_3d([geometry])[0]
+
+def gruppieren(codes, werte, anzahl):
+    # Werte je Gruppe als Listen, Reihenfolge innerhalb der Gruppen bleibt erhalten
+    reihenfolge = np.argsort(codes, kind='stable')
+    grenzen = np.cumsum(np.bincount(codes, minlength=anzahl))[:-1]
+    return [list(teil) for teil in np.split(np.asarray(werte, dtype=object)[reihenfolge], grenzen)]
 
 def process_lod2(file_path):
     # Lade die GeoJSON-Datei
     gdf = gpd.read_file(file_path)
 
-    # Initialisiere ein Dictionary, um die Ergebnisse für jedes Gebäude zu speichern
+    return process_lod2_gdf(gdf)
+
+def process_lod2_gdf(gdf):
+    # Gebäudeinformationen aus bereits eingelesenen LOD2-Daten (z.B. einer Kachel)
+    # Benutze 'ID' als Fallback, wenn 'Obj_Parent' None ist, Gebäude in der Reihenfolge ihres ersten Auftretens
+    parent_ids = gdf['Obj_Parent'].where(gdf['Obj_Parent'].notna(), gdf['ID'])
+    codes, gebäude = pd.factorize(parent_ids)
+    anzahl = len(gebäude)
+
+    # 3D-Flächen aller Geometrien in einem Schritt
+    flächen = flächen_3d(gdf.geometry.values)
+
+    geometrien, flächensummen = {}, {}
+    for art in ['Ground', 'Wall', 'Roof']:
+        maske = (gdf['Geometr_3D'] == art).values
+        geometrien[art] = gruppieren(codes[maske], gdf.geometry.values[maske], anzahl)
+        flächensummen[art] = np.bincount(codes[maske], weights=flächen[maske], minlength=anzahl)
+
+    # Höhen aus der letzten Zeile des Gebäudes
+    letzte_zeile = pd.Series(np.arange(len(gdf))).groupby(codes).max().values
+    höhen = {spalte: gdf[spalte].values[letzte_zeile] if spalte in gdf.columns else [None] * anzahl for spalte in ['H_Traufe', 'H_Boden']}
+
+    # Adressinformationen aus der letzten Zeile mit Adresse
+    adressspalten = ['Adresse', 'Stadt', 'Bundesland', 'Land', 'Koordinate_X', 'Koordinate_Y']
+    adressen = {spalte: [None] * anzahl for spalte in adressspalten}
+    if 'Adresse' in gdf.columns:
+        mit_adresse = np.flatnonzero(gdf['Adresse'].notna().values)
+        zeilen = pd.Series(mit_adresse).groupby(codes[mit_adresse]).max()
+        for spalte in adressspalten:
+            werte = gdf[spalte].values
+            for i, zeile in zip(zeilen.index, zeilen.values):
+                adressen[spalte][i] = werte[zeile]
+
+    # Ergebnisse für jedes Gebäude
     building_info = {}
-
-    for _, row in gdf.iterrows():
-        # Benutze 'ID' als Fallback, wenn 'Obj_Parent' None ist
-        parent_id = row['Obj_Parent'] if row['Obj_Parent'] is not None else row['ID']
-        
-        if parent_id not in building_info:
-            building_info[parent_id] = {'Ground': [], 'Wall': [], 'Roof': [], 'H_Traufe': None, 'H_Boden': None,
-                                        'Adresse': None, 'Stadt': None, 'Bundesland': None, 'Land': None, 'Koordinate_X': None, 'Koordinate_Y': None}
-
-        # Extrahiere und speichere Geometrien und Höheninformationen
-        if row['Geometr_3D'] in ['Ground', 'Wall', 'Roof']:
-            building_info[parent_id][row['Geometr_3D']].append(row['geometry'])
-        
-        # Setze Höhen, falls noch nicht gesetzt oder aktualisiere, falls unterschiedlich (sollte theoretisch nicht passieren)
-        if 'H_Traufe' in row and (building_info[parent_id]['H_Traufe'] is None or building_info[parent_id]['H_Traufe'] != row['H_Traufe']):
-            building_info[parent_id]['H_Traufe'] = row['H_Traufe']
-        if 'H_Boden' in row and (building_info[parent_id]['H_Boden'] is None or building_info[parent_id]['H_Boden'] != row['H_Boden']):
-            building_info[parent_id]['H_Boden'] = row['H_Boden']
-
-        # Überprüfe, ob Adressinformationen vorhanden sind
-        if 'Adresse' in row and pd.notna(row['Adresse']):
-            building_info[parent_id]['Adresse'] = row['Adresse']
-            building_info[parent_id]['Stadt'] = row['Stadt']
-            building_info[parent_id]['Bundesland'] = row['Bundesland']
-            building_info[parent_id]['Land'] = row['Land']
-            building_info[parent_id]['Koordinate_X'] = row['Koordinate_X']
-            building_info[parent_id]['Koordinate_Y'] = row['Koordinate_Y']
-
-    # Berechne die Flächen und Volumina für jedes Gebäude
-    for parent_id, info in building_info.items():
-        info['Ground_Area'] = sum(calculate_area_3d_for_feature(geom) for geom in info['Ground'])
-        info['Wall_Area'] = sum(calculate_area_3d_for_feature(geom) for geom in info['Wall'])
-        info['Roof_Area'] = sum(calculate_area_3d_for_feature(geom) for geom in info['Roof'])
+    for i, parent_id in enumerate(gebäude):
+        info = {art: geometrien[art][i] for art in ['Ground', 'Wall', 'Roof']}
+        info.update({spalte: höhen[spalte][i] for spalte in ['H_Traufe', 'H_Boden']})
+        info.update({spalte: adressen[spalte][i] for spalte in adressspalten})
+        info['Ground_Area'] = flächensummen['Ground'][i]
+        info['Wall_Area'] = flächensummen['Wall'][i]
+        info['Roof_Area'] = flächensummen['Roof'][i]
         h_traufe = info['H_Traufe']
         h_boden = info['H_Boden']
         info['Volume'] = (h_traufe - h_boden) * info['Ground_Area'] if h_traufe and h_boden else None
+        building_info[parent_id] = info
 
     return building_info
 
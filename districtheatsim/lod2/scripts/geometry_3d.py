@@ -0,0 +1,69 @@
+# Erstellt von Jonas Pfeiffer
+# 3D-Flächen und Flächennormalen der LOD2-Geometrien
+# Die Koordinaten aller Außenringe werden in flache Arrays übernommen, Flächen und Normalen aller Polygone werden
+# in einem Schritt nach dem Newell-Verfahren berechnet: N = 1/2 * Summe (p_i - p_0) x (p_i+1 - p_0), Fläche = |N|.
+
+import numpy as np
+import pandas as pd
+import shapely
+
+def ring_koordinaten(geometrien):
+    """
+    Außenringe aller Polygone als flache Arrays (Innenringe werden wie bisher nicht berücksichtigt).
+
+    geometrien: Polygone, MultiPolygone oder None
+    Rückgabe: Koordinaten [Punkte x 3], Ring je Punkt, Geometrie je Ring
+    """
+    polygone, geometrie_index = shapely.get_parts(np.asarray(geometrien, dtype=object), return_index=True)
+    # nur Polygone, andere Geometrietypen haben keine Fläche
+    polygon_maske = shapely.get_type_id(polygone) == 3
+    polygone, geometrie_index = polygone[polygon_maske], geometrie_index[polygon_maske]
+
+    koordinaten, ring_index = shapely.get_coordinates(shapely.get_exterior_ring(polygone), include_z=True, return_index=True)
+    # fehlende z-Werte (2D-Geometrien) als Ebene z = 0
+    koordinaten[np.isnan(koordinaten[:, 2]), 2] = 0
+
+    return koordinaten, ring_index, geometrie_index
+
+def newell_normalen(koordinaten, ring_index, anzahl_ringe):
+    # Flächenvektoren je Ring, Länge = Fläche. Koordinaten relativ zum ersten Punkt des Rings, damit bei UTM-Koordinaten keine Genauigkeit verloren geht
+    erster_punkt = np.searchsorted(ring_index, np.arange(anzahl_ringe))
+    relativ = koordinaten - koordinaten[erster_punkt[ring_index]]
+
+    # Kreuzprodukte aufeinanderfolgender Punkte. Der erste Punkt jedes Rings liegt relativ im Ursprung, die Übergänge
+    # zwischen zwei Ringen (und die schließende Kante, letzter Punkt = erster Punkt) liefern daher keinen Beitrag
+    x, y, z = relativ[:, 0], relativ[:, 1], relativ[:, 2]
+    kreuzprodukte = (y[:-1] * z[1:] - z[:-1] * y[1:], z[:-1] * x[1:] - x[:-1] * z[1:], x[:-1] * y[1:] - y[:-1] * x[1:])
+    ringe = ring_index[:-1]
+
+    normalen = np.empty((anzahl_ringe, 3))
+    for achse in range(3):
+        normalen[:, achse] = 0.5 * np.bincount(ringe, weights=kreuzprodukte[achse], minlength=anzahl_ringe)
+
+    return normalen
+
+def flächen_und_normalen(geometrien):
+    """
+    Fläche, Einheitsnormale, Neigung und Ausrichtung aller Teilflächen.
+
+    Rückgabe: DataFrame mit einer Zeile je Polygon (MultiPolygone werden zerlegt), Spalte 'Geometrie' ist die Position
+    der Geometrie in geometrien. Neigung in Grad gegen die Horizontale, Azimut in Grad von der x-Achse (Osten) gegen den Uhrzeigersinn.
+    """
+    koordinaten, ring_index, geometrie_index = ring_koordinaten(geometrien)
+    flächenvektoren = newell_normalen(koordinaten, ring_index, len(geometrie_index))
+
+    fläche = np.linalg.norm(flächenvektoren, axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        normalen = flächenvektoren / fläche[:, np.newaxis]
+
+    neigung = np.degrees(np.arccos(np.clip(normalen[:, 2], -1, 1)))
+    azimut = np.degrees(np.arctan2(normalen[:, 1], normalen[:, 0])) % 360
+
+    return pd.DataFrame({'Geometrie': geometrie_index, 'Fläche': fläche, 'n_x': normalen[:, 0], 'n_y': normalen[:, 1], 'n_z': normalen[:, 2],
+                         'Neigung': neigung, 'Azimut': azimut})
+
+def flächen_3d(geometrien):
+    # 3D-Fläche je Geometrie (Summe der Teilflächen bei MultiPolygonen, 0 ohne Polygon)
+    koordinaten, ring_index, geometrie_index = ring_koordinaten(geometrien)
+    fläche = np.linalg.norm(newell_normalen(koordinaten, ring_index, len(geometrie_index)), axis=1)
+    return np.bincount(geometrie_index, weights=fläche, minlength=len(geometrien))
@@ -5,10 +5,14 @@
 
 import os
 import sys
+from functools import lru_cache
 
+import numpy as np
 import pandas as pd
 
 from lod2.scripts.filter_LOD2 import spatial_filter_with_polygon, process_lod2, calculate_centroid_and_geocode
+from utilities.test_reference_year import lade_TRY
+from utilities.demand_matrix import DemandMatrix
 
 def get_resource_path(relative_path):
     """ Get the absolute path to the resource, works for dev and for PyInstaller """
@@ -41,11 +45,8 @@ class Building:
             self.u_values.update(self.load_u_values(u_type, building_state))
 
     def import_TRY(self):
-        # Import TRY data for weather conditions
-        col_widths = [8, 8, 3, 3, 3, 6, 5, 4, 5, 2, 5, 4, 5, 5, 4, 5, 3]  # Column widths for the data file
-        col_names = ["RW", "HW", "MM", "DD", "HH", "t", "p", "WR", "WG", "N", "x", "RF", "B", "D", "A", "E", "IL"]  # Column names
-        data = pd.read_fwf(self.u_values["filename_TRY"], widths=col_widths, names=col_names, skiprows=34)  # Read the file
-        self.temperature = data['t'].values  # Store temperature data as numpy array
+        # Import TRY data for weather conditions (read once per file, see utilities/test_reference_year.py)
+        self.temperature = lade_TRY(self.u_values["filename_TRY"])['t']
     
     def calc_heat_demand(self):
         # Calculate the areas of windows and doors and the actual wall area excluding windows and doors
@@ -90,7 +91,8 @@ class Building:
         b = -m * self.u_values["max_air_temp_heating"]  # Intercept
 
         # Calculate heating demand for each hour and sum if temperature is below max_air_temp_heating
-        self.yearly_heating_demand = sum(max(m * temp + b, 0) for temp in self.temperature if temp < self.u_values["max_air_temp_heating"]) / 1000
+        temperature = self.temperature[self.temperature < self.u_values["max_air_temp_heating"]]
+        self.yearly_heating_demand = np.sum(np.maximum(m * temperature + b, 0)) / 1000
 
         #print(f"Annual heating demand: {self.yearly_heating_demand:.2f} kWh")
 
@@ -109,8 +111,7 @@ class Building:
         #print(f"Total annual heat demand: {self.yearly_heat_demand:.2f} kWh")
 
     def load_u_values(self, u_type, building_state):                
-        # Angenommen, die CSV-Datei heißt 'u_values.csv' und befindet sich im gleichen Verzeichnis
-        df = pd.read_csv(get_resource_path('data\\standard_u_values_TABULA.csv'), sep=";")
+        df = load_u_value_table()
         u_values_row = df[(df['Typ'] == u_type) & (df['building_state'] == building_state)]
         
         if not u_values_row.empty:
@@ -120,6 +121,95 @@ class Building:
             print(f"Keine U-Werte für Typ '{u_type}' und Zustand '{building_state}' gefunden. Verwende Standardwerte.")
             return {}
 
+@lru_cache(maxsize=None)
+def load_u_value_table():
+    # TABULA U-values, read once per process
+    return pd.read_csv(get_resource_path('data\\standard_u_values_TABULA.csv'), sep=";")
+
+def u_values_for_buildings(number_of_buildings, u_type=None, building_state=None, **parameters):
+    """
+    U-values and parameters of many buildings as arrays (one value per building).
+
+    Standard values from Building.STANDARD_U_VALUES, overwritten by parameters (scalar or one value per building) and then
+    by the TABULA values of the buildings whose combination of u_type and building_state is found in the table.
+    """
+    values = {}
+    for key, standard in Building.STANDARD_U_VALUES.items():
+        if key == "filename_TRY":
+            continue
+        values[key] = np.broadcast_to(np.asarray(parameters.get(key, standard), dtype=float), (number_of_buildings,)).copy()
+
+    if u_type is None:
+        return values
+
+    # one join of all buildings with the table, the first row is used for duplicate keys (as in Building.load_u_values)
+    table = load_u_value_table().drop_duplicates(subset=['Typ', 'building_state'])
+    keys = pd.DataFrame({'Typ': np.broadcast_to(np.asarray(u_type, dtype=object), (number_of_buildings,)),
+                         'building_state': np.broadcast_to(np.asarray(building_state, dtype=object), (number_of_buildings,))})
+    joined = keys.merge(table, on=['Typ', 'building_state'], how='left')
+    found = joined['ground_u'].notna().to_numpy()
+
+    missing = ~found & keys['Typ'].notna().to_numpy() & (keys['Typ'].astype(str).to_numpy() != "")
+    if np.any(missing):
+        print(f"Keine U-Werte für {np.sum(missing)} Gebäude gefunden (z.B. Typ '{keys['Typ'][missing].iloc[0]}', Zustand '{keys['building_state'][missing].iloc[0]}'). Verwende Standardwerte.")
+
+    for column in table.columns.drop(['Typ', 'building_state']):
+        if column in values:
+            values[column][found] = joined[column].to_numpy(dtype=float)[found]
+
+    return values
+
+def calculate_heat_demand_batch(ground_area, wall_area, roof_area, building_volume, u_type=None, building_state=None, hourly=False, filename_TRY=None, **parameters):
+    """
+    Heat demand of many buildings in one calculation, same method as Building.calc_yearly_heat_demand.
+
+    ground_area, wall_area, roof_area, building_volume: arrays with one value per building
+    u_type, building_state: TABULA type and state per building (or one value for all), None uses the standard values
+    hourly: additionally return the hourly heating demand in W as DemandMatrix (buildings x hours)
+    parameters: further values of Building.STANDARD_U_VALUES, scalar or one value per building
+
+    Returns a dict with max_heating_demand (W), yearly_heating_demand, yearly_warm_water_demand and yearly_heat_demand (kWh)
+    and hourly_heating_demand if hourly is set.
+    """
+    ground_area, wall_area, roof_area, building_volume = np.broadcast_arrays(*(np.asarray(area, dtype=float) for area in (ground_area, wall_area, roof_area, building_volume)))
+    u_values = u_values_for_buildings(len(ground_area), u_type, building_state, **parameters)
+
+    # heat loss per K of all components
+    window_area = wall_area * u_values["fracture_windows"]
+    door_area = wall_area * u_values["fracture_doors"]
+    real_wall_area = wall_area - window_area - door_area
+    total_heat_loss_per_K = real_wall_area * u_values["wall_u"] + ground_area * u_values["ground_u"] + roof_area * u_values["roof_u"] + \
+                            window_area * u_values["window_u"] + door_area * u_values["door_u"]
+
+    dT_max_K = u_values["room_temp"] - u_values["min_air_temp"]
+    max_heating_demand = total_heat_loss_per_K * dT_max_K + 0.34 * u_values["air_change_rate"] * building_volume * dT_max_K
+
+    # The heating demand is linear in the air temperature: max(P_max * (T_heating - T) / (T_heating - T_min), 0) for T < T_heating.
+    # The yearly sum only needs the degree hours below T_heating, they are computed per distinct heating limit from the sorted temperatures.
+    temperature = lade_TRY(filename_TRY or Building.STANDARD_U_VALUES["filename_TRY"])['t']
+    sorted_temperature = np.sort(temperature)
+    cumulated_temperature = np.concatenate(([0], np.cumsum(sorted_temperature)))
+    heating_limits, limit_index = np.unique(u_values["max_air_temp_heating"], return_inverse=True)
+    count_below = np.searchsorted(sorted_temperature, heating_limits, side='left')
+    degree_hours = heating_limits * count_below - cumulated_temperature[count_below]
+
+    temperature_span = u_values["max_air_temp_heating"] - u_values["min_air_temp"]
+    heating_factor = np.maximum(np.divide(max_heating_demand, temperature_span, out=np.full(len(ground_area), np.nan), where=temperature_span != 0), 0)
+
+    results = {
+        "max_heating_demand": max_heating_demand,
+        "yearly_heating_demand": heating_factor * degree_hours[limit_index] / 1000,
+        "yearly_warm_water_demand": u_values["ww_demand_Wh_per_m2"] * ground_area * u_values["floors"] / 1000
+    }
+    results["yearly_heat_demand"] = results["yearly_heating_demand"] + results["yearly_warm_water_demand"]
+
+    if hourly:
+        # one profile of the temperature difference per heating limit, scaled per building
+        profiles = np.maximum(heating_limits[:, np.newaxis] - np.asarray(temperature, dtype=float)[np.newaxis, :], 0)
+        results["hourly_heating_demand"] = DemandMatrix(profiles, limit_index, heating_factor)
+
+    return results
+
 def calculate_heat_demand_for_lod2_area(lod_geojson_path, polygon_shapefile_path, output_geojson_path, output_csv_path):
     # Verwenden der bereits definierte Funktion, um LOD2-Daten zu filtern
     spatial_filter_with_polygon(lod_geojson_path, polygon_shapefile_path, output_geojson_path)
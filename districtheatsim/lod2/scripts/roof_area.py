@@ -7,6 +7,9 @@ from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from shapely.geometry import Point, Polygon, MultiPolygon
 import numpy as np
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+from lod2.scripts.geometry_3d import flächen_und_normalen
+
 def get_resource_path(relative_path):
     """ Get the absolute path to the resource, works for dev and for PyInstaller """
     if getattr(sys, 'frozen', False):
@@ -23,26 +26,11 @@ def calculate_normal_and_angles(polygon):
     if len(coords) < 3:
         return None, None, None
 
-    # Berechnung des Normalenvektors für die ersten drei Punkte
-    p1 = np.array(coords[0])
-    p2 = np.array(coords[1])
-    p3 = np.array(coords[2])
-    v1 = p2 - p1
-    v2 = p3 - p1
-    normal = np.cross(v1, v2)
-    normal = normal / np.linalg.norm(normal)
-    
-    # Neigungswinkel
-    inclination = np.arccos(normal[2]) * 180 / np.pi
-    
-    # Azimutwinkel
-    azimuth = np.arctan2(normal[1], normal[0]) * 180 / np.pi
-    if azimuth < 0:
-        azimuth += 360
+    # Normalenvektor, Neigungswinkel, Azimutwinkel und 3D-Fläche nach dem Newell-Verfahren
+    ebene = flächen_und_normalen([polygon]).iloc[0]
+    normal = ebene[['n_x', 'n_y', 'n_z']].values.astype(float)
 
-    area = polygon.area
-
-    return normal, inclination, azimuth, area
+    return normal, ebene['Neigung'], ebene['Azimut'], ebene['Fläche']
 
 class RoofAreaPlot(QMainWindow):
     def __init__(self):
@@ -75,6 +63,8 @@ class RoofAreaPlot(QMainWindow):
         print(self.gdf.columns)
         
         self.dachflächen = self.gdf[self.gdf['Geometr_3D'] == 'Roof'][['geometry', 'Dachflaech', 'Dachorient', 'Dachneig', 'Obj_Parent', 'ID']]
+        # Fläche, Neigung und Ausrichtung aller Teilflächen in einem Schritt
+        self.dachebenen = flächen_und_normalen(self.dachflächen.geometry.values)
         
         # Plotten
         self.ax = self.canvas.figure.subplots()
@@ -114,19 +104,11 @@ class RoofAreaPlot(QMainWindow):
 
                     # Text für das Objekt und Teilflächen erstellen
                     text = f"Gesamtfläche: {total_area:.2f} m²\n"
-                    for sub_idx, sub_row in sub_roofs.iterrows():
-                        geom = sub_row['geometry']
-                        if isinstance(geom, MultiPolygon):
-                            for poly in geom.geoms:
-                                normal, inclination, azimuth, area = calculate_normal_and_angles(poly)
-                                text += (f"Teilfläche: {area:.2f} m², "
-                                         f"Ausrichtung: {azimuth:.2f}°, "
-                                         f"Neigung: {inclination:.2f}°\n")
-                        else:
-                            normal, inclination, azimuth, area = calculate_normal_and_angles(geom)
-                            text += (f"Teilfläche: {area:.2f} m², "
-                                     f"Ausrichtung: {azimuth:.2f}°, "
-                                     f"Neigung: {inclination:.2f}°\n")
+                    positionen = self.dachflächen.index.get_indexer(sub_roofs.index)
+                    for _, ebene in self.dachebenen[self.dachebenen['Geometrie'].isin(positionen)].iterrows():
+                        text += (f"Teilfläche: {ebene['Fläche']:.2f} m², "
+                                 f"Ausrichtung: {ebene['Azimut']:.2f}°, "
+                                 f"Neigung: {ebene['Neigung']:.2f}°\n")
                     
                     # Neuen Text hinzufügen
                     self.text_annotation = plt.gcf().text(
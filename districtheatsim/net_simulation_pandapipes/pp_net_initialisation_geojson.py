@@ -4,9 +4,10 @@ import pandapipes as pp
 
 from heat_requirement import heat_requirement_VDI4655, heat_requirement_BDEW
 from net_simulation_pandapipes.utilities import create_controllers, correct_flow_directions, COP_WP
+from utilities.demand_matrix import DemandMatrix
 
 def initialize_geojson(vorlauf, ruecklauf, hast, erzeugeranlagen, calc_method, building_type, return_temperature, \
-                       supply_temperature, flow_pressure_pump, lift_pressure_pump, netconfiguration, pipetype, dT_RL, mass_flow_secondary_producers=0.5):
+                       supply_temperature, flow_pressure_pump, lift_pressure_pump, netconfiguration, pipetype, dT_RL, mass_flow_secondary_producers=0.5, TRY=None, dtype=np.float64):
         
     vorlauf = gpd.read_file(vorlauf, driver='GeoJSON')
     ruecklauf = gpd.read_file(ruecklauf, driver='GeoJSON')
@@ -33,25 +34,15 @@ def initialize_geojson(vorlauf, ruecklauf, hast, erzeugeranlagen, calc_method, b
 
     yearly_time_steps, waerme_gebaeude_ges_W, max_waerme_gebaeude_ges_W, supply_temperature_building_curve, \
     return_temperature_building_curve = generate_profiles_from_geojson(hast, building_type, calc_method, \
-                                                                            supply_temperature_buildings, return_temperature_buildings)
+                                                                            supply_temperature_buildings, return_temperature_buildings, TRY, dtype)
 
-    waerme_hast_ges_W = []
-    max_waerme_hast_ges_W = []
     if netconfiguration == "kaltes Netz":
         COP, _ = COP_WP(supply_temperature_buildings, return_temperature)
         print(f"COP dezentrale Wärmepumpen Gebäude: {COP}")
 
-        for waerme_gebaeude, leistung_gebaeude, cop in zip(waerme_gebaeude_ges_W, max_waerme_gebaeude_ges_W, COP):
-            strom_wp = waerme_gebaeude/cop
-            waerme_hast = waerme_gebaeude - strom_wp
-            waerme_hast_ges_W.append(waerme_hast)
-
-            stromleistung_wp = leistung_gebaeude/cop
-            waerme_leistung_hast = leistung_gebaeude - stromleistung_wp
-            max_waerme_hast_ges_W.append(waerme_leistung_hast)
-
-        waerme_hast_ges_W = np.array(waerme_hast_ges_W)
-        max_waerme_hast_ges_W = np.array(max_waerme_hast_ges_W)
+        # one COP per building
+        waerme_hast_ges_W = waerme_gebaeude_ges_W * (1 - 1 / COP)[:, np.newaxis]
+        max_waerme_hast_ges_W = np.asarray(max_waerme_gebaeude_ges_W) * (1 - 1 / COP)
 
     else:
         waerme_hast_ges_W = waerme_gebaeude_ges_W
@@ -63,7 +54,9 @@ def initialize_geojson(vorlauf, ruecklauf, hast, erzeugeranlagen, calc_method, b
     return net, yearly_time_steps, waerme_hast_ges_W, return_temperature, supply_temperature_buildings, return_temperature_buildings, \
         supply_temperature_building_curve, return_temperature_building_curve 
         
-def generate_profiles_from_geojson(gdf_heat_exchanger, building_type="HMF", calc_method="BDEW", max_supply_temperature=70, max_return_temperature=55):
+def generate_profiles_from_geojson(gdf_heat_exchanger, building_type="HMF", calc_method="BDEW", max_supply_temperature=70, max_return_temperature=55, TRY=None, dtype=np.float64):
+    # TRY: weather file for the load profiles, None uses the default file of the calculation methods
+    # the profiles are returned as DemandMatrix (buildings x time steps), dtype=np.float32 halves the memory of the unit profiles and of every materialized window
     ### define the heat requirement ###
     try:
         YEU_total_heat_kWh = gdf_heat_exchanger["Wärmebedarf"].values.astype(float)
@@ -71,10 +64,6 @@ def generate_profiles_from_geojson(gdf_heat_exchanger, building_type="HMF", calc
         print("Herauslesen des Wärmebedarfs aus geojson nicht möglich.")
         return None
 
-    total_heat_W = []
-    max_heat_requirement_W = []
-    yearly_time_steps = None
-
     # Assignment of building types to calculation methods
     building_type_to_method = {
         "EFH": "VDI4655",
@@ -95,54 +84,69 @@ def generate_profiles_from_geojson(gdf_heat_exchanger, building_type="HMF", calc
         "GHD": "BDEW",
     }
 
-    for idx, YEU in enumerate(YEU_total_heat_kWh):
-        if calc_method == "Datensatz":
-            try:
-                current_building_type = gdf_heat_exchanger.at[idx, "Gebäudetyp"]
-                current_calc_method = building_type_to_method.get(current_building_type, "StandardMethode")
-            except KeyError:
-                print("Gebäudetyp-Spalte nicht in gdf_HAST gefunden.")
-                current_calc_method = "StandardMethode"
-        else:
-            current_building_type = building_type
-            current_calc_method = calc_method
+    if calc_method == "Datensatz":
+        try:
+            building_types = gdf_heat_exchanger["Gebäudetyp"].values.astype(str)
+        except KeyError:
+            print("Gebäudetyp-Spalte nicht in gdf_HAST gefunden.")
+            building_types = np.full(len(YEU_total_heat_kWh), "")
+        calc_methods = np.array([building_type_to_method.get(current_building_type, "StandardMethode") for current_building_type in building_types])
+    else:
+        building_types = np.full(len(YEU_total_heat_kWh), building_type)
+        calc_methods = np.full(len(YEU_total_heat_kWh), calc_method)
+
+    # The normalized profile is the same for all buildings of one type, it is calculated once per group (unit profile for 1 kWh)
+    # and scaled with the yearly heat demand of the buildings, buildings without calculation method keep the factor 0
+    unit_profiles_W = []
+    profile_index = np.zeros(len(YEU_total_heat_kWh), dtype=int)
+    scale = np.zeros(len(YEU_total_heat_kWh))
+    max_heat_requirement_W = np.zeros(len(YEU_total_heat_kWh))
+    yearly_time_steps = None
+
+    groups = {}
+    for idx, key in enumerate(zip(calc_methods, building_types)):
+        groups.setdefault(key, []).append(idx)
+
+    for (current_calc_method, current_building_type), idx in groups.items():
+        idx = np.array(idx)
 
         # Heat demand calculation based on building type and calculation method
         if current_calc_method == "VDI4655":
-            YEU_heating_kWh, YEU_hot_water_kWh = YEU_total_heat_kWh * 0.8, YEU_total_heat_kWh * 0.2
-            heating, hot_water = YEU_heating_kWh[idx], YEU_hot_water_kWh[idx]
-            yearly_time_steps, electricity_kW, heating_kW, hot_water_kW, total_heat_kW, hourly_temperatures = heat_requirement_VDI4655.calculate(heating, hot_water, building_type=current_building_type)
+            yearly_time_steps, electricity_kW, heating_kW, hot_water_kW, unit_heat_kW, hourly_temperatures = heat_requirement_VDI4655.calculate(0.8, 0.2, building_type=current_building_type, TRY=TRY)
 
         elif current_calc_method == "BDEW":
-            yearly_time_steps, total_heat_kW, hourly_temperatures  = heat_requirement_BDEW.calculate(YEU, current_building_type, subtyp="03")
+            yearly_time_steps, unit_heat_kW, hourly_temperatures = heat_requirement_BDEW.calculate(1, current_building_type, subtyp="03", TRY=TRY)
 
-        total_heat_kW = np.where(total_heat_kW<0, 0, total_heat_kW)
-        total_heat_W.append(total_heat_kW * 1000)
-        max_heat_requirement_W.append(np.max(total_heat_kW * 1000))
+        else:
+            print(f"Keine Berechnungsmethode für Gebäudetyp {current_building_type}, der Wärmebedarf dieser Gebäude wird nicht berücksichtigt.")
+            continue
 
-    total_heat_W = np.array(total_heat_W)
-    max_heat_requirement_W = np.array(max_heat_requirement_W)
+        unit_heat_W = unit_heat_kW * 1000
+        if unit_profiles_W and len(unit_heat_W) != len(unit_profiles_W[0]):
+            raise ValueError("Die Lastprofile der Berechnungsmethoden haben unterschiedliche Zeitschritte und können nicht kombiniert werden.")
+        profile_index[idx] = len(unit_profiles_W)
+        unit_profiles_W.append(unit_heat_W)
 
-    # Calculation of the temperature curve based on the selected settings
-    supply_temperature_curve = []
-    return_temperature_curve = []
+        YEU = YEU_total_heat_kWh[idx]
+        scale[idx] = YEU
+        max_heat_requirement_W[idx] = np.maximum(np.where(YEU >= 0, YEU * np.max(unit_heat_W), YEU * np.min(unit_heat_W)), 0)
+
+    if not unit_profiles_W:
+        return None
+
+    total_heat_W = DemandMatrix(unit_profiles_W, profile_index, scale, untergrenze=0, dtype=dtype)
 
+    # Calculation of the temperature curve based on the selected settings
     # get slope of heat exchanger
     slope = -gdf_heat_exchanger["Steigung_Heizkurve"].values.astype(float)
 
     min_air_temperature = -12 # aka design temperature
 
-    for st, rt, s in zip(max_supply_temperature, max_return_temperature, slope):
-        # Calculation of the temperature curves for flow and return
-        st_curve = np.where(hourly_temperatures <= min_air_temperature, st, st + (s * (hourly_temperatures - min_air_temperature)))
-        rt_curve = np.where(hourly_temperatures <= min_air_temperature, rt, rt + (s * (hourly_temperatures - min_air_temperature)))
-        
-        supply_temperature_curve.append(st_curve)
-        return_temperature_curve.append(rt_curve)
-
-
-    supply_temperature_curve = np.array(supply_temperature_curve)
-    return_temperature_curve = np.array(return_temperature_curve)
+    # Calculation of the temperature curves for flow and return, buildings x time steps (one shared profile, slope as factor)
+    temperature_difference = np.where(hourly_temperatures <= min_air_temperature, 0, hourly_temperatures - min_air_temperature)
+    building_index = np.zeros(len(YEU_total_heat_kWh), dtype=int)
+    supply_temperature_curve = DemandMatrix(temperature_difference, building_index, slope, max_supply_temperature, dtype=dtype)
+    return_temperature_curve = DemandMatrix(temperature_difference, building_index, slope, max_return_temperature, dtype=dtype)
 
     return yearly_time_steps, total_heat_W, max_heat_requirement_W, supply_temperature_curve, return_temperature_curve
 
@@ -7,21 +7,25 @@ import pandas as pd
 import numpy as np
 
 from net_simulation_pandapipes.controllers import ReturnTemperatureController
+from utilities.demand_matrix import zeitfenster
 
 def update_const_controls(net, qext_w_profiles, time_steps, start, end):
-    for i, qext_w_profile in enumerate(qext_w_profiles):
-        df = pd.DataFrame(index=time_steps, data={f'qext_w_{i}': qext_w_profile[start:end]})
+    # only the calculated time window is taken from the profiles (DemandMatrix or array)
+    qext_w_window = zeitfenster(qext_w_profiles, start, end)
+    for i, qext_w_profile in enumerate(qext_w_window):
+        df = pd.DataFrame(index=time_steps, data={f'qext_w_{i}': qext_w_profile})
         data_source = DFData(df)
         for ctrl in net.controller.object.values:
             if isinstance(ctrl, ConstControl) and ctrl.element_index == i and ctrl.variable == 'qext_w':
                 ctrl.data_source = data_source
 
 def update_return_temperature_controller(net, return_temperature, time_steps, start, end):
+    return_temperature = zeitfenster(return_temperature, start, end)
     controller_count = 0
     for ctrl in net.controller.object.values:
         if isinstance(ctrl, ReturnTemperatureController) :
             # Create the DataFrame for the return temperature
-            df_return_temp = pd.DataFrame(index=time_steps, data={'return_temperature': return_temperature[controller_count][start:end]})
+            df_return_temp = pd.DataFrame(index=time_steps, data={'return_temperature': return_temperature[controller_count]})
             data_source_return_temp = DFData(df_return_temp)
 
             ctrl.data_source = data_source_return_temp
@@ -71,11 +75,11 @@ def thermohydraulic_time_series_net(net, yearly_time_steps, qext_w_profiles, sta
     yearly_time_steps = yearly_time_steps[start:end]
 
     # Update the ConstControl
-    time_steps = range(0, len(qext_w_profiles[0][start:end]))
+    time_steps = range(0, len(yearly_time_steps))
     update_const_controls(net, qext_w_profiles, time_steps, start, end)
 
     # If return_temperature data exists, update corresponding ReturnTemperatureController
-    if return_temperature is not None and isinstance(return_temperature, np.ndarray) and return_temperature.ndim == 2:
+    if return_temperature is not None and getattr(return_temperature, "ndim", 0) == 2:
         update_return_temperature_controller(net, return_temperature, time_steps, start, end)
 
     # If supply_temperature data exists, update corresponding ReturnTemperatureController
@@ -124,6 +128,25 @@ def calculate_results(net, net_results, cp_kJ_kgK=4.2):
 
     return pump_results
 
+def producer_feed_in(pump_results):
+    # Summe der Einspeisung aller Pumpen sowie Vor- und Rücklauftemperatur der Haupteinspeisung (Eingangsdaten für den Erzeugermix)
+    qext_values = []
+    flow_temp, return_temp = None, None
+    for pump_type, pumps in pump_results.items():
+        for idx, pump_data in pumps.items():
+            if 'qext_kW' in pump_data:
+                qext_values.append(pump_data['qext_kW'])
+            else:
+                print(f"Keine qext_kW Daten für {pump_type} Pumpe {idx}")
+
+            if pump_type == "Heizentrale Haupteinspeisung":
+                flow_temp = pump_data['flow_temp']
+                return_temp = pump_data['return_temp']
+
+    qext_kW = np.sum(np.array(qext_values), axis=0) if qext_values else np.array([])
+
+    return qext_kW, flow_temp, return_temp
+
 def save_results_csv(time_steps, total_heat_KW, pump_results, filename):
 
     # Converting the arrays into a Pandas DataFrame
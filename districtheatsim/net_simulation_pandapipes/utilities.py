@@ -5,7 +5,6 @@ import numpy as np
 import pandas as pd
 import geopandas as gpd
 from shapely.geometry import LineString
-from scipy.interpolate import RegularGridInterpolator
 
 import pandapipes as pp
 from pandapipes.control.run_control import run_control
@@ -14,6 +13,7 @@ from pandapower.timeseries import DFData
 from pandapower.control.controller.const_control import ConstControl
 
 from net_simulation_pandapipes.controllers import ReturnTemperatureController, WorstPointPressureController
+from utilities.cop_map import get_cop_map
 
 def get_resource_path(relative_path):
     """ Get the absolute path to the resource, works for dev and for PyInstaller """
@@ -27,29 +27,22 @@ def get_resource_path(relative_path):
     return os.path.join(base_path, relative_path)
 
 def COP_WP(VLT_L, QT):
-    # Interpolation formula for the COP
-    values = np.genfromtxt(get_resource_path('heat_generators\Kennlinien WP.csv'), delimiter=';')
-    row_header = values[0, 1:]  # Vorlauftemperaturen
-    col_header = values[1:, 0]  # Quelltemperaturen
-    values = values[1:, 1:]
-    f = RegularGridInterpolator((col_header, row_header), values, method='linear')
+    # Interpolation of the COP, the characteristic map is loaded only once
+    # VLT_L and QT may also be matrices (e.g. buildings x time steps) or broadcastable against each other
+    f = get_cop_map(get_resource_path('heat_generators\Kennlinien WP.csv'))
 
     # Technical limit of the heat pump is a temperature range of 75 °C
     VLT_L = np.minimum(VLT_L, 75+QT)
     VLT_L = np.maximum(VLT_L, 35)
 
-    # Check whether QT is a number or an array
-    if np.isscalar(QT):
-        # If QT is a number, we create an array with that number
-        QT_array = np.full_like(VLT_L, QT)
-    else:
-        # If QT is already an array, we check if it has the same length as VLT_L
-        if len(QT) != len(VLT_L):
-            raise ValueError("QT muss entweder eine einzelne Zahl oder ein Array mit der gleichen Länge wie VLT_L sein.")
-        QT_array = QT
+    # Check whether QT is a number or an array matching VLT_L
+    try:
+        np.broadcast_shapes(np.shape(QT), np.shape(VLT_L))
+    except ValueError:
+        raise ValueError("QT muss entweder eine einzelne Zahl oder ein Array mit der gleichen Länge wie VLT_L sein.")
 
     # Calculation of COP_L
-    COP_L = f(np.column_stack((QT_array, VLT_L)))
+    COP_L = f(QT, VLT_L)
 
     return COP_L, VLT_L
 
@@ -0,0 +1,37 @@
+# Erstellt von Jonas Pfeiffer
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import numpy as np
+import pandas as pd
+
+from utilities.climate_ensemble import TRY_Dateien, Klimaensemble
+from heat_generators import heat_generator_classes
+
+# Klimaensemble ohne Netz: eine Zeile je Wetterdatei, seriell und parallel gleiche Ergebnisse
+def test_klimaensemble(max_workers=2):
+    dateien = TRY_Dateien()
+    assert set(dateien) == {"TRY2015_Jahr", "TRY2015_Somm", "TRY2015_Wint", "TRY2045_Jahr", "TRY2045_Somm", "TRY2045_Wint"}, dateien
+    assert all(os.path.isfile(datei) for datei in dateien.values())
+
+    gdf_HAST = pd.DataFrame({"Wärmebedarf": [80000, 120000, 60000], "Steigung_Heizkurve": [0.6, 0.6, 0.6], "VLT_max": [70, 70, 70], "RLT_max": [55, 55, 55]})
+    tech_order = [heat_generator_classes.BiomassBoiler(name="Biomassekessel", P_BMK=30, Größe_Holzlager=20), heat_generator_classes.GasBoiler(name="Gaskessel")]
+    COP_data = 'C:/Users/jp66tyda/heating_network_generation/heat_generators/Kennlinien WP.csv'
+
+    ergebnisse = {}
+    for workers in [1, max_workers]:
+        tabelle, general_results = Klimaensemble(gdf_HAST, tech_order, COP_data, 70, 150, 60, "Nein", TRY_dateien=dateien, max_workers=workers)
+        assert len(tabelle) == len(dateien) and set(tabelle.index) == set(dateien), tabelle.index
+        assert set(general_results) == set(dateien)
+        assert np.allclose(tabelle["Wärmebedarf_Gebäude_MWh"], 260, rtol=1e-6)
+        ergebnisse[workers] = tabelle
+
+    seriell, parallel = ergebnisse[1], ergebnisse[max_workers]
+    np.testing.assert_allclose(parallel.loc[seriell.index, "WGK_Gesamt_€/MWh"], seriell["WGK_Gesamt_€/MWh"])
+    print(seriell[["Witterung", "Mitteltemperatur_°C", "Heizlast_Gebäude_kW", "WGK_Gesamt_€/MWh"]])
+
+# die Worker-Prozesse des Klimaensembles importieren dieses Modul unter Windows erneut
+if __name__ == '__main__':
+    test_klimaensemble()
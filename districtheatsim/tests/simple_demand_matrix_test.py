@@ -0,0 +1,105 @@
+# Erstellt von Jonas Pfeiffer
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utilities.demand_matrix import DemandMatrix, AbgeleiteteMatrix, zeitfenster
+
+import numpy as np
+
+def beispielmatrizen(dtype=np.float64):
+    # Matrizen mit und ohne Untergrenze, negativen Faktoren und Offsets, mehr Gebäude als eine Blockgröße
+    rng = np.random.default_rng(1)
+    profile = rng.normal(size=(5, 96))
+    index = rng.integers(0, 5, size=600)
+    scale = rng.uniform(-2, 2, size=600)
+    offset = rng.uniform(-1, 1, size=600)
+    return {
+        "ohne Untergrenze": DemandMatrix(profile, index, scale, offset, dtype=dtype),
+        "mit Untergrenze": DemandMatrix(profile, index, np.abs(scale), offset, untergrenze=0, dtype=dtype),
+        "ein Gebäude": DemandMatrix(profile[0], [0], 2.0, 1.0, dtype=dtype),
+    }
+
+def test_demand_matrix_numpy(dtype=np.float64):
+    # alle Ergebnisse müssen denen der vollständigen Matrix entsprechen
+    for name, M in beispielmatrizen(dtype).items():
+        A = np.asarray(M)
+        n = len(M)
+        je_gebäude = np.linspace(-1, 1, n)[:, np.newaxis]
+        # Summen werden in float64 berechnet, bei float32 weichen vollständige Matrix und Rechenoperationen um Rundungsfehler ab
+        toleranz = {"rtol": 1e-5, "atol": 1e-3} if dtype == np.float32 else {}
+
+        # Zugriffe
+        assert np.array_equal(M[0], A[0]), name
+        assert np.array_equal(M[:, 10:20], A[:, 10:20]), name
+        assert np.array_equal(M[[0, n - 1], 5], A[[0, n - 1], 5]), name
+        assert np.array_equal(zeitfenster(M, 3, 7), A[:, 3:7]), name
+        assert np.array_equal(np.array(list(M)), A), name
+
+        # Reduktionen
+        for axis in [None, 0, 1, -1]:
+            assert np.array_equal(np.max(M, axis=axis), np.max(A, axis=axis)), (name, axis)
+            assert np.array_equal(np.min(M, axis=axis), np.min(A, axis=axis)), (name, axis)
+            assert np.allclose(np.sum(M, axis=axis), np.sum(A, axis=axis, dtype=float), **toleranz), (name, axis)
+            assert np.allclose(np.mean(M, axis=axis), np.mean(A, axis=axis, dtype=float), **toleranz), (name, axis)
+        assert np.allclose(np.sum(M, axis=0, keepdims=True), np.sum(A, axis=0, keepdims=True, dtype=float), **toleranz), name
+        assert np.array_equal(M.max(axis=1), A.max(axis=1)), name
+
+        # Vergleiche
+        for wert in [0, 0.5, je_gebäude, A[0], A]:
+            assert np.array_equal(M == wert, A == wert), name
+            assert np.array_equal(M != wert, A != wert), name
+            assert np.array_equal(M < wert, A < wert), name
+            assert np.array_equal(M <= wert, A <= wert), name
+            assert np.array_equal(M > wert, A > wert), name
+            assert np.array_equal(M >= wert, A >= wert), name
+            assert np.array_equal(np.asarray(wert) < M, np.asarray(wert) < A), name
+        assert np.array_equal(M == M, A == A), name
+        assert np.array_equal(np.greater(M, 0), np.greater(A, 0)), name
+
+        # Negation und Rechenoperationen
+        for ergebnis, erwartet in [(-M, -A), (+M, A), (abs(M), np.abs(A)), (np.negative(M), -A),
+                                   (M * 2, A * 2), (2 * M, 2 * A), (M * je_gebäude, A * je_gebäude), (je_gebäude * M, je_gebäude * A),
+                                   (M + je_gebäude, A + je_gebäude), (je_gebäude - M, je_gebäude - A), (M - 1, A - 1), (1 - M, 1 - A),
+                                   (M / 4, A / 4), (np.multiply(M, 3), A * 3), (np.subtract(je_gebäude, M), je_gebäude - A),
+                                   (M * A[0], A * A[0]), (M + M, A + A), (np.maximum(M, 0), np.maximum(A, 0)), (np.exp(M), np.exp(A))]:
+            assert np.allclose(np.asarray(ergebnis), erwartet, **toleranz), name
+
+        # Zahlen und Werte je Gebäude bleiben kompakt (bei Untergrenze nur positive Faktoren), Negation ohne Untergrenze ebenso
+        assert isinstance(M * np.abs(je_gebäude), DemandMatrix) and isinstance(M - 1, DemandMatrix) and isinstance(np.multiply(M, 3), DemandMatrix), name
+        assert isinstance(-M, DemandMatrix) == (M.untergrenze is None), name
+
+    print("DemandMatrix entspricht der vollständigen Matrix.")
+
+def test_abgeleitete_matrix():
+    # z.B. Strombedarf aus Wärmebedarf (DemandMatrix) und zeitabhängigem COP
+    M = beispielmatrizen()["mit Untergrenze"]
+    temperatur = DemandMatrix(np.linspace(0, 10, 96), np.zeros(len(M), dtype=int), 1.0, np.linspace(30, 50, len(M)))
+    cop = AbgeleiteteMatrix(lambda temperatur, quelle: 2 + (temperatur - quelle) / 20, temperatur, 10.0)
+    strom = AbgeleiteteMatrix(lambda wärme, cop: wärme / cop, M, cop)
+
+    erwartet = np.asarray(M) / (2 + (np.asarray(temperatur) - 10) / 20)
+    assert strom.shape == M.shape
+    assert np.allclose(np.asarray(strom), erwartet)
+    assert np.allclose(strom[:, 10:20], erwartet[:, 10:20])
+    assert np.allclose(strom[3], erwartet[3])
+    assert np.allclose(strom[[1, 2], 5], erwartet[[1, 2], 5])
+    assert np.allclose(zeitfenster(strom, 0, 8), erwartet[:, 0:8])
+    for axis in [None, 0, 1]:
+        assert np.allclose(np.sum(strom, axis=axis), np.sum(erwartet, axis=axis))
+        assert np.allclose(np.max(strom, axis=axis), np.max(erwartet, axis=axis))
+    assert np.array_equal(strom > 0.1, erwartet > 0.1)
+    assert np.allclose(np.asarray(M - strom), np.asarray(M) - erwartet)
+
+    # Werte je Gebäude ([Gebäude x 1]) als Eingang
+    rücklauf = np.linspace(5, 15, len(M))[:, np.newaxis]
+    cop_je_gebäude = AbgeleiteteMatrix(lambda temperatur, quelle: 2 + (temperatur - quelle) / 20, temperatur, rücklauf)
+    assert np.allclose(np.asarray(cop_je_gebäude), 2 + (np.asarray(temperatur) - rücklauf) / 20)
+    assert np.allclose(cop_je_gebäude[:, 7], 2 + (np.asarray(temperatur)[:, 7] - rücklauf[:, 0]) / 20)
+
+    print("AbgeleiteteMatrix entspricht der vollständigen Matrix.")
+
+test_demand_matrix_numpy()
+test_demand_matrix_numpy(dtype=np.float32)
+test_abgeleitete_matrix()
@@ -4,7 +4,7 @@ import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from heat_generators import Solarthermie, heat_generator_classes
+from heat_generators import Photovoltaik, Solarthermie, heat_generator_classes, monte_carlo, rolling_horizon, typtage
 from utilities.test_reference_year import import_TRY
 
 import numpy as np
@@ -144,6 +144,39 @@ def test_chp():
     WGK= chp.WGK(Wärmemenge_BHKW, Strommenge_BHKW, Brennstoffbedarf_BHKW, Brennstoffpreis, Strompreis, q, r, T, BEW)
     print(f"Wärmegestehungskosten BHKW: {WGK:.2f} €/MWh")
 
+def test_chp_storage():
+    chp = heat_generator_classes.CHPStorage(name="BHKW_Speicher", th_Leistung_BHKW=100, Speichervolumen_BHKW=20, spez_Investitionskosten_GBHKW=1500, 
+                                            spez_Investitionskosten_Speicher=750, min_Laufzeit=2, min_Stillstand=1, engine="numba")
+
+    # Lastgang in Viertelstunden
+    Last_L = np.random.randint(50, 400, 35040).astype("float")
+    duration = 0.25
+
+    Wärmeleistung_BHKW_L, el_Leistung_BHKW_L, Wärmemenge_BHKW, Strommenge_BHKW, Brennstoffbedarf_BHKW = chp.BHKW(Last_L, duration)
+    print(f"Wärmemenge BHKW mit Speicher: {Wärmemenge_BHKW:.2f} MWh, Strommenge: {Strommenge_BHKW:.2f} MWh, Brennstoffbedarf: {Brennstoffbedarf_BHKW:.2f} MWh, Starts: {chp.Anzahl_Starts}, maximaler Speicherfüllstand: {max(chp.Speicherfüllstand_L):.1f} kWh")
+
+    WGK_BHKW = chp.WGK(Wärmemenge_BHKW, Strommenge_BHKW, Brennstoffbedarf_BHKW, 70, 150, 1.05, 1.03, 20, "Nein", 45)
+    print(f"Wärmegestehungskosten BHKW mit Speicher: {WGK_BHKW:.2f} €/MWh")
+
+    # Mindestlaufzeit, Mindeststillstandszeit und Speichergrenzen bei einer Last, bei der das BHKW häufig taktet
+    Last_L = np.random.default_rng(1).uniform(20, 150, 35040)
+    for engine in ["python", "numba"]:
+        chp = heat_generator_classes.CHPStorage(name="BHKW_Speicher", th_Leistung_BHKW=100, Speichervolumen_BHKW=5, min_Laufzeit=4, min_Stillstand=3, engine=engine)
+        Wärmeleistung_BHKW_L = chp.BHKW(Last_L, duration)[0]
+
+        assert np.all(chp.Speicherfüllstand_L >= 0) and np.all(chp.Speicherfüllstand_L <= chp.Speicherkapazität + 1e-9)
+        assert np.all(Wärmeleistung_BHKW_L <= Last_L + 1e-9)
+
+        # Länge der Lauf- und Stillstandsphasen in Zeitschritten, die letzte Phase kann durch das Jahresende verkürzt sein
+        an = chp.Erzeugung_BHKW_L > 0
+        wechsel = np.flatnonzero(np.diff(an)) + 1
+        grenzen = np.concatenate(([0], wechsel, [len(an)]))
+        längen, zustände = np.diff(grenzen)[:-1], an[grenzen[:-2]]
+        assert np.all(längen[zustände] >= 4 / duration), "Mindestlaufzeit unterschritten"
+        assert np.all(längen[~zustände] >= 3 / duration), "Mindeststillstandszeit unterschritten"
+        assert chp.Anzahl_Starts == np.sum(an[wechsel]) + an[0] and chp.Anzahl_Starts > 10
+    print(f"BHKW mit Speicher: {chp.Anzahl_Starts} Starts, Mindestlauf- und -stillstandszeiten eingehalten")
+
 def test_solar_thermal():
     solarThermal = heat_generator_classes.SolarThermal(name="STA", bruttofläche_STA=200, vs=20, Typ="Vakuumröhrenkollektor", kosten_speicher_spez=750, kosten_fk_spez=430, kosten_vrk_spez=590, Tsmax=90, Longitude=-14.4222, 
                  STD_Longitude=-15, Latitude=51.1676, East_West_collector_azimuth_angle=0, Collector_tilt_angle=36, Tm_rl=60, Qsa=0, Vorwärmung_K=8, DT_WT_Solar_K=5, DT_WT_Netz_K=5)
@@ -188,6 +221,40 @@ def test_solar_thermal():
     WGK = solarThermal.calc_WGK(Wärmemenge, q, r, T, BEW)
     print(f"Wärmegestehungskosten Solarthermie: {WGK:.2f} €/MWh")
 
+def test_solar_thermal_engine():
+    # Vergleich des reinen Python-Rechenkerns mit dem kompilierten Rechenkern (numba)
+    Last_L = np.random.randint(50, 400, 8760)
+    VLT_L, RLT_L = np.full(8760, 80), np.full(8760, 55)
+
+    TRY = import_TRY("C:/Users/jp66tyda/heating_network_generation/heat_requirement/TRY_511676144222/TRY2015_511676144222_Jahr.dat")
+    time_steps = np.arange(np.datetime64('2019-01-01'), np.datetime64('2020-01-01', 'D'), dtype='datetime64[h]')
+
+    Ergebnis_python = Solarthermie.Berechnung_STA(200, 20, "Vakuumröhrenkollektor", Last_L, VLT_L, RLT_L, TRY, time_steps, 0, 8760, 1, engine="python")
+    Ergebnis_numba = Solarthermie.Berechnung_STA(200, 20, "Vakuumröhrenkollektor", Last_L, VLT_L, RLT_L, TRY, time_steps, 0, 8760, 1, engine="numba")
+
+    print(f"Wärmemenge Solarthermie Python: {Ergebnis_python[0]:.4f} MWh, numba: {Ergebnis_numba[0]:.4f} MWh")
+    for Werte_python, Werte_numba in zip(Ergebnis_python[1:], Ergebnis_numba[1:]):
+        assert np.allclose(Werte_python, Werte_numba, rtol=1e-9, atol=1e-9)
+
+def test_solar_thermal_batch():
+    # Mehrere Auslegungsvarianten (Bruttofläche, Speichervolumen) in einem Aufruf
+    Last_L = np.random.randint(50, 400, 8760)
+    VLT_L, RLT_L = np.full(8760, 80), np.full(8760, 55)
+
+    TRY = import_TRY("C:/Users/jp66tyda/heating_network_generation/heat_requirement/TRY_511676144222/TRY2015_511676144222_Jahr.dat")
+    time_steps = np.arange(np.datetime64('2019-01-01'), np.datetime64('2020-01-01', 'D'), dtype='datetime64[h]')
+
+    Bruttoflächen = np.array([100, 200, 400, 800])
+    Speichervolumen = np.array([10, 20, 40, 80])
+
+    Wärmemengen, Wärmeleistung_L, Speicherladung_L, Speicherfüllstand_L = Solarthermie.Berechnung_STA_batch(Bruttoflächen, Speichervolumen, "Flachkollektor", Last_L, VLT_L, RLT_L, 
+                                                                                                          TRY, time_steps, 0, 8760, 1)
+
+    for i, (Bruttofläche, VS) in enumerate(zip(Bruttoflächen, Speichervolumen)):
+        Wärmemenge = Solarthermie.Berechnung_STA(Bruttofläche, VS, "Flachkollektor", Last_L, VLT_L, RLT_L, TRY, time_steps, 0, 8760, 1)[0]
+        print(f"Bruttofläche {Bruttofläche} m², Speicher {VS} m³: {Wärmemengen[i]:.2f} MWh (Einzelberechnung: {Wärmemenge:.2f} MWh)")
+        assert np.isclose(Wärmemengen[i], Wärmemenge)
+
 def test_waste_heat_pump():
     wasteHeatPump = heat_generator_classes.WasteHeatPump(name="Abwärme", Kühlleistung_Abwärme=50, Temperatur_Abwärme=30, spez_Investitionskosten_Abwärme=500, spezifische_Investitionskosten_WP=1000)
     
@@ -267,6 +334,11 @@ def test_geothermal_heat_pump():
     Wärmemenge, Strombedarf, Wärmeleistung_L, el_Leistung_Geothermie_L = geothermalHeatPump.Geothermie(Last_L, VLT_L, COP_data, duration)
     print(f"Wärmemenge Geothermie: {Wärmemenge:.2f} MWh, Strombedarf Geothermie: {Strombedarf:.2f} MWh, Wärmeleistung Geothermie: {Wärmeleistung_L} kW, elektrische Leistung Geothermie: {el_Leistung_Geothermie_L} kW")
 
+    # Variation des Sondenfeldes in einem Aufruf
+    Flächen, Bohrtiefen = np.meshgrid(np.linspace(100, 5000, 50), np.linspace(50, 400, 36))
+    batch_results = geothermalHeatPump.Geothermie_batch(Last_L, VLT_L, COP_data, duration, Flächen, Bohrtiefen)
+    print(f"Wärmemenge Geothermie Sondenfeld-Variation: {batch_results['Wärmemenge'].min():.2f} bis {batch_results['Wärmemenge'].max():.2f} MWh")
+
     Strompreis = 150 # €/MWh
     q = 1.05
     r = 1.03
@@ -277,7 +349,7 @@ def test_geothermal_heat_pump():
     WGK = geothermalHeatPump.WGK(geothermalHeatPump.max_Wärmeleistung, Wärmemenge, Strombedarf, geothermalHeatPump.spez_Investitionskosten_Erdsonden, Strompreis, q, r, T, BEW)
     print(f"Wärmegestehungskosten Geothermie: {WGK:.2f} €/MWh")
 
-def test_berechnung_erzeugermix(optimize=False, plot=True):
+def test_berechnung_erzeugermix(optimize=False, plot=True, unsicherheit=False, strommarkt=False, anzahl_typtage=None, mehrstufig=False):
     solarThermal = heat_generator_classes.SolarThermal(name="Solarthermie", bruttofläche_STA=200, vs=20, Typ="Vakuumröhrenkollektor", kosten_speicher_spez=800, kosten_vrk_spez=500)
     bBoiler = heat_generator_classes.BiomassBoiler(name="Biomassekessel", P_BMK=150, Größe_Holzlager=20, spez_Investitionskosten=200, spez_Investitionskosten_Holzlager=400)
     gBoiler = heat_generator_classes.GasBoiler(name="Gaskessel", spez_Investitionskosten=30)  # Angenommen, GasBoiler benötigt keine zusätzlichen Eingaben
@@ -331,13 +403,39 @@ def test_berechnung_erzeugermix(optimize=False, plot=True):
     preissteigerungsrate = 3 # %
     betrachtungszeitraum = 20 # Jahre
 
-    if optimize == True:
+    if optimize == True and anzahl_typtage is not None:
+        tech_order, validierung = typtage.optimize_mix_typtage(tech_order, initial_data, start, end, TRY, COP_data, Gaspreis, Strompreis, Holzpreis, BEW, \
+                                            kapitalzins, preissteigerungsrate, betrachtungszeitraum, 45, anzahl_typtage=anzahl_typtage, seed=1)
+        print(f"Aggregationsfehler Last: {validierung['Fehler']['Last']}")
+    elif optimize == True and mehrstufig == True:
+        tech_order, stufen = heat_generator_classes.optimize_mix_mehrstufig(tech_order, initial_data, start, end, TRY, COP_data, Gaspreis, Strompreis, Holzpreis, BEW, \
+                                            kapitalzins, preissteigerungsrate, betrachtungszeitraum, 45, Stufen=(24, 1))
+        for stufe in stufen:
+            print(f"Auflösung {stufe['Auflösung']} h: {stufe['nit']} Iterationen, {stufe['Zeit']:.1f} s")
+    elif optimize == True:
         tech_order = heat_generator_classes.optimize_mix(tech_order, initial_data, start, end, TRY, COP_data, Gaspreis, Strompreis, Holzpreis, BEW, \
                                             kapitalzins=kapitalzins, preissteigerungsrate=preissteigerungsrate, betrachtungszeitraum=betrachtungszeitraum)
         
     general_results = heat_generator_classes.Berechnung_Erzeugermix(tech_order, initial_data, start, end, TRY, COP_data, Gaspreis, Strompreis, Holzpreis, BEW, kapitalzins=kapitalzins, preissteigerungsrate=preissteigerungsrate, betrachtungszeitraum=betrachtungszeitraum)
     print(general_results)
 
+    if unsicherheit == True:
+        verteilungen = {"Gaspreis": monte_carlo.normalverteilung(Gaspreis, 15, minimum=0),
+                        "Holzpreis": monte_carlo.dreiecksverteilung(40, Holzpreis, 90),
+                        "kapitalzins": monte_carlo.gleichverteilung(2, 8),
+                        "Solarthermie.kosten_vrk_spez": monte_carlo.normalverteilung(500, 50)}
+        mc_results = monte_carlo.Monte_Carlo_WGK(tech_order, general_results, verteilungen, Gaspreis, Strompreis, Holzpreis, BEW, kapitalzins, preissteigerungsrate, \
+                                                 betrachtungszeitraum, anzahl=10000, seed=1)
+        for tech, WGK_Perzentile in zip(mc_results['techs'], mc_results['WGK_Perzentile']):
+            print(f"{tech}: Wärmegestehungskosten (5/50/95 %): {WGK_Perzentile} €/MWh")
+        print(f"Gesamt: Wärmegestehungskosten (5/50/95 %): {mc_results['WGK_Gesamt_Perzentile']} €/MWh")
+
+    if strommarkt == True:
+        Strompreis_L = rolling_horizon.Strompreise_einlesen('C:/Users/jp66tyda/heating_network_generation/currently_not_used/Strompreise_day_ahead_2023.csv')
+        dispatch_results = rolling_horizon.Rolling_Horizon_Dispatch(tech_order, general_results, COP_data, Strompreis_L, Gaspreis, Holzpreis, Fenster=48, Übernahme=24)
+        print(f"Wärmemengen bei Einsatz nach Day-Ahead-Preisen: {dict(zip(dispatch_results['techs'], dispatch_results['Wärmemengen']))} MWh")
+        print(f"Variable Kosten: {dispatch_results['Kosten_variabel']:.0f} €, mittlere Lösungszeit je Fenster: {np.mean([lösung['Lösungszeit'] for lösung in dispatch_results['Lösungen']]):.3f} s")
+
     if plot == True:
         figure1 = plt.figure()
         figure2 = plt.figure()
@@ -347,6 +445,159 @@ def test_berechnung_erzeugermix(optimize=False, plot=True):
 
         plt.show()
 
+# Serielle und parallele Optimierung müssen vom selben Startpunkt dasselbe Optimum liefern
+def test_optimize_mix_parallel(max_workers=4):
+    def erzeuger():
+        solarThermal = heat_generator_classes.SolarThermal(name="Solarthermie", bruttofläche_STA=200, vs=20, Typ="Vakuumröhrenkollektor", kosten_speicher_spez=800, kosten_vrk_spez=500)
+        bBoiler = heat_generator_classes.BiomassBoiler(name="Biomassekessel", P_BMK=150, Größe_Holzlager=20, spez_Investitionskosten=200, spez_Investitionskosten_Holzlager=400)
+        gBoiler = heat_generator_classes.GasBoiler(name="Gaskessel", spez_Investitionskosten=30)
+        gCHP = heat_generator_classes.CHP(name="BHKW", th_Leistung_BHKW=50, spez_Investitionskosten_GBHKW=1500)
+        geothermalHeatPump = heat_generator_classes.Geothermal(name="Geothermie", Fläche=200, Bohrtiefe=100, Temperatur_Geothermie=10, Abstand_Sonden=10, spez_Bohrkosten=100, spez_Entzugsleistung=45, Vollbenutzungsstunden=2400, spezifische_Investitionskosten_WP=1000)
+        return [solarThermal, gCHP, geothermalHeatPump, bBoiler, gBoiler]
+
+    Last_L = np.random.default_rng(1).integers(50, 400, 8760).astype("float")
+    time_steps = np.arange(np.datetime64('2019-01-01'), np.datetime64('2020-01-01', 'D'), dtype='datetime64[h]')
+    initial_data = time_steps, Last_L, np.full(8760, 80), np.full(8760, 55)
+
+    TRY = import_TRY("C:/Users/jp66tyda/heating_network_generation/heat_requirement/TRY_511676144222/TRY2015_511676144222_Jahr.dat")
+    COP_data = np.genfromtxt('C:/Users/jp66tyda/heating_network_generation/heat_generators/Kennlinien WP.csv', delimiter=';')
+    args = (initial_data, 0, 8760, TRY, COP_data, 70, 150, 60, "Nein", 5, 3, 20, 45)
+
+    ergebnisse = {}
+    for parallel in [False, True]:
+        tech_order = heat_generator_classes.optimize_mix(erzeuger(), *args, parallel=parallel, max_workers=max_workers)
+        assert tech_order is not None, "Optimierung nicht erfolgreich"
+        general_results = heat_generator_classes.Berechnung_Erzeugermix(tech_order, *args[:9], kapitalzins=5, preissteigerungsrate=3, betrachtungszeitraum=20, stundensatz=45)
+        ergebnisse[parallel] = [tech.name for tech in tech_order], heat_generator_classes.optimierungsvariablen(tech_order)[0], general_results["WGK_Gesamt"]
+
+    (namen_seriell, werte_seriell, WGK_seriell), (namen_parallel, werte_parallel, WGK_parallel) = ergebnisse[False], ergebnisse[True]
+    assert namen_seriell == namen_parallel, (namen_seriell, namen_parallel)
+    np.testing.assert_allclose(werte_parallel, werte_seriell, rtol=1e-9)
+    np.testing.assert_allclose(WGK_parallel, WGK_seriell, rtol=1e-9)
+    print(f"Seriell und parallel: {WGK_seriell:.2f} €/MWh mit {namen_seriell}")
+
+# Typtage: Gewichte entsprechen der Anzahl der Tage, der Spitzenlasttag bleibt als eigener Typtag erhalten
+def test_typtage(anzahl_typtage=12):
+    rng = np.random.default_rng(1)
+    Tage = np.arange(365)
+    # Jahresgang mit Tagesgang und einem deutlichen Spitzenlasttag
+    Last_L = (200 + 100 * np.cos(Tage / 365 * 2 * np.pi))[:, None] * (1 + 0.3 * np.sin(np.arange(24) / 24 * 2 * np.pi))[None, :]
+    Last_L = (Last_L + rng.uniform(0, 20, Last_L.shape)).ravel()
+    Last_L[40 * 24 + 8] = 1000
+    time_steps = np.arange(np.datetime64('2019-01-01'), np.datetime64('2020-01-01', 'D'), dtype='datetime64[h]')
+    initial_data = time_steps, Last_L, np.full(8760, 80), np.full(8760, 55)
+    TRY = import_TRY("C:/Users/jp66tyda/heating_network_generation/heat_requirement/TRY_511676144222/TRY2015_511676144222_Jahr.dat")
+
+    ergebnis = typtage.Typtage(initial_data, TRY, 0, 8760, anzahl_typtage, seed=1)
+    assert len(ergebnis["Tage"]) == anzahl_typtage and np.all(np.diff(ergebnis["Tage"]) > 0)
+    assert np.sum(ergebnis["Gewichte"]) == 365 and np.all(ergebnis["Gewichte"] >= 1)
+    assert np.array_equal(np.bincount(ergebnis["Zuordnung"], minlength=anzahl_typtage), ergebnis["Gewichte"])
+    Spitze = list(ergebnis["Tage"]).index(40)
+    assert ergebnis["Gewichte"][Spitze] == 1 and ergebnis["Zuordnung"][40] == Spitze
+    assert np.array_equal(ergebnis["Tage"], typtage.Typtage(initial_data, TRY, 0, 8760, anzahl_typtage, seed=1)["Tage"])
+
+    # k-Medoide findet drei deutlich getrennte Gruppen
+    punkte = np.concatenate([np.full(5, 0.0), np.full(4, 10.0), np.full(3, 20.0)]) + np.tile([0, 0.1, -0.1, 0.2, -0.2], 3)[:12]
+    medoide, zuordnung = typtage.k_medoide(np.abs(punkte[:, None] - punkte[None, :]), 3, np.random.default_rng(1))
+    assert sorted(np.bincount(zuordnung, minlength=3)) == [3, 4, 5]
+    print(f"Typtage: {ergebnis['Tage']}, Gewichte: {ergebnis['Gewichte']}")
+
+# Monte-Carlo-Auswertung: reproduzierbar mit seed, geordnete Perzentile, ohne Streuung gleich der deterministischen Berechnung
+def test_monte_carlo():
+    Last_L = np.random.default_rng(1).integers(50, 400, 8760).astype("float")
+    time_steps = np.arange(np.datetime64('2019-01-01'), np.datetime64('2020-01-01', 'D'), dtype='datetime64[h]')
+    initial_data = time_steps, Last_L, np.full(8760, 80), np.full(8760, 55)
+
+    TRY = import_TRY("C:/Users/jp66tyda/heating_network_generation/heat_requirement/TRY_511676144222/TRY2015_511676144222_Jahr.dat")
+    COP_data = np.genfromtxt('C:/Users/jp66tyda/heating_network_generation/heat_generators/Kennlinien WP.csv', delimiter=';')
+    Gaspreis, Strompreis, Holzpreis = 70, 150, 60
+
+    tech_order = [heat_generator_classes.CHP(name="BHKW", th_Leistung_BHKW=50), 
+                  heat_generator_classes.BiomassBoiler(name="Biomassekessel", P_BMK=150, Größe_Holzlager=20), 
+                  heat_generator_classes.GasBoiler(name="Gaskessel")]
+    general_results = heat_generator_classes.Berechnung_Erzeugermix(tech_order, initial_data, 0, 8760, TRY, COP_data, Gaspreis, Strompreis, Holzpreis, "Nein")
+
+    verteilungen = {"Gaspreis": monte_carlo.normalverteilung(Gaspreis, 10, minimum=0),
+                    "Strompreis": monte_carlo.lognormalverteilung(Strompreis, 30),
+                    "Holzpreis": monte_carlo.dreiecksverteilung(40, Holzpreis, 90),
+                    "kapitalzins": monte_carlo.gleichverteilung(2, 8),
+                    "Biomassekessel.spez_Investitionskosten": monte_carlo.stichproben([150, 200, 250])}
+    args = (tech_order, general_results, verteilungen, Gaspreis, Strompreis, Holzpreis)
+
+    mc_1 = monte_carlo.Monte_Carlo_WGK(*args, anzahl=2000, chunk_size=300, seed=1)
+    mc_2 = monte_carlo.Monte_Carlo_WGK(*args, anzahl=2000, chunk_size=300, seed=1)
+    assert np.array_equal(mc_1['WGK'], mc_2['WGK']) and np.array_equal(mc_1['WGK_Gesamt'], mc_2['WGK_Gesamt'])
+    assert not np.array_equal(mc_1['WGK_Gesamt'], monte_carlo.Monte_Carlo_WGK(*args, anzahl=2000, chunk_size=300, seed=2)['WGK_Gesamt'])
+    assert np.all(np.diff(mc_1['WGK_Gesamt_Perzentile']) >= 0) and np.all(np.diff(mc_1['WGK_Perzentile'], axis=1) >= 0)
+
+    # Verteilungen ohne Streuung
+    feste_verteilungen = {"Gaspreis": monte_carlo.normalverteilung(Gaspreis, 0), "Strompreis": monte_carlo.gleichverteilung(Strompreis, Strompreis),
+                          "Holzpreis": monte_carlo.stichproben([Holzpreis]), "kapitalzins": monte_carlo.gleichverteilung(5, 5)}
+    mc_fest = monte_carlo.Monte_Carlo_WGK(tech_order, general_results, feste_verteilungen, Gaspreis, Strompreis, Holzpreis, anzahl=100, seed=1)
+    np.testing.assert_allclose(mc_fest['WGK_Gesamt'], general_results['WGK_Gesamt'], rtol=1e-9)
+    np.testing.assert_allclose(mc_fest['WGK'], np.array(general_results['WGK'])[:, np.newaxis].repeat(100, axis=1), rtol=1e-9)
+    print(f"Monte-Carlo: Wärmegestehungskosten (5/50/95 %): {mc_1['WGK_Gesamt_Perzentile']} €/MWh, deterministisch {general_results['WGK_Gesamt']:.2f} €/MWh")
+
+# PV-Ertrag in Schaltjahren: der 29. Februar fehlt im TRY und wird übersprungen, andere Längen sind ein Fehler
+def test_photovoltaics_leap_year():
+    TRY_data = "C:/Users/jp66tyda/heating_network_generation/heat_requirement/TRY_511676144222/TRY2015_511676144222_Jahr.dat"
+    Lage = (14.42, 15, 51.17, 0.2)
+
+    for year in [2019, 2020]:
+        yield_kWh, P_max, P_L = Photovoltaik.Calculate_PV(TRY_data, 100, *Lage, 0, 30, year=year)
+        yield_batch, P_max_batch, P_L_batch = Photovoltaik.Calculate_PV_batch(TRY_data, [100], *Lage, [0], [30], year=year, dtype=np.float64)
+        assert len(P_L) == 8760 and yield_kWh > 0
+        np.testing.assert_allclose(P_L_batch[0], P_L)
+        print(f"PV {year}: {yield_kWh} kWh, {P_max} kW")
+
+    # ab dem 1. März Tag 61 wie im Kalender des Schaltjahres
+    day_of_year, hour = Photovoltaik.TRY_time_axis(2020, 8760)
+    assert day_of_year[59 * 24] == 61 and hour[59 * 24] == 1
+
+    Ta_L, W_L, D_L, G_L = import_TRY(TRY_data)
+    try:
+        Photovoltaik.Calculate_PV_batch((Ta_L[:8000], W_L[:8000], D_L[:8000], G_L[:8000]), [100], *Lage, [0], [30])
+        raise AssertionError("ValueError erwartet")
+    except ValueError as e:
+        print(e)
+
+# Einsatz nach Strompreisen: Deckung der Last, Speichergrenzen und gleiche Ergebnisse seriell und parallel
+def test_rolling_horizon(max_workers=4):
+    rng = np.random.default_rng(1)
+    n = 24 * 7
+    Last_L = rng.uniform(50, 300, n)
+    time_steps = np.arange(np.datetime64('2019-01-01T00'), np.datetime64('2019-01-08T00'), dtype='datetime64[h]')
+    general_results = {'time_steps': time_steps, 'Last_L': Last_L, 'VLT_L': np.full(n, 80.0), 'techs': [], 'Wärmeleistung_L': []}
+    # Strompreis mit Tagesgang, das BHKW lohnt sich nur zu teuren Stunden, der Biomassekessel ist am günstigsten,
+    # darf den Speicher aber nicht laden
+    Strompreis_L = 100 + 80 * np.sin(np.arange(n) / 24 * 2 * np.pi)
+    Gaspreis, Holzpreis = 70, 20
+
+    def erzeuger(Speicher):
+        if Speicher:
+            BHKW = heat_generator_classes.CHPStorage(name="BHKW_Speicher", th_Leistung_BHKW=100, Speichervolumen_BHKW=20)
+        else:
+            BHKW = heat_generator_classes.CHP(name="BHKW", th_Leistung_BHKW=100)
+        return [BHKW, heat_generator_classes.BiomassBoiler(name="Biomassekessel", P_BMK=150), heat_generator_classes.GasBoiler(name="Gaskessel")]
+
+    # mit Speicher: Erzeugung + Entladung - Ladung deckt die Last, Ladung nur aus dem BHKW
+    dispatch = rolling_horizon.Rolling_Horizon_Dispatch(erzeuger(True), general_results, None, Strompreis_L, Gaspreis, Holzpreis, Fenster=48, Übernahme=24)
+    Speicherkapazität = 20 * 1.163 * 30
+    Ladung_L = np.diff(dispatch['Speicherfüllstand_L'], prepend=0)
+    gedeckt_L = np.sum(dispatch['Wärmeleistung_L'], axis=0) + dispatch['ungedeckte_Last_L'] - Ladung_L
+    np.testing.assert_allclose(gedeckt_L, Last_L, atol=1e-6)
+    assert np.all(dispatch['Speicherfüllstand_L'] >= -1e-6) and np.all(dispatch['Speicherfüllstand_L'] <= Speicherkapazität + 1e-6)
+    assert np.all(Ladung_L <= dispatch['Wärmeleistung_L'][0] + 1e-6)
+    assert np.max(dispatch['Speicherfüllstand_L']) > 0, "Speicher wird nicht genutzt"
+
+    # ohne Speicher: Fenster unabhängig, seriell und im Prozesspool gleich
+    seriell = rolling_horizon.Rolling_Horizon_Dispatch(erzeuger(False), general_results, None, Strompreis_L, Gaspreis, Holzpreis, Fenster=48, Übernahme=24, max_workers=1)
+    parallel = rolling_horizon.Rolling_Horizon_Dispatch(erzeuger(False), general_results, None, Strompreis_L, Gaspreis, Holzpreis, Fenster=48, Übernahme=24, max_workers=max_workers)
+    np.testing.assert_allclose(np.sum(seriell['Wärmeleistung_L'], axis=0) + seriell['ungedeckte_Last_L'], Last_L, atol=1e-6)
+    np.testing.assert_allclose(parallel['Wärmeleistung_L'], seriell['Wärmeleistung_L'])
+    np.testing.assert_allclose(parallel['Kosten_variabel'], seriell['Kosten_variabel'])
+    print(f"Einsatz nach Strompreisen: variable Kosten mit Speicher {dispatch['Kosten_variabel']:.0f} €, ohne Speicher {seriell['Kosten_variabel']:.0f} €")
+
 def plotStackPlot(figure, t, data, labels, Last):
     ax = figure.add_subplot(111)
     ax.stackplot(t, data, labels=labels)
@@ -375,13 +626,27 @@ def plotPieChart(figure, Anteile, labels):
     ax.legend(loc='lower left')
     ax.axis("equal")  # Stellt sicher, dass der Pie-Chart kreisförmig bleibt
 
-test_annuität()
-test_biomass_boiler()
-test_gas_boiler()
-test_chp()
-test_solar_thermal()
-test_waste_heat_pump()
-test_river_heat_pump()
-test_geothermal_heat_pump()
-test_berechnung_erzeugermix(optimize=False, plot=True)
-test_berechnung_erzeugermix(optimize=True, plot=True)
\ No newline at end of file
+# die Worker-Prozesse der parallelen Optimierung importieren dieses Modul unter Windows erneut
+if __name__ == '__main__':
+    test_annuität()
+    test_biomass_boiler()
+    test_gas_boiler()
+    test_chp()
+    test_chp_storage()
+    test_solar_thermal()
+    test_solar_thermal_engine()
+    test_solar_thermal_batch()
+    test_photovoltaics_leap_year()
+    test_waste_heat_pump()
+    test_river_heat_pump()
+    test_geothermal_heat_pump()
+    test_berechnung_erzeugermix(optimize=False, plot=True)
+    test_berechnung_erzeugermix(optimize=True, plot=True)
+    test_typtage()
+    test_berechnung_erzeugermix(optimize=True, plot=True, anzahl_typtage=12)
+    test_berechnung_erzeugermix(optimize=True, plot=True, mehrstufig=True)
+    test_berechnung_erzeugermix(optimize=False, plot=False, unsicherheit=True)
+    test_monte_carlo()
+    test_berechnung_erzeugermix(optimize=False, plot=False, strommarkt=True)
+    test_optimize_mix_parallel()
+    test_rolling_horizon()
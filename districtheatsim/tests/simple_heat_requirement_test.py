@@ -6,6 +6,9 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')
 
 from heat_requirement import heat_requirement_BDEW
 from heat_requirement import heat_requirement_VDI4655
+from utilities.time_axis import get_time_axis
+
+import numpy as np
 
 # Berechnung mit BDEW-SLPs
 def VDI4655():
@@ -41,5 +44,17 @@ def BDEW():
     print(f"Wärmebedarf Gesamt: {hourly_heat_demand}")    
     print(f"Temperaturen: {hourly_temperature}")
 
+# Zeitachse mit Kalenderdaten und Feiertagen
+def TimeAxis():
+    time_axis = get_time_axis(2024, 15)
+
+    print("Zeitachse 2024 (Schaltjahr, 15 min)")
+    print(f"Zeitschritte: {time_axis.num_steps}, Tage: {time_axis.num_days}")
+    print(f"Feiertage: {time_axis.holidays}")
+    assert time_axis.num_steps == 366 * 96
+    assert time_axis.day_of_year[-1] == 366 and time_axis.hour[-1] == 23 and time_axis.minute[-1] == 45
+    assert np.datetime64('2024-03-29') in time_axis.holidays  # Karfreitag 2024
+
 VDI4655()
 BDEW()
+TimeAxis()
@@ -2,10 +2,15 @@
 
 import sys
 import os
+import tempfile
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+import numpy as np
+import geopandas as gpd
+
 from lod2.scripts.filter_LOD2 import filter_LOD2_with_OSM_and_adress, spatial_filter_with_polygon, process_lod2, filter_LOD2_with_coordinates
-from lod2.scripts.heat_requirement_DIN_EN_12831 import calculate_heat_demand_for_lod2_area, Building
+from lod2.scripts.heat_requirement_DIN_EN_12831 import calculate_heat_demand_for_lod2_area, Building, calculate_heat_demand_batch
+from lod2.scripts.building_store import aktualisiere_gebaeudespeicher, lade_gebaeude
 
 ### aktuell sind die Pfade noch nicht enthalten ###
 def test_lod2_adress_filter():
@@ -70,6 +75,28 @@ def test_building_calculation():
     building3.calc_heat_demand()
     building3.calc_yearly_heat_demand()
 
+def test_building_calculation_batch():
+    # the three buildings on Dresdner Straße in Bautzen in one calculation
+    ground_area = [748.65680, 534.66489, 740.18520]
+    wall_area = [2203.07, 1564.57, 2240.53]
+    roof_area = [930.44, 667.91, 925.43]
+    height = [225.65 - 211.646, 222.034 - 209.435, 223.498 - 210.599]
+    building_volume = [h * a for h, a in zip(height, ground_area)]
+
+    results = calculate_heat_demand_batch(ground_area, wall_area, roof_area, building_volume, u_type="DE.N.MFH.05.GEN", building_state="Existing_state", hourly=True)
+    print(f"Jährlicher Wärmebedarf in kWh: {results['yearly_heat_demand']}")
+    print(f"Stündlicher Heizwärmebedarf (Gebäude x Stunden): {results['hourly_heating_demand'].shape}, Summe {results['hourly_heating_demand'].sum() / 1000:.2f} kWh")
+
+    # die Ergebnisse müssen denen der einzelnen Gebäude entsprechen
+    for i in range(len(ground_area)):
+        building = Building(ground_area[i], wall_area[i], roof_area[i], building_volume[i], u_type="DE.N.MFH.05.GEN", building_state="Existing_state")
+        building.calc_yearly_heat_demand()
+        for key in ["max_heating_demand", "yearly_heating_demand", "yearly_warm_water_demand", "yearly_heat_demand"]:
+            assert np.isclose(results[key][i], getattr(building, key), rtol=1e-9), (i, key, results[key][i], getattr(building, key))
+        assert np.isclose(np.sum(results['hourly_heating_demand'][i]) / 1000, building.yearly_heating_demand, rtol=1e-6)
+
+    print("Batch-Berechnung entspricht der Berechnung der einzelnen Gebäude.")
+
 def test_lod2_building_caclulation():
     lod_geojson_path = 'tests\\data\\lod2\\lod2_33458_5668_2_sn.geojson'
     polygon_shapefile_path = 'tests\data\\lod2\\filter_polygon.geojson'
@@ -87,9 +114,70 @@ def test_lod2_coordinate_filter():
     filter_LOD2_with_coordinates(lod_geojson_path, csv_file_path, output_geojson_path)
     print("LOD2-Daten erfolgreich mit Koordinaten der Adressen gefiltert.")
 
+def test_lod2_building_store(max_workers=2):
+    # Kacheln aus den Gebäuden von filtered_LOD_quartier_1.geojson, die Flächen im Gebäudespeicher müssen process_lod2 entsprechen
+    lod_geojson_path = os.path.join(os.path.dirname(__file__), '..', 'lod2', 'scripts', 'filtered_LOD_quartier_1.geojson')
+    lod2 = gpd.read_file(lod_geojson_path)
+    referenz = process_lod2(lod_geojson_path)
+
+    gebäude_id = lod2['Obj_Parent'].where(lod2['Obj_Parent'].notna(), lod2['ID'])
+    ids = sorted(gebäude_id.unique())
+    kachel_ids = {'kachel_a': ids[:len(ids) // 2], 'kachel_b': ids[len(ids) // 2:]}
+
+    with tempfile.TemporaryDirectory() as ordner:
+        speicher_pfad = os.path.join(ordner, 'gebaeudespeicher.parquet')
+        kacheln = {kachel: os.path.join(ordner, kachel + '.geojson') for kachel in kachel_ids}
+        for kachel, datei in kacheln.items():
+            lod2[gebäude_id.isin(kachel_ids[kachel])].to_file(datei, driver='GeoJSON')
+
+        # alle Kacheln fehlerhaft und noch kein Gebäudespeicher
+        defekt = os.path.join(ordner, 'defekt.geojson')
+        with open(defekt, 'w') as f:
+            f.write("keine Geodaten")
+        assert aktualisiere_gebaeudespeicher([defekt], speicher_pfad, max_workers=max_workers) is None
+        assert not os.path.exists(speicher_pfad)
+
+        gebäude = aktualisiere_gebaeudespeicher(kacheln, speicher_pfad, max_workers=max_workers)
+        assert sorted(gebäude['ID']) == sorted(referenz)
+        for zeile in gebäude.itertuples():
+            for spalte in ['Ground_Area', 'Wall_Area', 'Roof_Area']:
+                assert np.isclose(getattr(zeile, spalte), referenz[zeile.ID][spalte]), (zeile.ID, spalte)
+        assert gebäude.equals(lade_gebaeude(speicher_pfad))
+
+        # ohne Änderungen wird keine Kachel erneut verarbeitet
+        assert aktualisiere_gebaeudespeicher(kacheln, speicher_pfad, max_workers=max_workers).equals(gebäude)
+
+        # geänderte Kachel: nur deren Gebäude werden ersetzt
+        entfernt = kachel_ids['kachel_a'][0]
+        lod2[gebäude_id.isin(kachel_ids['kachel_a'][1:])].to_file(kacheln['kachel_a'], driver='GeoJSON')
+        os.utime(kacheln['kachel_a'], (os.path.getmtime(kacheln['kachel_a']) + 10,) * 2)
+        gebäude = aktualisiere_gebaeudespeicher(kacheln, speicher_pfad, max_workers=max_workers)
+        assert sorted(gebäude['ID']) == sorted(set(referenz) - {entfernt})
+
+        # fehlerhafte geänderte Kachel: deren bisherige Gebäude bleiben erhalten und die Kachel wird beim nächsten Aufruf erneut versucht
+        with open(kacheln['kachel_b'], 'w') as f:
+            f.write("keine Geodaten")
+        gebäude_fehler = aktualisiere_gebaeudespeicher(kacheln, speicher_pfad, max_workers=max_workers)
+        assert gebäude_fehler is not None and gebäude_fehler.equals(gebäude)
+        assert lade_gebaeude(speicher_pfad).equals(gebäude)
+
+        # fehlerhafte Kachel zusammen mit einer geänderten Kachel: nur die erfolgreich verarbeitete Kachel wird ersetzt
+        lod2[gebäude_id.isin(kachel_ids['kachel_a'])].to_file(kacheln['kachel_a'], driver='GeoJSON')
+        os.utime(kacheln['kachel_a'], (os.path.getmtime(kacheln['kachel_a']) + 20,) * 2)
+        gebäude = aktualisiere_gebaeudespeicher(kacheln, speicher_pfad, max_workers=max_workers)
+        assert sorted(gebäude['ID']) == sorted(referenz)
+        assert set(gebäude.loc[gebäude['ID'].isin(kachel_ids['kachel_b']), 'Kachel']) == {'kachel_b'}
+
+    print(f"Gebäudespeicher mit max_workers={max_workers}: Flächen, Aktualisierung und fehlerhafte Kacheln erfolgreich geprüft.")
+
 #test_lod2_adress_filter()
 #test_lod2_shape_filter()
 #test_building_calculation()
 #test_lod2_building_caclulation()
 
-test_lod2_coordinate_filter()
+# die Worker-Prozesse des Gebäudespeichers importieren dieses Modul unter Windows erneut
+if __name__ == '__main__':
+    test_lod2_coordinate_filter()
+    test_building_calculation_batch()
+    test_lod2_building_store(max_workers=1)
+    test_lod2_building_store(max_workers=2)
@@ -0,0 +1,36 @@
+# Erstellt von Jonas Pfeiffer
+# Ablage abgeleiteter Dateien (z.B. binäre Kopien der TRY- und Profildaten) im Cache-Ordner des Benutzers,
+# damit nichts in den Programmordner geschrieben wird
+
+import os
+import hashlib
+import tempfile
+
+def cache_ordner():
+    # DISTRICTHEATSIM_CACHE, sonst %LOCALAPPDATA% (Windows) bzw. $XDG_CACHE_HOME oder ~/.cache
+    ordner = os.environ.get("DISTRICTHEATSIM_CACHE")
+    if not ordner:
+        basis = os.environ.get("LOCALAPPDATA") if os.name == "nt" else os.environ.get("XDG_CACHE_HOME")
+        ordner = os.path.join(basis or os.path.join(os.path.expanduser("~"), ".cache"), "districtheatsim")
+    return ordner
+
+def cache_dateiname(quelle, endung):
+    # eindeutiger Dateiname je Quelldatei (bzw. -ordner), gleichnamige Dateien aus verschiedenen Ordnern überschreiben sich nicht
+    quelle = os.path.abspath(quelle)
+    kennung = hashlib.sha1(quelle.encode("utf-8")).hexdigest()[:16]
+    return os.path.join(cache_ordner(), f"{os.path.basename(quelle)}.{kennung}{endung}")
+
+def atomar_speichern(dateiname, speichern):
+    # speichern(datei) schreibt in eine eindeutige temporäre Datei im Zielordner, die dann die Zieldatei ersetzt.
+    # Parallele Prozesse lesen dadurch nie eine halb geschriebene Datei und stören sich nicht beim Schreiben.
+    ordner = os.path.dirname(dateiname)
+    os.makedirs(ordner, exist_ok=True)
+    handle, temporär = tempfile.mkstemp(dir=ordner, prefix=os.path.basename(dateiname) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(handle, "wb") as datei:
+            speichern(datei)
+        os.replace(temporär, dateiname)
+    except BaseException:
+        if os.path.exists(temporär):
+            os.remove(temporär)
+        raise
@@ -0,0 +1,170 @@
+# Erstellt von Jonas Pfeiffer
+# Klimaensemble: Wärmebedarf, Netzeinspeisung und Erzeugermix für alle Testreferenzjahre eines Standorts
+# Gebäudedaten, Netz, Erzeuger und Wirtschaftlichkeitsparameter werden einmal aufbereitet und je Prozess nur einmal übergeben,
+# je Wetterdatei laufen Lastprofile, Netzberechnung und Berechnung_Erzeugermix in einem eigenen Prozess.
+
+import sys
+import os
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import copy
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utilities.test_reference_year import lade_TRY, import_TRY
+from net_simulation_pandapipes.pp_net_initialisation_geojson import generate_profiles_from_geojson
+from net_simulation_pandapipes.pp_net_time_series_simulation import thermohydraulic_time_series_net, calculate_results, producer_feed_in
+from heat_generators.heat_generator_classes import Berechnung_Erzeugermix, optimize_mix
+
+def get_resource_path(relative_path):
+    """ Get the absolute path to the resource, works for dev and for PyInstaller """
+    if getattr(sys, 'frozen', False):
+        # Wenn die Anwendung eingefroren ist, ist der Basispfad der Temp-Ordner, wo PyInstaller alles extrahiert
+        base_path = sys._MEIPASS
+    else:
+        # Wenn die Anwendung nicht eingefroren ist, ist der Basispfad der Ordner, in dem die Hauptdatei liegt
+        base_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    return os.path.join(base_path, relative_path)
+
+# Witterung der TRY-Dateien nach dem letzten Teil des Dateinamens
+WITTERUNG = {"Jahr": "mittleres Jahr", "Somm": "extremer Sommer", "Wint": "extremer Winter"}
+
+# Spalten der Gebäudedaten, die für die Lastprofile benötigt werden
+GEBÄUDESPALTEN = ["Wärmebedarf", "Gebäudetyp", "Steigung_Heizkurve", "VLT_max", "RLT_max"]
+
+def TRY_Dateien(ordner=None):
+    # Wetterdateien eines Ordners als {Szenario: Dateipfad}, z.B. {"TRY2015_Jahr": ".../TRY2015_511676144222_Jahr.dat", ...}
+    if ordner is None:
+        ordner = get_resource_path(os.path.join('heat_requirement', 'TRY_511676144222'))
+
+    dateien = {}
+    for name in sorted(os.listdir(ordner)):
+        treffer = re.fullmatch(r"TRY(\d{4})_\w+?_([A-Za-z]+)\.dat", name)
+        if treffer:
+            dateien[f"TRY{treffer.group(1)}_{treffer.group(2)}"] = os.path.join(ordner, name)
+
+    return dateien
+
+_ensemble_daten = None
+
+def _initialisiere_worker(daten):
+    global _ensemble_daten
+    _ensemble_daten = daten
+
+def _berechne_szenario(aufgabe):
+    szenario, TRY_datei = aufgabe
+    d = _ensemble_daten
+    startzeit = time.time()
+
+    # Lastprofile der Gebäude mit den Wetterdaten des Szenarios
+    gebäude = d["gebäude"]
+    yearly_time_steps, waerme_gebaeude_W, _, _, _ = generate_profiles_from_geojson(gebäude, d["building_type"], d["calc_method"], gebäude["VLT_max"].values.astype(float),
+                                                                                   gebäude["RLT_max"].values.astype(float), TRY=TRY_datei)
+    start = d["start"]
+    end = len(yearly_time_steps) if d["end"] is None else d["end"]
+    Last_Gebäude_L = np.sum(waerme_gebaeude_W, axis=0)[start:end] / 1000
+
+    if d["net"] is None:
+        # ohne Netzberechnung: Summe der Gebäudelasten bei konstanten Netztemperaturen
+        time_steps = yearly_time_steps[start:end]
+        Last_L = Last_Gebäude_L.copy()
+        VLT_L = np.full(len(Last_L), float(d["supply_temperature"]))
+        RLT_L = np.full(len(Last_L), float(np.mean(d["return_temperature"])))
+    else:
+        # jeder Prozess rechnet mit einer eigenen Kopie des Netzes
+        time_steps, net, net_results = thermohydraulic_time_series_net(copy.deepcopy(d["net"]), yearly_time_steps, waerme_gebaeude_W, start, end,
+                                                                       d["supply_temperature"], d["return_temperature"])
+        Last_L, VLT_L, RLT_L = producer_feed_in(calculate_results(net, net_results))
+
+    initial_data = time_steps, Last_L * d["load_scale_factor"], VLT_L, RLT_L
+    TRY = import_TRY(TRY_datei)
+    wirtschaft = d["wirtschaft"]
+
+    tech_order = copy.deepcopy(d["tech_order"])
+    if d["optimize"]:
+        optimiert = optimize_mix(tech_order, initial_data, start, end, TRY, d["COP_data"], **wirtschaft)
+        if optimiert is None:
+            print(f"{szenario}: Optimierung nicht erfolgreich, es wird mit den Ausgangswerten gerechnet.")
+            tech_order = copy.deepcopy(d["tech_order"])
+        else:
+            tech_order = optimiert
+
+    general_results = Berechnung_Erzeugermix(tech_order, initial_data, start, end, TRY, d["COP_data"], wirtschaft["Gaspreis"], wirtschaft["Strompreis"], wirtschaft["Holzpreis"],
+                                             wirtschaft["BEW"], kapitalzins=wirtschaft["kapitalzins"], preissteigerungsrate=wirtschaft["preissteigerungsrate"],
+                                             betrachtungszeitraum=wirtschaft["betrachtungszeitraum"], stundensatz=wirtschaft["stundensatz"])
+
+    duration = np.diff(time_steps[0:2]) / np.timedelta64(1, 'h')
+    klimajahr, witterung = szenario[3:7], szenario.split("_")[-1]
+    zeile = {
+        "Szenario": szenario,
+        "Klimajahr": int(klimajahr),
+        "Witterung": WITTERUNG.get(witterung, witterung),
+        "Mitteltemperatur_°C": float(np.mean(TRY[0])),
+        "Wärmebedarf_Gebäude_MWh": float(np.sum(Last_Gebäude_L) / 1000 * duration[0]),
+        "Heizlast_Gebäude_kW": float(np.max(Last_Gebäude_L)),
+        "Jahreswärmebedarf_MWh": float(general_results["Jahreswärmebedarf"]),
+        "max_Einspeisung_kW": float(np.max(initial_data[1])),
+        "WGK_Gesamt_€/MWh": float(general_results["WGK_Gesamt"]),
+    }
+    for tech, Anteil in zip(general_results["techs"], general_results["Anteile"]):
+        zeile[f"Anteil_{tech}_%"] = float(Anteil) * 100
+    zeile["Rechenzeit_s"] = time.time() - startzeit
+
+    return zeile, general_results
+
+def Klimaensemble(gdf_HAST, tech_order, COP_data, Gaspreis, Strompreis, Holzpreis, BEW, kapitalzins=5, preissteigerungsrate=3, betrachtungszeitraum=20, stundensatz=45,
+                  building_type="HMF", calc_method="BDEW", supply_temperature=85, return_temperature=60, net=None, start=0, end=None, load_scale_factor=1,
+                  TRY_dateien=None, optimize=False, max_workers=None):
+    """
+    Berechnung von Wärmebedarf und Erzeugermix für mehrere Wetterdateien, ein Szenario je Prozess (max_workers=1: nacheinander im aktuellen Prozess).
+
+    gdf_HAST: Hausanschlussstationen mit den Spalten aus GEBÄUDESPALTEN (Gebäudetyp nur bei calc_method="Datensatz")
+    net: pandapipes-Netz aus initialize_geojson, ohne Netz wird die Summe der Gebäudelasten mit konstanten Netztemperaturen
+    (supply_temperature, Mittelwert von return_temperature) verwendet. Dezentrale Wärmepumpen ("kaltes Netz") werden nicht abgebildet.
+    TRY_dateien: {Szenario: Dateipfad}, Standard sind alle Dateien aus TRY_Dateien()
+    optimize: der Erzeugermix wird je Szenario optimiert, sonst werden die übergebenen Erzeuger für alle Szenarien verwendet
+
+    Rückgabe: Vergleichstabelle (DataFrame, eine Zeile je Szenario) und dict {Szenario: general_results}
+    """
+    if TRY_dateien is None:
+        TRY_dateien = TRY_Dateien()
+
+    # die Wetterdateien werden vorab einmal eingelesen, die Prozesse lesen dann nur noch die .npy-Dateien
+    for datei in TRY_dateien.values():
+        lade_TRY(datei)
+
+    daten = {
+        "gebäude": pd.DataFrame({spalte: gdf_HAST[spalte].values for spalte in GEBÄUDESPALTEN if spalte in gdf_HAST.columns}),
+        "building_type": building_type,
+        "calc_method": calc_method,
+        "supply_temperature": supply_temperature,
+        "return_temperature": return_temperature,
+        "net": net,
+        "start": start,
+        "end": end,
+        "load_scale_factor": load_scale_factor,
+        "tech_order": tech_order,
+        "COP_data": np.genfromtxt(COP_data, delimiter=';') if isinstance(COP_data, str) else np.asarray(COP_data, dtype=float),
+        "wirtschaft": {"Gaspreis": Gaspreis, "Strompreis": Strompreis, "Holzpreis": Holzpreis, "BEW": BEW, "kapitalzins": kapitalzins,
+                       "preissteigerungsrate": preissteigerungsrate, "betrachtungszeitraum": betrachtungszeitraum, "stundensatz": stundensatz},
+        "optimize": optimize,
+    }
+
+    aufgaben = list(TRY_dateien.items())
+    if max_workers == 1:
+        _initialisiere_worker(daten)
+        ergebnisse = [_berechne_szenario(aufgabe) for aufgabe in aufgaben]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_initialisiere_worker, initargs=(daten,)) as executor:
+            ergebnisse = list(executor.map(_berechne_szenario, aufgaben))
+
+    tabelle = pd.DataFrame([zeile for zeile, _ in ergebnisse]).set_index("Szenario")
+    # Erzeuger, die in einem Szenario keine Wärme liefern, erscheinen dort mit Anteil 0
+    tabelle[[spalte for spalte in tabelle.columns if spalte.startswith("Anteil_")]] = tabelle.filter(like="Anteil_").fillna(0)
+
+    return tabelle, {zeile["Szenario"]: general_results for zeile, general_results in ergebnisse}
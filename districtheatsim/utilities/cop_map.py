@@ -0,0 +1,93 @@
+# Erstellt von Jonas Pfeiffer
+# Kennfeld der Wärmepumpen (COP über Quell- und Vorlauftemperatur) als zwischengespeicherter Dienst
+
+import hashlib
+
+import numpy as np
+from scipy.interpolate import RegularGridInterpolator
+
+def feinraster(achse):
+    # Regelmäßige Stützstellen, die alle Stützstellen der Achse enthalten (Schrittweite = kleinster Abstand)
+    # None, falls die Abstände keine ganzzahligen Vielfachen des kleinsten Abstands sind
+    schritte = np.diff(achse)
+    schritt = schritte.min()
+    if not np.allclose(schritte / schritt, np.round(schritte / schritt)):
+        return None
+    anzahl = int(round((achse[-1] - achse[0]) / schritt)) + 1
+    return achse[0] + schritt * np.arange(anzahl)
+
+class COPMap:
+    """
+    Bilineare Interpolation des COP-Kennfeldes (erste Zeile: Vorlauftemperaturen, erste Spalte: Quelltemperaturen).
+
+    Das Kennfeld wird einmalig auf ein regelmäßiges Raster verfeinert, das alle Stützstellen enthält. Die Werte darauf
+    sind exakt die bilinearen Werte des Kennfeldes, die Abfrage erfolgt dann über direkt berechnete Indizes.
+    Quell- und Vorlauftemperaturen können beliebig geformte Arrays sein (z.B. Gebäude x Zeitschritte), sie werden
+    nach numpy-Regeln gegeneinander ausgewertet.
+    """
+    def __init__(self, values):
+        values = np.asarray(values, dtype=float)
+        self.VLT = values[0, 1:]  # Vorlauftemperaturen
+        self.QT = values[1:, 0]  # Quelltemperaturen
+        self.COP = values[1:, 1:]
+
+        QT_fein, VLT_fein = feinraster(self.QT), feinraster(self.VLT)
+        if QT_fein is None or VLT_fein is None:
+            # ungleichmäßige Achsen: Abfrage über die ursprünglichen Stützstellen
+            self.interpolator = RegularGridInterpolator((self.QT, self.VLT), self.COP, method='linear')
+            self.tabelle = None
+        else:
+            f = RegularGridInterpolator((self.QT, self.VLT), self.COP, method='linear')
+            QT_gitter, VLT_gitter = np.meshgrid(QT_fein, VLT_fein, indexing='ij')
+            self.tabelle = f(np.stack((QT_gitter, VLT_gitter), axis=-1))
+            self.tabelle.setflags(write=False)
+            self.QT_0, self.dQT = QT_fein[0], QT_fein[1] - QT_fein[0]
+            self.VLT_0, self.dVLT = VLT_fein[0], VLT_fein[1] - VLT_fein[0]
+
+    def __call__(self, QT, VLT):
+        QT, VLT = np.asarray(QT, dtype=float), np.asarray(VLT, dtype=float)
+        form = np.broadcast_shapes(QT.shape, VLT.shape)
+
+        if not (np.all(self.QT[0] <= QT) and np.all(QT <= self.QT[-1])):
+            raise ValueError(f"Quelltemperatur außerhalb des Kennfeldes ({self.QT[0]} bis {self.QT[-1]} °C).")
+        if not (np.all(self.VLT[0] <= VLT) and np.all(VLT <= self.VLT[-1])):
+            raise ValueError(f"Vorlauftemperatur außerhalb des Kennfeldes ({self.VLT[0]} bis {self.VLT[-1]} °C).")
+
+        if self.tabelle is None:
+            QT, VLT = np.broadcast_arrays(QT, VLT)
+            return self.interpolator(np.stack((QT, VLT), axis=-1))
+
+        # Indizes und Anteile je Achse in der eigenen Form berechnen, erst beim Zugriff auf die Tabelle kombinieren
+        n_QT, n_VLT = self.tabelle.shape
+        werte = self.tabelle.ravel()
+        x = (QT - self.QT_0) / self.dQT
+        y = (VLT - self.VLT_0) / self.dVLT
+        i = np.minimum(x.astype(np.intp), n_QT - 2)
+        j = np.minimum(y.astype(np.intp), n_VLT - 2)
+        x -= i
+        y -= j
+        k = i * n_VLT + j
+
+        COP = werte[k]
+        COP += (werte[k + n_VLT] - COP) * x
+        COP_oben = werte[k + 1]
+        COP_oben += (werte[k + n_VLT + 1] - COP_oben) * x
+        COP += (COP_oben - COP) * y
+
+        return np.broadcast_to(COP, form).copy() if COP.shape != form else COP
+
+_kennfelder = {}
+
+def get_cop_map(COP_data):
+    # Kennfeld aus Dateipfad (CSV mit ";" getrennt) oder bereits geladenem Array, wird je Quelle nur einmal aufbereitet
+    if isinstance(COP_data, str):
+        schlüssel = COP_data
+    else:
+        COP_data = np.asarray(COP_data, dtype=float)
+        schlüssel = hashlib.sha1(COP_data.tobytes() + str(COP_data.shape).encode()).hexdigest()
+
+    if schlüssel not in _kennfelder:
+        values = np.genfromtxt(COP_data, delimiter=';') if isinstance(COP_data, str) else COP_data
+        _kennfelder[schlüssel] = COPMap(values)
+
+    return _kennfelder[schlüssel]
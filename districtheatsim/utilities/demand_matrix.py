@@ -0,0 +1,399 @@
+# Erstellt von Jonas Pfeiffer
+# Kompakte Gebäude x Zeitschritte-Matrix für Lastgänge und Temperaturkurven
+# Gespeichert werden nur die gemeinsamen Profile sowie je Gebäude der Index des Profils, ein Faktor, ein Offset und optional eine Untergrenze:
+# Zeile i = max(Faktor[i] * Profil[Index[i]] + Offset[i], Untergrenze[i]). Werte werden erst beim Zugriff auf Zeilen oder Zeitfenster berechnet.
+
+import numpy as np
+
+class BerechneteMatrix:
+    """
+    Gemeinsame numpy-Schnittstelle für Gebäude x Zeitschritte-Matrizen, deren Werte erst beim Zugriff berechnet werden.
+    Abgeleitete Klassen liefern shape, dtype und _werte(zeilen, spalten).
+
+    Zeilen, Zeitfenster, np.asarray, Vergleiche und die Reduktionen sum, mean, max und min werden blockweise berechnet, ohne die
+    vollständige Matrix anzulegen. Alle übrigen numpy-Funktionen (z.B. np.maximum(M, 0)) rechnen auf der vollständigen Matrix.
+    """
+    # Anzahl der Zeilen, die bei vollständiger Berechnung auf einmal ausgewertet werden
+    blockgröße = 256
+
+    # ufuncs, die über die Operatoren der Klasse laufen (kompakte Ergebnisse bei DemandMatrix): Methode für M op x und für x op M
+    _OPERATOREN = {
+        np.multiply: ("__mul__", "__rmul__"),
+        np.add: ("__add__", "__radd__"),
+        np.subtract: ("__sub__", "__rsub__"),
+        np.true_divide: ("__truediv__", "__rtruediv__"),
+        np.equal: ("__eq__", "__eq__"),
+        np.not_equal: ("__ne__", "__ne__"),
+        np.less: ("__lt__", "__gt__"),
+        np.less_equal: ("__le__", "__ge__"),
+        np.greater: ("__gt__", "__lt__"),
+        np.greater_equal: ("__ge__", "__le__"),
+    }
+
+    @property
+    def ndim(self):
+        return 2
+
+    def __len__(self):
+        return self.shape[0]
+
+    def _blöcke(self):
+        for start in range(0, len(self), self.blockgröße):
+            yield start, min(start + self.blockgröße, len(self))
+
+    def __getitem__(self, key):
+        zeilen, spalten = key if isinstance(key, tuple) else (key, slice(None))
+        einzeln = np.ndim(zeilen) == 0 and not isinstance(zeilen, slice)
+        zeilen = np.atleast_1d(np.arange(len(self))[zeilen])
+        werte = self._werte(zeilen, spalten)
+        return werte[0] if einzeln else werte
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._werte(np.array([i]), slice(None))[0]
+
+    def __array__(self, dtype=None, copy=None):
+        werte = np.empty(self.shape, dtype=self.dtype)
+        for start, ende in self._blöcke():
+            werte[start:ende] = self._werte(np.arange(start, ende), slice(None))
+        return werte if dtype is None else werte.astype(dtype, copy=False)
+
+    def fenster(self, start, end):
+        # alle Gebäude für die Zeitschritte start bis end
+        return self[:, start:end]
+
+    def tolist(self):
+        return np.asarray(self).tolist()
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        if method == "__call__" and not kwargs:
+            if ufunc is np.negative:
+                return -self
+            if ufunc is np.positive:
+                return +self
+            if ufunc in self._OPERATOREN and len(inputs) == 2:
+                links, rechts = inputs
+                if links is self:
+                    return getattr(self, self._OPERATOREN[ufunc][0])(rechts)
+                return getattr(self, self._OPERATOREN[ufunc][1])(links)
+
+        if any(isinstance(wert, BerechneteMatrix) for wert in kwargs.get("out", ())):
+            raise TypeError(f"{type(self).__name__} kann nicht als out-Argument verwendet werden.")
+        inputs = [np.asarray(wert) if isinstance(wert, BerechneteMatrix) else wert for wert in inputs]
+        return getattr(ufunc, method)(*inputs, **kwargs)
+
+    def _reduktion(self, ufunc, axis, dtype=None):
+        # ufunc.reduce blockweise, ohne die vollständige Matrix anzulegen
+        if len(self) == 0:
+            return ufunc.reduce(np.asarray(self), axis=axis, dtype=dtype)
+        if axis is None:
+            return ufunc.reduce(self._reduktion(ufunc, 1, dtype), dtype=dtype)
+        teile = [ufunc.reduce(self._werte(np.arange(start, ende), slice(None)), axis=axis, dtype=dtype) for start, ende in self._blöcke()]
+        if axis in (0, -2):
+            return ufunc.reduce(np.array(teile), axis=0)
+        if axis in (1, -1):
+            return np.concatenate(teile)
+        raise np.exceptions.AxisError(axis, 2)
+
+    def sum(self, axis=None, dtype=None, out=None, **kwargs):
+        if out is not None or kwargs:
+            return np.sum(np.asarray(self), axis=axis, dtype=dtype, out=out, **kwargs)
+        summe = self._reduktion(np.add, axis, dtype=float)
+        return summe if dtype is None else np.asarray(summe).astype(dtype)
+
+    def mean(self, axis=None, dtype=None, out=None, **kwargs):
+        if out is not None or kwargs:
+            return np.mean(np.asarray(self), axis=axis, dtype=dtype, out=out, **kwargs)
+        anzahl = self.shape[0] * self.shape[1] if axis is None else self.shape[axis]
+        mittel = self.sum(axis=axis) / anzahl
+        return mittel if dtype is None else np.asarray(mittel).astype(dtype)
+
+    def max(self, axis=None, out=None, **kwargs):
+        if out is not None or kwargs:
+            return np.max(np.asarray(self), axis=axis, out=out, **kwargs)
+        return self._reduktion(np.maximum, axis)
+
+    def min(self, axis=None, out=None, **kwargs):
+        if out is not None or kwargs:
+            return np.min(np.asarray(self), axis=axis, out=out, **kwargs)
+        return self._reduktion(np.minimum, axis)
+
+    def _vergleich(self, other, operation):
+        # Ergebnis als bool-Array, blockweise für Zahlen, Werte je Gebäude oder je Zeitschritt und Matrizen gleicher Form
+        other = np.asarray(other)
+        try:
+            form = np.broadcast_shapes(other.shape, self.shape)
+        except ValueError:
+            form = None
+        if form != self.shape:
+            return operation(np.asarray(self), other)
+
+        zeilenweise = other.ndim == 2 and other.shape[0] != 1
+        ergebnis = np.empty(self.shape, dtype=bool)
+        for start, ende in self._blöcke():
+            ergebnis[start:ende] = operation(self._werte(np.arange(start, ende), slice(None)), other[start:ende] if zeilenweise else other)
+        return ergebnis
+
+    def __eq__(self, other):
+        return self._vergleich(other, np.equal)
+
+    def __ne__(self, other):
+        return self._vergleich(other, np.not_equal)
+
+    def __lt__(self, other):
+        return self._vergleich(other, np.less)
+
+    def __le__(self, other):
+        return self._vergleich(other, np.less_equal)
+
+    def __gt__(self, other):
+        return self._vergleich(other, np.greater)
+
+    def __ge__(self, other):
+        return self._vergleich(other, np.greater_equal)
+
+    __hash__ = None
+
+    # Rechenoperationen auf der vollständigen Matrix, DemandMatrix bleibt bei Zahlen und Werten je Gebäude kompakt
+    def __mul__(self, other):
+        return np.asarray(self) * np.asarray(other)
+
+    def __rmul__(self, other):
+        return np.asarray(other) * np.asarray(self)
+
+    def __truediv__(self, other):
+        return np.asarray(self) / np.asarray(other)
+
+    def __rtruediv__(self, other):
+        return np.asarray(other) / np.asarray(self)
+
+    def __add__(self, other):
+        return np.asarray(self) + np.asarray(other)
+
+    def __radd__(self, other):
+        return np.asarray(other) + np.asarray(self)
+
+    def __sub__(self, other):
+        return np.asarray(self) - np.asarray(other)
+
+    def __rsub__(self, other):
+        return np.asarray(other) - np.asarray(self)
+
+    def __neg__(self):
+        return -np.asarray(self)
+
+    def __pos__(self):
+        return self
+
+    def __abs__(self):
+        return np.abs(np.asarray(self))
+
+class DemandMatrix(BerechneteMatrix):
+    """
+    Array-ähnliche Gebäude x Zeitschritte-Matrix aus gemeinsamen Profilen.
+
+    profile: Profile [Anzahl Profile x Zeitschritte] oder ein einzelnes Profil
+    index: Profil je Gebäude, die Länge legt die Anzahl der Gebäude fest
+    scale, offset: Faktor und Offset je Gebäude (oder ein Wert für alle)
+    untergrenze: None oder Untergrenze je Gebäude (z.B. 0 für Wärmeleistungen)
+    dtype: Datentyp der Profile und der berechneten Werte, z.B. np.float32 für halben Speicherbedarf
+
+    Zugriffe wie bei numpy: M[i] (Zeile), M[:, start:end] (Zeitfenster), M[zeilen, spalten]. np.asarray(M) berechnet die
+    vollständige Matrix, np.sum(M, axis=0) sowie np.max(M) und np.min(M) je Gebäude oder gesamt werden direkt aus den Profilen berechnet.
+    Multiplikation, Division, Addition, Subtraktion und Negation mit Zahlen oder Werten je Gebäude (Form [Gebäude x 1]) bleiben kompakt.
+    """
+    def __init__(self, profile, index, scale=1.0, offset=0.0, untergrenze=None, dtype=np.float64):
+        self.profile = np.atleast_2d(np.asarray(profile, dtype=dtype))
+        self.index = np.asarray(index, dtype=np.intp)
+        n = len(self.index)
+        self.scale = np.broadcast_to(np.asarray(scale, dtype=float), (n,)).copy()
+        self.offset = np.broadcast_to(np.asarray(offset, dtype=float), (n,)).copy()
+        self.untergrenze = None if untergrenze is None else np.broadcast_to(np.asarray(untergrenze, dtype=float), (n,)).copy()
+
+        if n > 0 and (self.index.min() < 0 or self.index.max() >= len(self.profile)):
+            raise IndexError("Profilindex außerhalb der übergebenen Profile.")
+
+    @property
+    def shape(self):
+        return (len(self.index), self.profile.shape[1])
+
+    @property
+    def dtype(self):
+        return self.profile.dtype
+
+    @property
+    def nbytes(self):
+        # tatsächlich belegter Speicher
+        return self.profile.nbytes + self.index.nbytes + self.scale.nbytes + self.offset.nbytes + (0 if self.untergrenze is None else self.untergrenze.nbytes)
+
+    def __repr__(self):
+        return f"DemandMatrix(shape={self.shape}, profile={len(self.profile)}, dtype={self.dtype})"
+
+    def _werte(self, zeilen, spalten):
+        # Werte für Zeilenindizes (Array) und beliebigen Spaltenindex, Profile werden zuerst auf die Spalten beschränkt
+        profile = self.profile[:, spalten]
+        werte = profile[self.index[zeilen]]
+        form = (-1,) + (1,) * (werte.ndim - 1)
+        werte *= self.scale[zeilen].reshape(form).astype(self.dtype)
+        werte += self.offset[zeilen].reshape(form).astype(self.dtype)
+        if self.untergrenze is not None:
+            np.maximum(werte, self.untergrenze[zeilen].reshape(form).astype(self.dtype), out=werte)
+        return werte
+
+    def astype(self, dtype):
+        return DemandMatrix(self.profile, self.index, self.scale, self.offset, self.untergrenze, dtype=dtype)
+
+    def _untergrenze_wirksam(self):
+        # True, falls die Untergrenze bei mindestens einem Gebäude greifen kann
+        if self.untergrenze is None:
+            return False
+        p_min, p_max = self.profile.min(axis=1)[self.index], self.profile.max(axis=1)[self.index]
+        minimum = np.minimum(self.scale * p_min, self.scale * p_max) + self.offset
+        return bool(np.any(minimum < self.untergrenze))
+
+    def sum(self, axis=None, dtype=None, out=None, **kwargs):
+        if out is not None or kwargs:
+            return super().sum(axis=axis, dtype=dtype, out=out, **kwargs)
+
+        if axis in (0, -2) and not self._untergrenze_wirksam():
+            # Summe je Zeitschritt direkt aus den Profilen, Gewicht je Profil ist die Summe der Faktoren
+            gewichte = np.bincount(self.index, weights=self.scale, minlength=len(self.profile))
+            summe = gewichte @ self.profile + np.sum(self.offset)
+        elif axis in (1, -1) and self.untergrenze is None:
+            summe = self.scale * self.profile.sum(axis=1, dtype=float)[self.index] + self.offset * self.shape[1]
+        elif axis is None:
+            summe = np.sum(self.sum(axis=0))
+        else:
+            # blockweise, damit die vollständige Matrix nicht auf einmal im Speicher liegt
+            return super().sum(axis=axis, dtype=dtype)
+
+        return summe if dtype is None else np.asarray(summe).astype(dtype)
+
+    def _extremwerte(self, maximum):
+        # Maximum bzw. Minimum je Gebäude aus dem Maximum oder Minimum des Profils (bei negativem Faktor vertauscht),
+        # gleiche Rechenschritte wie _werte, daher identisch zur vollständigen Matrix
+        wähle_maximum = (self.scale >= 0) == maximum
+        werte = np.where(wähle_maximum, self.profile.max(axis=1)[self.index], self.profile.min(axis=1)[self.index])
+        werte *= self.scale.astype(self.dtype)
+        werte += self.offset.astype(self.dtype)
+        if self.untergrenze is not None:
+            np.maximum(werte, self.untergrenze.astype(self.dtype), out=werte)
+        return werte
+
+    def max(self, axis=None, out=None, **kwargs):
+        if axis in (None, 1, -1) and out is None and not kwargs and len(self) > 0 and self.shape[1] > 0:
+            werte = self._extremwerte(maximum=True)
+            return werte if axis is not None else werte.max()
+        return super().max(axis=axis, out=out, **kwargs)
+
+    def min(self, axis=None, out=None, **kwargs):
+        if axis in (None, 1, -1) and out is None and not kwargs and len(self) > 0 and self.shape[1] > 0:
+            werte = self._extremwerte(maximum=False)
+            return werte if axis is not None else werte.min()
+        return super().min(axis=axis, out=out, **kwargs)
+
+    def _je_zeile(self, wert):
+        # Zahl oder Wert je Gebäude als Vektor, None falls die Form nicht kompakt abgebildet werden kann
+        wert = np.asarray(wert)
+        if wert.dtype.kind not in "biuf":
+            return None
+        wert = wert.astype(float)
+        if wert.ndim == 0:
+            return np.full(len(self.index), float(wert))
+        if wert.shape == (len(self.index), 1):
+            return wert[:, 0]
+        return None
+
+    def __mul__(self, other):
+        faktor = self._je_zeile(other) if not isinstance(other, BerechneteMatrix) else None
+        # bei negativen Faktoren würde die Untergrenze zur Obergrenze
+        if faktor is None or (self.untergrenze is not None and np.any(faktor < 0)):
+            return super().__mul__(other)
+        untergrenze = None if self.untergrenze is None else self.untergrenze * faktor
+        return DemandMatrix(self.profile, self.index, self.scale * faktor, self.offset * faktor, untergrenze, dtype=self.dtype)
+
+    __rmul__ = __mul__
+
+    def __truediv__(self, other):
+        if isinstance(other, BerechneteMatrix) or self._je_zeile(other) is None:
+            return super().__truediv__(other)
+        return self * (1 / np.asarray(other, dtype=float))
+
+    def __add__(self, other):
+        summand = self._je_zeile(other) if not isinstance(other, BerechneteMatrix) else None
+        if summand is None:
+            return super().__add__(other)
+        untergrenze = None if self.untergrenze is None else self.untergrenze + summand
+        return DemandMatrix(self.profile, self.index, self.scale, self.offset + summand, untergrenze, dtype=self.dtype)
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        if isinstance(other, BerechneteMatrix) or self._je_zeile(other) is None:
+            return super().__sub__(other)
+        return self + (-np.asarray(other, dtype=float))
+
+    def __rsub__(self, other):
+        if self.untergrenze is None and self._je_zeile(other) is not None:
+            return -self + other
+        return super().__rsub__(other)
+
+    def __neg__(self):
+        # mit Untergrenze würde aus max(...) ein min(...), das nicht kompakt abgebildet werden kann
+        if self.untergrenze is not None:
+            return super().__neg__()
+        return DemandMatrix(self.profile, self.index, -self.scale, -self.offset, dtype=self.dtype)
+
+class AbgeleiteteMatrix(BerechneteMatrix):
+    """
+    Gebäude x Zeitschritte-Matrix, deren Werte beim Zugriff aus anderen Matrizen berechnet werden, z.B. Strombedarf dezentraler
+    Wärmepumpen aus Wärmebedarf und zeitabhängigem COP. Es werden nur die Ausschnitte berechnet, auf die zugegriffen wird.
+
+    funktion: berechnet aus den Ausschnitten aller Eingänge (gleiche Zeilen und Zeitschritte) die Werte des Ausschnitts
+    eingänge: DemandMatrix, AbgeleiteteMatrix, Arrays [Gebäude x Zeitschritte] bzw. [Gebäude x 1] oder Zahlen
+    """
+    def __init__(self, funktion, *eingänge, dtype=np.float64):
+        self.funktion = funktion
+        self.eingänge = eingänge
+        self._dtype = np.dtype(dtype)
+        self._shape = np.broadcast_shapes(*[np.shape(eingang) if not isinstance(eingang, BerechneteMatrix) else eingang.shape for eingang in eingänge])
+        if len(self._shape) != 2:
+            raise ValueError("Die Eingänge müssen zusammen eine Gebäude x Zeitschritte-Matrix ergeben.")
+
+    @property
+    def shape(self):
+        return self._shape
+
+    @property
+    def dtype(self):
+        return self._dtype
+
+    def __repr__(self):
+        return f"AbgeleiteteMatrix(shape={self.shape}, eingänge={len(self.eingänge)}, dtype={self.dtype})"
+
+    @staticmethod
+    def _ausschnitt(eingang, zeilen, spalten):
+        if isinstance(eingang, BerechneteMatrix):
+            return eingang._werte(zeilen, spalten)
+        eingang = np.asarray(eingang)
+        if eingang.ndim == 0:
+            return eingang
+        if eingang.ndim == 1:
+            return eingang[spalten]
+        werte = eingang[zeilen] if eingang.shape[0] != 1 else eingang
+        if eingang.shape[1] == 1:
+            return werte if isinstance(spalten, slice) or np.ndim(spalten) > 0 else werte[:, 0]
+        return werte[:, spalten]
+
+    def _werte(self, zeilen, spalten):
+        werte = self.funktion(*[self._ausschnitt(eingang, zeilen, spalten) for eingang in self.eingänge])
+        return np.asarray(werte, dtype=self.dtype)
+
+    def astype(self, dtype):
+        return AbgeleiteteMatrix(self.funktion, *self.eingänge, dtype=dtype)
+
+def zeitfenster(werte, start, end):
+    # Zeitschritte start bis end aller Zeilen als numpy-Array, für DemandMatrix, AbgeleiteteMatrix und beliebige 2D-Arrays (auch Listen von Zeitreihen)
+    if isinstance(werte, BerechneteMatrix):
+        return werte.fenster(start, end)
+    return np.asarray(werte)[:, start:end]
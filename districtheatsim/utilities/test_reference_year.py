@@ -1,27 +1,92 @@
 # Erstellt von Jonas Pfeiffer
+# Einlesen der Testreferenzjahre (TRY) des DWD
+# Die .dat-Datei wird nur einmal gelesen und als .npy im Cache-Ordner des Benutzers abgelegt (siehe utilities/cache.py).
+# Weitere Aufrufe bilden die Spalten über memory-mapping ab, innerhalb eines Prozesses werden die Spalten zwischengespeichert.
 
 import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+from functools import lru_cache
+
+import numpy as np
 import pandas as pd
 
-def import_TRY(dateiname):
-    # Import TRY
+from utilities.cache import cache_dateiname, atomar_speichern
+
+# Spalten der .npy-Datei: Lufttemperatur, Windgeschwindigkeit, Direktstrahlung, Diffusstrahlung, Bedeckungsgrad, Globalstrahlung (B + D)
+TRY_SPALTEN = ("t", "WG", "B", "D", "N", "G")
+
+def kopfzeilen(dateiname):
+    # Die Daten beginnen nach der Zeile "***", die Länge des Dateikopfes unterscheidet sich zwischen den TRY-Dateien
+    with open(dateiname, encoding='latin-1') as datei:
+        for nummer, zeile in enumerate(datei):
+            if zeile.startswith("***"):
+                return nummer + 1
+    return 34
+
+def lese_TRY_datei(dateiname):
     # Spaltenbreiten definieren
     col_widths = [8, 8, 3, 3, 3, 6, 5, 4, 5, 2, 5, 4, 5, 5, 4, 5, 3]
     # Spaltennamen definieren
     col_names = ["RW", "HW", "MM", "DD", "HH", "t", "p", "WR", "WG", "N", "x", "RF", "B", "D", "A", "E", "IL"]
 
     # Die Datei lesen
-    data = pd.read_fwf(dateiname, widths=col_widths, names=col_names,
-                       skiprows=34)
+    data = pd.read_fwf(dateiname, widths=col_widths, names=col_names, skiprows=kopfzeilen(dateiname))
+    data["G"] = data["B"] + data["D"]
+
+    return np.ascontiguousarray(data[list(TRY_SPALTEN)].values.T, dtype=float)
+
+def sidecar_dateiname(dateiname):
+    return cache_dateiname(dateiname, ".npy")
+
+@lru_cache(maxsize=32)
+def _lade_TRY(dateiname, änderungszeit):
+    sidecar = sidecar_dateiname(dateiname)
+    if os.path.exists(sidecar) and os.path.getmtime(sidecar) >= änderungszeit:
+        werte = np.load(sidecar, mmap_mode='r')
+    else:
+        werte = lese_TRY_datei(dateiname)
+        try:
+            atomar_speichern(sidecar, lambda datei: np.save(datei, werte))
+            werte = np.load(sidecar, mmap_mode='r')
+        except OSError:
+            # z.B. kein Schreibrecht im Cache-Ordner, die Werte bleiben dann nur im Speicher
+            werte.setflags(write=False)
 
-    # Speichern der Spalten als Numpy-Arrays
-    temperature = data['t'].values
-    windspeed = data['WG'].values
-    direktstrahlung = data['B'].values
-    diffusstrahlung = data['D'].values
-    globalstrahlung = direktstrahlung + diffusstrahlung
+    return {spalte: np.asarray(werte[i]) for i, spalte in enumerate(TRY_SPALTEN)}
+
+def lade_TRY(dateiname):
+    # Spalten des TRY als schreibgeschützte Arrays (stündlich), Schlüssel siehe TRY_SPALTEN
+    dateiname = os.path.abspath(dateiname)
+    return _lade_TRY(dateiname, os.path.getmtime(dateiname))
+
+@lru_cache(maxsize=32)
+def _TRY_Zeitschritte(dateiname, änderungszeit, schritte_pro_stunde):
+    werte = {spalte: np.repeat(stündlich, schritte_pro_stunde) for spalte, stündlich in _lade_TRY(dateiname, änderungszeit).items()}
+    for array in werte.values():
+        array.setflags(write=False)
+    return werte
+
+def TRY_Zeitschritte(dateiname, schritte_pro_stunde=4):
+    # Stündliche Werte auf kürzere Zeitschritte übertragen (z.B. 4 für Viertelstunden), wird je Datei nur einmal berechnet
+    if schritte_pro_stunde == 1:
+        return lade_TRY(dateiname)
+    dateiname = os.path.abspath(dateiname)
+    return _TRY_Zeitschritte(dateiname, os.path.getmtime(dateiname), schritte_pro_stunde)
+
+class TRYDaten(tuple):
+    # (t, WG, B, G) wie bisher, merkt sich zusätzlich die Datei für TRY_Zeitschritte
+    def __new__(cls, werte, dateiname):
+        daten = super().__new__(cls, werte)
+        daten.dateiname = dateiname
+        return daten
+
+    def __getnewargs__(self):
+        return tuple(self), self.dateiname
+
+def import_TRY(dateiname):
+    # Import TRY
+    werte = lade_TRY(dateiname)
 
-    return temperature, windspeed, direktstrahlung, globalstrahlung
\ No newline at end of file
+    return TRYDaten((werte["t"], werte["WG"], werte["B"], werte["G"]), os.path.abspath(dateiname))
@@ -0,0 +1,105 @@
+# Erstellt von Jonas Pfeiffer
+# Gemeinsame Zeitachse (Kalender) für Lastprofile und Erzeugerberechnungen
+
+from functools import lru_cache
+
+import numpy as np
+
+def easter_sunday(year):
+    # Ostersonntag nach der Gaußschen Osterformel (Ergänzung von Lichtenberg)
+    K = year // 100
+    M = 15 + (3 * K + 3) // 4 - (8 * K + 13) // 25
+    S = 2 - (3 * K + 3) // 4
+    A = year % 19
+    D = (19 * A + M) % 30
+    R = (D + A // 11) // 29
+    OG = 21 + D - R
+    SZ = 7 - (year + year // 4 + S) % 7
+    OE = 7 - (OG - SZ) % 7
+    OS = OG + OE  # Tag im März, Werte über 31 liegen im April
+
+    return np.datetime64(f'{year}-03-01') + np.timedelta64(OS - 1, 'D')
+
+def german_holidays(year):
+    # Feiertage, die bisher in den Lastprofilen hinterlegt waren (bundesweite Feiertage sowie Fronleichnam und Allerheiligen)
+    easter = easter_sunday(year)
+    fixed = [f'{year}-01-01', f'{year}-05-01', f'{year}-10-03', f'{year}-11-01', f'{year}-12-25', f'{year}-12-26']
+    movable = [easter + np.timedelta64(offset, 'D') for offset in (-2, 1, 39, 50, 60)]  # Karfreitag, Ostermontag, Christi Himmelfahrt, Pfingstmontag, Fronleichnam
+
+    return np.sort(np.concatenate([np.array(fixed, dtype='datetime64[D]'), np.array(movable, dtype='datetime64[D]')]))
+
+def day_of_year(time_steps):
+    # Tag des Jahres (1 bis 366) für beliebige datetime64-Zeitstempel
+    time_steps = np.asarray(time_steps)
+    return (time_steps.astype('datetime64[D]') - time_steps.astype('datetime64[Y]')).astype(int) + 1
+
+def hour_of_day(time_steps):
+    # Stunde des Tages (0 bis 23) für beliebige datetime64-Zeitstempel
+    time_steps = np.asarray(time_steps)
+    return ((time_steps.astype('datetime64[h]') - time_steps.astype('datetime64[D]')) // np.timedelta64(1, 'h')).astype(int)
+
+def weekday(days):
+    # Wochentag mit Sonntag=1 bis Samstag=7 (1970-01-01 war ein Donnerstag)
+    return ((np.asarray(days).astype('datetime64[D]').astype(int) + 4) % 7) + 1
+
+class TimeAxis:
+    """
+    Kalenderdaten eines Jahres in einer festen Auflösung (Minuten). Alle Felder werden einmalig als Arrays berechnet.
+
+    Tageswerte (Länge Anzahl Tage): days, day_of_year_daily, month_daily, weekday_daily, holiday_daily, season_daily
+    Zeitschrittwerte (Länge Anzahl Zeitschritte): time_steps, day_of_year, hour, minute, month, weekday, holiday, season
+    season: 0 Winter (Dez-Feb), 1 Frühling (Mär-Mai), 2 Sommer (Jun-Aug), 3 Herbst (Sep-Nov)
+    """
+    def __init__(self, year, resolution=60):
+        if (24 * 60) % resolution != 0:
+            raise ValueError("Die Auflösung muss ein Teiler von 1440 Minuten sein.")
+
+        self.year = year
+        self.resolution = resolution
+        self.steps_per_day = 24 * 60 // resolution
+
+        start = np.datetime64(f'{year}-01-01', 'D')
+        self.days = np.arange(start, np.datetime64(f'{year + 1}-01-01', 'D'), dtype='datetime64[D]')
+        self.num_days = len(self.days)
+        self.duration = resolution / 60  # Dauer eines Zeitschritts in h
+
+        self.day_of_year_daily = np.arange(1, self.num_days + 1)
+        self.month_daily = self.days.astype('datetime64[M]').astype(int) % 12 + 1
+        self.day_of_month_daily = (self.days - self.days.astype('datetime64[M]')).astype(int) + 1
+        self.weekday_daily = weekday(self.days)
+        self.holidays = german_holidays(year)
+        self.holiday_daily = np.isin(self.days, self.holidays)
+        self.season_daily = (self.month_daily % 12) // 3
+
+        self.time_steps = np.arange(start.astype('datetime64[m]'), np.datetime64(f'{year + 1}-01-01T00:00', 'm'), np.timedelta64(resolution, 'm'))
+        self.num_steps = len(self.time_steps)
+
+        minute_of_day = np.tile(np.arange(0, 24 * 60, resolution), self.num_days)
+        self.hour = minute_of_day // 60
+        self.minute = minute_of_day % 60
+        self.day_of_year = self.daily(self.day_of_year_daily)
+        self.month = self.daily(self.month_daily)
+        self.weekday = self.daily(self.weekday_daily)
+        self.holiday = self.daily(self.holiday_daily)
+        self.season = self.daily(self.season_daily)
+
+        for array in self.__dict__.values():
+            if isinstance(array, np.ndarray):
+                array.setflags(write=False)
+
+    def daily(self, values):
+        # Überträgt Tageswerte auf die Zeitschritte
+        return np.repeat(values, self.steps_per_day)
+
+    def daily_sum(self, values):
+        # Summiert Zeitschrittwerte je Tag
+        return np.asarray(values).reshape(self.num_days, self.steps_per_day).sum(axis=1)
+
+    def daily_mean(self, values):
+        # Mittelt Zeitschrittwerte je Tag
+        return np.asarray(values).reshape(self.num_days, self.steps_per_day).mean(axis=1)
+
+@lru_cache(maxsize=None)
+def get_time_axis(year, resolution=60):
+    # Zwischengespeicherte Zeitachse, wird pro Jahr und Auflösung nur einmal erstellt
+    return TimeAxis(year, resolution)